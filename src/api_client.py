@@ -1,4 +1,5 @@
 import requests
+from metrics import incr
 
 class ApiClient:
     def __init__(self, api_key, base_url="https://api.gnosisscan.io/api"):
@@ -23,5 +24,23 @@ class ApiClient:
         if contract_address:
             params['contractaddress'] = contract_address
         response = requests.get(self.base_url, params=params)
+        incr('api_calls')
         response.raise_for_status()
-        return response.json()
\ No newline at end of file
+        return response.json()
+
+    def get_latest_block(self):
+        """
+        Return the number of the most recent block (eth_blockNumber proxy call).
+        """
+        params = {
+            'module': 'proxy',
+            'action': 'eth_blockNumber',
+            'apikey': self.api_key
+        }
+        response = requests.get(self.base_url, params=params)
+        incr('api_calls')
+        response.raise_for_status()
+        result = response.json().get('result')
+        if not isinstance(result, str) or not result.startswith('0x'):
+            raise Exception(f"Réponse inattendue pour eth_blockNumber : {result}")
+        return int(result, 16)
\ No newline at end of file
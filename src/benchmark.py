@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Budget du temps d'import des points d'entrée (ms, médiane des mesures)
+IMPORT_BUDGETS = {'main': 150, 'viewer': 500}
+# Dépendances lourdes qui ne doivent pas être chargées au démarrage d'un point d'entrée
+FORBIDDEN_IMPORTS = {
+    'main': ('pdfplumber', 'selenium', 'requests', 'flask'),
+    'viewer': ('pdfplumber', 'selenium', 'requests'),
+}
+
+def percentile(values, pct):
+    """Retourne le percentile `pct` (0-100) d'une liste de valeurs"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.1f} ms"
+
+def bench_invoices(invoice_dir, repeat=1):
+    """
+    Mesure le temps d'extraction par page et par facture sur les PDF d'un dossier.
+
+    Returns:
+        dict: Les mesures brutes (durées par page et par facture, en secondes)
+    """
+    filepaths = [
+        os.path.join(invoice_dir, filename)
+        for filename in sorted(os.listdir(invoice_dir))
+        if filename.endswith('.pdf')
+    ]
+    if not filepaths:
+        print(f"Aucune facture PDF dans {invoice_dir}")
+        return {'pages': [], 'invoices': []}
+
+    page_timings = []
+    invoice_timings = []
+    products = 0
+    from utils import parse_invoice_pdf
+
+    for _ in range(repeat):
+        for filepath in filepaths:
+            start = time.perf_counter()
+            invoice_data = parse_invoice_pdf(filepath, page_timings)
+            invoice_timings.append(time.perf_counter() - start)
+            products += len(invoice_data['products'])
+
+    print(f"\nBenchmark d'extraction sur {len(filepaths)} factures (x{repeat})")
+    print(f"Pages mises en page: {len(page_timings)}")
+    print(f"Produits extraits: {products // repeat}")
+    for label, timings in (('Par page', page_timings), ('Par facture', invoice_timings)):
+        print(f"\n{label}:")
+        print(f"  moyenne: {format_ms(statistics.mean(timings))}")
+        print(f"  médiane: {format_ms(statistics.median(timings))}")
+        print(f"  p95:     {format_ms(percentile(timings, 95))}")
+        print(f"  max:     {format_ms(max(timings))}")
+
+    return {'pages': page_timings, 'invoices': invoice_timings}
+
+def measure_import(module):
+    """
+    Importe un module dans un nouvel interpréteur avec `-X importtime`.
+
+    Returns:
+        dict: Temps d'import cumulé (µs) du module et de chacun des modules qu'il a chargés
+              (hors démarrage de l'interpréteur)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=SRC_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Import de {module} impossible : {result.stderr.strip().splitlines()[-1]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), len(name) - len(name.lstrip()), int(cumulative)))
+
+    # Un module est affiché après ceux qu'il importe, avec une indentation moindre :
+    # ses dépendances sont les lignes plus indentées qui le précèdent
+    position = max(i for i, (name, _, _) in enumerate(entries) if name == module)
+    imported = {module: entries[position][2]}
+    level = entries[position][1]
+    for name, indent, cumulative in reversed(entries[:position]):
+        if indent <= level:
+            break
+        imported[name] = cumulative
+    return imported
+
+def bench_imports(modules, repeat=5, budget=None):
+    """
+    Mesure le temps d'import des points d'entrée et le compare à leur budget.
+
+    Args:
+        budget: Budget (ms) commun à tous les modules (défaut: IMPORT_BUDGETS)
+
+    Returns:
+        bool: True si tous les modules respectent leur budget et ne chargent
+              aucune dépendance interdite
+    """
+    ok = True
+    for module in modules:
+        samples = []
+        for _ in range(repeat):
+            imported = measure_import(module)
+            samples.append(imported[module] / 1000)
+        elapsed = statistics.median(samples)
+        limit = budget if budget is not None else IMPORT_BUDGETS.get(module)
+        forbidden = [name for name in FORBIDDEN_IMPORTS.get(module, ()) if name in imported]
+
+        status = 'OK'
+        if (limit is not None and elapsed > limit) or forbidden:
+            status = 'DÉPASSÉ'
+            ok = False
+        budget_info = f" (budget {limit} ms)" if limit is not None else ''
+        print(f"\n{module}: {elapsed:.1f} ms{budget_info} - {status}")
+        print(f"  min: {min(samples):.1f} ms, max: {max(samples):.1f} ms sur {repeat} mesures")
+        if forbidden:
+            print(f"  dépendances lourdes chargées: {', '.join(forbidden)}")
+
+        # Modules les plus coûteux (hors module mesuré), dernière mesure
+        heaviest = sorted(((t, name) for name, t in imported.items() if name != module), reverse=True)[:5]
+        for t, name in heaviest:
+            print(f"  {name:<30} {t / 1000:>8.1f} ms")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de RealtROI')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    invoices_parser = subparsers.add_parser('invoices', help="Temps d'extraction des factures PDF par page")
+    invoices_parser.add_argument('--dir', default=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'invoices'),
+                                 help='Dossier des factures PDF (défaut: invoices/)')
+    invoices_parser.add_argument('--repeat', type=int, default=1,
+                                 help='Nombre de passes sur le dossier')
+
+    imports_parser = subparsers.add_parser('imports', help="Temps d'import des points d'entrée (-X importtime)")
+    imports_parser.add_argument('modules', nargs='*', default=list(IMPORT_BUDGETS),
+                                help='Modules à mesurer (défaut: main et viewer)')
+    imports_parser.add_argument('--repeat', type=int, default=5,
+                                help='Nombre de mesures par module (la médiane est retenue)')
+    imports_parser.add_argument('--budget', type=float, default=None,
+                                help='Budget en ms pour tous les modules (défaut: budget de chaque point d\'entrée)')
+
+    args = parser.parse_args()
+    if args.command == 'invoices':
+        bench_invoices(args.dir, args.repeat)
+    elif args.command == 'imports':
+        # Code de sortie non nul en cas de dépassement (utilisable en intégration continue)
+        if not bench_imports(args.modules, args.repeat, args.budget):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
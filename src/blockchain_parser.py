@@ -1,30 +1,142 @@
-import configparser
-import os
+import logging
 from api_client import ApiClient
 from utils import parse_token_transactions, format_transactions, load_config
-from db import insert_transactions
+from db import insert_transactions, read_snapshot
+from progress import ProgressReporter
+from shared_cache import get_explorer_cache
 
-def update_transactions():
-    """Récupère et met à jour les transactions depuis la blockchain"""
-    # Load configuration
-    config = load_config()
-    api_key = config['DEFAULT']['api_key']
-    user_address = config['DEFAULT']['gnosis_address']
-    contract_address = config['DEFAULT'].get('contract_address', None)
+logger = logging.getLogger(__name__)
+
+# Taille des pages de l'API (tokentx)
+PAGE_SIZE = 1000
+# Nombre de blocs après lequel un bloc est considéré comme définitif (cache partagé)
+FINALITY_BLOCKS = 1000
+
+def transaction_key(tx):
+    """Identifie un transfert : une même transaction (hash) peut contenir plusieurs transferts"""
+    return (tx.get('hash'), (tx.get('from') or '').lower(), (tx.get('to') or '').lower(),
+            tx.get('tokenSymbol'), tx.get('value'))
+
+class TransactionSync:
+    """
+    Synchronisation incrémentale des transactions : seuls les blocs à partir du dernier
+    bloc connu sont demandés à l'API, et les transferts déjà enregistrés sont ignorés.
+    L'état (transferts connus, dernier bloc) est gardé en mémoire : en mode --watch,
+    une même instance sert à chaque cycle sans relire data/transactions.json.
+    """
+
+    def __init__(self, api_client=None, config=None):
+        config = config or load_config()
+        self.api_client = api_client or ApiClient(config['DEFAULT']['api_key'])
+        self.address = config['DEFAULT']['gnosis_address']
+        self.contract_address = config['DEFAULT'].get('contract_address', None)
+
+        transactions = read_snapshot('transactions')
+        self.known = {transaction_key(tx) for tx in transactions}
+        self.last_block = max((int(tx['blockNumber']) for tx in transactions if tx.get('blockNumber')), default=0)
+
+        # Réponses déjà reçues par d'autres portefeuilles (mode --batch), None sinon
+        self.cache = get_explorer_cache()
+        self._finalized_block = None
 
-    # Initialize API client
-    api_client = ApiClient(api_key)
+    def fetch_page(self, start_block, page):
+        """
+        Une page de transferts à partir de `start_block`.
+        Avec le cache partagé, une page complète dont tous les blocs sont définitifs
+        ne changera plus : elle est enregistrée et resservie sans appel à l'API.
+        """
+        if self.cache is None:
+            return self.api_client.fetch_token_transactions(
+                self.address, self.contract_address, page=page, offset=PAGE_SIZE, start_block=start_block)
 
-    # Fetch token transactions (contract_address is optional)
-    response = api_client.fetch_token_transactions(user_address, contract_address)
-    transactions = parse_token_transactions(response)
+        request = {
+            'url': self.api_client.base_url,
+            'address': self.address.lower(),
+            'contract_address': (self.contract_address or '').lower(),
+            'start_block': start_block,
+            'page': page,
+            'offset': PAGE_SIZE,
+        }
+        response = self.cache.get(request)
+        if response is not None:
+            return response
+        response = self.api_client.fetch_token_transactions(
+            self.address, self.contract_address, page=page, offset=PAGE_SIZE, start_block=start_block)
+        result = response.get('result')
+        if isinstance(result, list) and len(result) == PAGE_SIZE:
+            if self._finalized_block is None:
+                self._finalized_block = self.api_client.get_latest_block() - FINALITY_BLOCKS
+            if int(result[-1]['blockNumber']) <= self._finalized_block:
+                self.cache.put(request, response)
+        return response
+
+    def iter_new_pages(self, progress=None):
+        """
+        Récupère les transferts depuis le dernier bloc connu (inclus : un bloc peut avoir
+        été indexé partiellement), page par page, en avançant le bloc de départ.
+
+        Yields:
+            list: Pour chaque page, les transferts absents de la base, dans l'ordre des blocs
+        """
+        start_block = self.last_block
+        page = 1
+        self._finalized_block = None
+        while True:
+            response = self.fetch_page(start_block, page)
+            if not isinstance(response.get('result'), list):
+                raise Exception(f"Erreur de l'API : {response.get('message')} ({response.get('result')})")
+            transactions = parse_token_transactions(response)
+            new_transactions = []
+            for tx in transactions:
+                key = transaction_key(tx)
+                if key not in self.known:
+                    self.known.add(key)
+                    new_transactions.append(tx)
+            if progress is not None:
+                progress.update(len(transactions))
+            yield new_transactions
+            if len(response['result']) < PAGE_SIZE:
+                break
+            next_block = int(transactions[-1]['blockNumber'])
+            if next_block == start_block:
+                # Plus d'une page dans un même bloc : page suivante
+                page += 1
+            else:
+                start_block, page = next_block, 1
+
+    def sync(self, progress=None):
+        """
+        Enregistre les nouveaux transferts dans la base, page par page : si la récupération
+        est interrompue (limite de l'API...), les pages déjà lues sont conservées et la
+        synchronisation suivante repart du dernier bloc enregistré.
+
+        Returns:
+            list: Les transferts ajoutés
+        """
+        added = []
+        for new_transactions in self.iter_new_pages(progress):
+            if not new_transactions:
+                continue
+            insert_transactions(new_transactions)
+            added.extend(new_transactions)
+            self.last_block = max(self.last_block, max(int(tx['blockNumber']) for tx in new_transactions))
+        return added
+
+def update_transactions():
+    """Récupère et met à jour les transactions depuis la blockchain"""
+    progress = ProgressReporter('blockchain', 'transactions récupérées')
 
-    # Enregistre les transactions dans TinyDB
-    insert_transactions(transactions)
+    # Seuls les blocs postérieurs au dernier bloc connu sont demandés
+    # (contract_address optionnel, voir la configuration)
+    transactions = TransactionSync().sync(progress)
+    progress.done()
 
-    # Affiche les transactions fraîchement récupérées
-    print('--- Transactions récupérées ---')
-    print(format_transactions(transactions))
+    logger.info("%d nouvelles transactions récupérées", len(transactions), extra={'transactions': len(transactions)})
+    # Détail des transactions fraîchement récupérées (mis en forme seulement en mode -v)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('--- Transactions récupérées ---\n%s', format_transactions(transactions))
 
 if __name__ == "__main__":
-    update_transactions()
\ No newline at end of file
+    from logs import setup_logging
+    setup_logging()
+    update_transactions()
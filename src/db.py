@@ -1,27 +1,178 @@
 from tinydb import TinyDB, Query
+from tinydb.storages import Storage
+from datetime import datetime
+import bisect
+import json
 import os
+import tempfile
+import threading
+from metrics import incr
+
+# Dossier des données d'un portefeuille (mode --batch de main.py), à la place de data/
+DATA_DIR_ENV = 'REALTROI_DATA_DIR'
+
+def get_data_dir():
+    """Retourne le dossier des données JSON"""
+    if os.environ.get(DATA_DIR_ENV):
+        return os.path.abspath(os.environ[DATA_DIR_ENV])
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+
+def get_invoice_dir():
+    """Dossier de stockage des factures PDF, à côté du dossier des données (invoices/ par défaut)"""
+    return os.path.join(os.path.dirname(get_data_dir()), 'invoices')
+
+def get_store_path(name):
+    """Retourne le chemin du fichier JSON d'un store (ex: 'transactions')"""
+    return os.path.join(get_data_dir(), f'{name}.json')
+
+# umask du processus, lu une seule fois (os.umask ne permet pas de le lire sans le modifier)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _default_file_mode(path):
+    """Permissions d'un fichier existant, sinon celles d'un nouveau fichier (umask)"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+def atomic_write_json(path, data, mode=None, **kwargs):
+    """
+    Écrit un fichier JSON de manière atomique : écriture dans un fichier temporaire
+    du même dossier puis remplacement par rename. Un lecteur concurrent voit soit
+    l'ancienne version complète, soit la nouvelle, jamais un fichier tronqué.
+
+    Args:
+        mode: Permissions du fichier (par défaut, celles du fichier remplacé)
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    if mode is None:
+        mode = _default_file_mode(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # json.dumps utilise l'encodeur C, bien plus rapide que json.dump sur un fichier
+            f.write(json.dumps(data, **kwargs))
+            f.flush()
+            os.fsync(f.fileno())
+            incr('db_write_bytes', os.fstat(f.fileno()).st_size)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def _read_json(path):
+    """Lit un fichier JSON, en comptant les octets lus (voir metrics)"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    incr('db_read_bytes', len(content))
+    return json.loads(content)
+
+class AtomicJSONStorage(Storage):
+    """
+    Stockage TinyDB qui relit le fichier à chaque lecture et remplace le fichier
+    entier par rename à chaque écriture (voir atomic_write_json).
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__()
+        self._path = path
+        self.kwargs = kwargs
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def read(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        incr('db_read_bytes', len(content))
+        if not content.strip():
+            # Fichier vide : TinyDB initialise une base vide
+            return None
+        return json.loads(content)
+
+    def write(self, data):
+        atomic_write_json(self._path, data, **self.kwargs)
+
+def _open_db(name):
+    return TinyDB(get_store_path(name), storage=AtomicJSONStorage)
+
+def get_store_generation(name):
+    """
+    Retourne la génération courante d'un store : (inode, mtime_ns, taille).
+    Chaque écriture atomique crée un nouveau fichier, donc un nouvel inode.
+    Retourne None si le fichier n'existe pas.
+    """
+    try:
+        st = os.stat(get_store_path(name))
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+# Cache des derniers snapshots valides : (chemin, table) -> (génération, documents par id, documents)
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+def _load_snapshot(name, table):
+    path = get_store_path(name)
+    generation = get_store_generation(name)
+    with _snapshots_lock:
+        cached = _snapshots.get((path, table))
+        if cached and cached[0] == generation:
+            return cached
+        if generation is None:
+            return (None, {}, [])
+        try:
+            raw = _read_json(path)
+        except (OSError, ValueError):
+            return cached if cached else (None, {}, [])
+        if isinstance(raw, list):
+            # Fichier JSON simple (ex: sales.json écrit par match_sales)
+            by_id = {str(i): doc for i, doc in enumerate(raw, 1)}
+        else:
+            by_id = raw.get(table, {})
+        snapshot = (generation, by_id, list(by_id.values()))
+        _snapshots[(path, table)] = snapshot
+        return snapshot
+
+def read_snapshot(name, table='_default'):
+    """
+    Lecture seule d'un store sans passer par TinyDB.
+    Le fichier n'est relu que si sa génération a changé ; si le fichier est
+    illisible (écriture en cours par un ancien processus), le dernier snapshot
+    valide est retourné.
+
+    Returns:
+        list: Les documents de la table (ne pas les modifier)
+    """
+    return _load_snapshot(name, table)[2]
+
+def read_snapshot_by_id(name, table='_default'):
+    """
+    Comme read_snapshot, mais indexé par identifiant de document TinyDB.
+
+    Returns:
+        dict: {doc_id (str): document} (ne pas le modifier)
+    """
+    return _load_snapshot(name, table)[1]
 
 def get_transactions_db():
-    db_path = os.path.join(os.path.dirname(__file__), '../data/transactions.json')
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    return TinyDB(db_path)
+    return _open_db('transactions')
 
 def get_invoices_db():
-    db_path = os.path.join(os.path.dirname(__file__), '../data/invoices.json')
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    return TinyDB(db_path)
+    return _open_db('invoices')
 
 def get_purchases_db():
     """Base de données pour les achats (lien entre factures et transactions)"""
-    db_path = os.path.join(os.path.dirname(__file__), '../data/purchases.json')
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    return TinyDB(db_path)
+    return _open_db('purchases')
 
 def get_sales_db():
     """Base de données pour les ventes"""
-    db_path = os.path.join(os.path.dirname(__file__), '../data/sales.json')
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    return TinyDB(db_path)
+    return _open_db('sales')
 
 def insert_transactions(transactions):
     db = get_transactions_db()
@@ -31,51 +182,225 @@ def get_all_transactions():
     db = get_transactions_db()
     return db.all()
 
+def get_invoice_index_path():
+    """Index persistant des factures (numéro de facture, numéro de commande, date)"""
+    return os.path.join(get_data_dir(), 'invoices.index.json')
+
+def _invoice_date_key(invoice_date):
+    """Clé triable (ISO) d'une date de facture au format 'June 3, 2024'"""
+    try:
+        return datetime.strptime(invoice_date, '%B %d, %Y').isoformat()
+    except (TypeError, ValueError):
+        return None
+
+# Clé d'index des factures dont le numéro est None (un numéro extrait ne contient pas de \0)
+_NO_INVOICE_NUMBER = '\0none'
+
+def _invoice_number_key(invoice_number):
+    return _NO_INVOICE_NUMBER if invoice_number is None else str(invoice_number)
+
+def _index_invoice(index, doc_id, invoice_data):
+    order_info = invoice_data.get('order_info', {})
+    if 'invoice_number' in order_info:
+        index['invoice_number'][_invoice_number_key(order_info['invoice_number'])] = doc_id
+    if order_info.get('order_number') is not None:
+        index['order_number'][str(order_info['order_number'])] = doc_id
+    date_key = _invoice_date_key(order_info.get('invoice_date'))
+    previous = index['invoice_date'].get(doc_id)
+    if previous == date_key:
+        return
+    # Liste triée des paires [date, doc_id], pour les recherches par période (bisect)
+    dates = index['invoice_dates']
+    if previous is not None:
+        position = bisect.bisect_left(dates, [previous, doc_id])
+        if position < len(dates) and dates[position] == [previous, doc_id]:
+            del dates[position]
+        del index['invoice_date'][doc_id]
+    if date_key:
+        index['invoice_date'][doc_id] = date_key
+        bisect.insort(dates, [date_key, doc_id])
+
+# Dernier index chargé, réutilisé tant que le store n'a pas changé
+_invoice_index = None
+
+def _save_invoice_index(index):
+    global _invoice_index
+    index['generation'] = list(get_store_generation('invoices') or [])
+    atomic_write_json(get_invoice_index_path(), index)
+    _invoice_index = index
+
+def load_invoice_index():
+    """
+    Charge l'index des factures. Il est reconstruit (un seul parcours du store)
+    si le fichier des factures a été modifié en dehors de ce module.
+
+    Returns:
+        dict: {'invoice_number': {numéro: doc_id}, 'order_number': {numéro: doc_id},
+               'invoice_date': {doc_id: date ISO}, 'invoice_dates': [[date ISO, doc_id], ...] (triée),
+               'generation': [...]}
+    """
+    global _invoice_index
+    generation = list(get_store_generation('invoices') or [])
+    if _invoice_index and _invoice_index.get('generation') == generation:
+        return _invoice_index
+    try:
+        index = _read_json(get_invoice_index_path())
+        if index.get('generation') == generation and 'invoice_dates' in index:
+            _invoice_index = index
+            return index
+    except (FileNotFoundError, ValueError):
+        pass
+
+    index = {'invoice_number': {}, 'order_number': {}, 'invoice_date': {}, 'invoice_dates': []}
+    for doc_id, invoice_data in read_snapshot_by_id('invoices').items():
+        _index_invoice(index, doc_id, invoice_data)
+    _save_invoice_index(index)
+    return index
+
 def insert_invoice(invoice_data):
-    db = get_invoices_db()
-    Invoice = Query()
-    existing = db.get(
-        Invoice.order_info.invoice_number == invoice_data['order_info']['invoice_number']
-    )
-    
-    if existing:
-        db.update(
-            invoice_data,
-            Invoice.order_info.invoice_number == invoice_data['order_info']['invoice_number']
-        )
-    else:
-        db.insert(invoice_data)
+    insert_invoices([invoice_data])
+
+def insert_invoices(invoices):
+    """
+    Insère ou met à jour un lot de factures, identifiées par leur numéro
+    (les factures de numéro None sont une même facture, comme avec TinyDB).
+    L'index sur invoice_number évite de parcourir la base pour chaque facture,
+    et le lot complet est écrit en une seule fois.
+    """
+    if not invoices:
+        return
+    index = load_invoice_index()
+    storage = AtomicJSONStorage(get_store_path('invoices'))
+    data = storage.read() or {}
+    table = data.setdefault('_default', {})
+    next_id = max((int(doc_id) for doc_id in table), default=0) + 1
+
+    for invoice_data in invoices:
+        number = _invoice_number_key(invoice_data['order_info']['invoice_number'])
+        doc_id = index['invoice_number'].get(number)
+        if doc_id is not None and doc_id in table:
+            # Même sémantique que TinyDB.update : les champs existants sont conservés
+            table[doc_id] = {**table[doc_id], **invoice_data}
+        else:
+            doc_id = str(next_id)
+            next_id += 1
+            table[doc_id] = invoice_data
+        _index_invoice(index, doc_id, table[doc_id])
+
+    storage.write(data)
+    _save_invoice_index(index)
+
+def get_invoice_by_number(invoice_number):
+    """Retourne la facture de numéro `invoice_number`, ou None"""
+    doc_id = load_invoice_index()['invoice_number'].get(_invoice_number_key(invoice_number))
+    return read_snapshot_by_id('invoices').get(doc_id) if doc_id else None
+
+def get_invoice_by_order_number(order_number):
+    """Retourne la facture de la commande `order_number`, ou None"""
+    doc_id = load_invoice_index()['order_number'].get(str(order_number))
+    return read_snapshot_by_id('invoices').get(doc_id) if doc_id else None
+
+def get_known_order_numbers():
+    """Retourne l'ensemble des numéros de commande présents dans la base des factures"""
+    return set(load_invoice_index()['order_number'])
+
+def get_invoices_between(start=None, end=None):
+    """
+    Retourne les factures dont la date est dans [start, end[ (datetimes, bornes optionnelles),
+    dans l'ordre de la base. Seules les factures de la période sont parcourues (recherche
+    dichotomique dans la liste triée des dates de l'index).
+    """
+    dates = load_invoice_index()['invoice_dates']
+    # [date] est avant toutes les paires [date, doc_id] de même date
+    low = bisect.bisect_left(dates, [start.isoformat()]) if start else 0
+    high = bisect.bisect_left(dates, [end.isoformat()]) if end else len(dates)
+    docs = read_snapshot_by_id('invoices')
+    doc_ids = sorted((doc_id for _, doc_id in dates[low:high]), key=int)
+    return [docs[doc_id] for doc_id in doc_ids if doc_id in docs]
+
+def get_invoice_manifest_path():
+    """Manifeste des PDF déjà analysés (hash du contenu -> facture extraite)"""
+    return os.path.join(get_data_dir(), 'invoice_manifest.json')
+
+def load_invoice_manifest():
+    """
+    Charge le manifeste des factures analysées.
+
+    Returns:
+        dict: {'files': {chemin: {size, mtime_ns, sha256}},
+               'hashes': {sha256: {parser_version, invoice}}}
+    """
+    try:
+        manifest = _read_json(get_invoice_manifest_path())
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    manifest.setdefault('files', {})
+    manifest.setdefault('hashes', {})
+    return manifest
+
+def save_invoice_manifest(manifest):
+    """Sauvegarde le manifeste des factures analysées"""
+    atomic_write_json(get_invoice_manifest_path(), manifest)
 
 def get_all_invoices():
     db = get_invoices_db()
     return db.all()
 
 def insert_purchase(purchase_data):
-    """Insère ou met à jour un achat dans la base de données"""
-    db = get_purchases_db()
-    Purchase = Query()
-    
-    # Pour les achats P2P qui n'ont pas de numéro de facture
-    if 'invoice_number' not in purchase_data:
-        existing = db.get(Purchase.transaction_hash == purchase_data['transaction_hash'])
-        if existing:
-            db.update(purchase_data, Purchase.transaction_hash == purchase_data['transaction_hash'])
-        else:
-            db.insert(purchase_data)
+    """Insère ou met à jour un achat dans la base de données (et les agrégats du portefeuille)"""
+    insert_purchases([purchase_data])
+
+def _purchase_key(purchase):
+    # Achats P2P sans numéro de facture : le hash de la transaction seul ;
+    # achats avec facture : le hash ET le numéro de facture
+    if 'invoice_number' not in purchase:
+        return (purchase.get('transaction_hash'),)
+    return (purchase.get('transaction_hash'), purchase['invoice_number'])
+
+def _index_purchase(doc_ids, doc_id, purchase):
+    # Un achat avec facture correspond aussi à une recherche par hash seul
+    doc_ids.setdefault((purchase.get('transaction_hash'),), []).append(doc_id)
+    if 'invoice_number' in purchase:
+        doc_ids.setdefault(_purchase_key(purchase), []).append(doc_id)
+
+def insert_purchases(purchases):
+    """
+    Insère ou met à jour un lot d'achats, avec la même sémantique que TinyDB
+    (mise à jour de tous les achats correspondants). Le store des achats et les
+    agrégats du portefeuille (data/portfolio.json) ne sont écrits qu'une fois par lot.
+    """
+    if not purchases:
         return
-    
-    # Pour les achats avec facture, on utilise le hash ET le numéro de facture
-    existing = db.get(
-        (Purchase.transaction_hash == purchase_data['transaction_hash']) &
-        (Purchase.invoice_number == purchase_data['invoice_number'])
-    )
-    
-    if existing:
-        db.update(purchase_data, 
-                 (Purchase.transaction_hash == purchase_data['transaction_hash']) &
-                 (Purchase.invoice_number == purchase_data['invoice_number']))
-    else:
-        db.insert(purchase_data)
+    # Agrégats cohérents avec les achats avant l'écriture
+    portfolio = load_portfolio()
+    storage = AtomicJSONStorage(get_store_path('purchases'))
+    data = storage.read() or {}
+    table = data.setdefault('_default', {})
+    next_id = max((int(doc_id) for doc_id in table), default=0) + 1
+
+    # Achats correspondant à chaque clé possible
+    doc_ids = {}
+    for doc_id, doc in table.items():
+        _index_purchase(doc_ids, doc_id, doc)
+
+    for purchase_data in purchases:
+        matches = doc_ids.get(_purchase_key(purchase_data))
+        if matches:
+            for doc_id in matches:
+                existing = table[doc_id]
+                # Même sémantique que TinyDB.update : les champs existants sont conservés
+                table[doc_id] = {**existing, **purchase_data}
+                _apply_purchase(portfolio, existing, -1)
+                _apply_purchase(portfolio, table[doc_id], 1)
+        else:
+            doc_id = str(next_id)
+            next_id += 1
+            table[doc_id] = dict(purchase_data)
+            _apply_purchase(portfolio, table[doc_id], 1)
+            _index_purchase(doc_ids, doc_id, table[doc_id])
+
+    storage.write(data)
+    save_portfolio(portfolio)
 
 def get_all_purchases():
     """Récupère tous les achats"""
@@ -99,3 +424,162 @@ def get_all_sales():
     """Récupère toutes les ventes"""
     db = get_sales_db()
     return db.all()
+
+def save_sales(sales):
+    """
+    Remplace les ventes (data/sales.json, liste JSON) et met à jour les agrégats
+    du portefeuille avec les seules ventes ajoutées, modifiées ou supprimées.
+    """
+    portfolio = load_portfolio()
+    previous = {sale['sale_hash']: sale for sale in read_snapshot('sales')}
+    current = {sale['sale_hash']: sale for sale in sales}
+    atomic_write_json(get_store_path('sales'), sales, indent=4)
+
+    for sale_hash, sale in previous.items():
+        if current.get(sale_hash) != sale:
+            _apply_sale(portfolio, sale, -1)
+    for sale_hash, sale in current.items():
+        if previous.get(sale_hash) != sale:
+            _apply_sale(portfolio, sale, 1)
+    save_portfolio(portfolio)
+
+# --- Agrégats du portefeuille ---
+# data/portfolio.json contient, par token, les cumuls des achats et des ventes, mis à jour
+# à chaque écriture d'un achat ou des ventes. Les générations des stores purchases et sales
+# correspondant aux agrégats y sont enregistrées : si l'un des fichiers a été modifié
+# autrement, les agrégats sont recalculés à partir des snapshots.
+
+def get_portfolio_path():
+    return os.path.join(get_data_dir(), 'portfolio.json')
+
+def _new_position():
+    return {
+        'token_name': None,
+        'product_address': None,
+        'purchases': 0,
+        'quantity_bought': 0.0,
+        'quantity_priced': 0.0,  # quantité achetée dont le prix est connu (hors P2P sans prix)
+        'total_invested': 0.0,
+        'sales': 0,
+        'quantity_sold': 0.0,
+        'total_received': 0.0,
+        'cost_of_sold': 0.0,
+    }
+
+def _apply_purchase(portfolio, purchase, sign):
+    """Ajoute (sign=1) ou retire (sign=-1) un achat des agrégats"""
+    symbol = purchase.get('token_symbol')
+    if not symbol or purchase.get('quantity') is None:
+        return
+    position = portfolio['tokens'].setdefault(symbol, _new_position())
+    quantity = float(purchase['quantity'])
+    position['purchases'] += sign
+    position['quantity_bought'] += sign * quantity
+    if purchase.get('token_price_usd') is not None:
+        position['quantity_priced'] += sign * quantity
+        position['total_invested'] += sign * quantity * float(purchase['token_price_usd'])
+    if sign > 0:
+        position['token_name'] = purchase.get('token_name') or position['token_name']
+        position['product_address'] = purchase.get('product_address') or position['product_address']
+
+def _apply_sale(portfolio, sale, sign):
+    """Ajoute (sign=1) ou retire (sign=-1) une vente des agrégats"""
+    position = portfolio['tokens'].setdefault(sale['token_symbol'], _new_position())
+    quantity = float(sale['quantity'])
+    position['sales'] += sign
+    position['quantity_sold'] += sign * quantity
+    position['total_received'] += sign * float(sale['total_received'])
+    position['cost_of_sold'] += sign * quantity * float(sale['buy_price'])
+    if sign > 0:
+        position['token_name'] = position['token_name'] or sale.get('token_name')
+        position['product_address'] = position['product_address'] or sale.get('product_address')
+
+def _finalize_portfolio(portfolio):
+    """Calcule les valeurs dérivées (quantité détenue, prix moyen, PnL réalisé) et les totaux"""
+    totals = {'tokens_held': 0, 'total_invested': 0.0, 'total_received': 0.0, 'cost_of_sold': 0.0}
+    for symbol in list(portfolio['tokens']):
+        position = portfolio['tokens'][symbol]
+        if position['purchases'] <= 0 and position['sales'] <= 0:
+            del portfolio['tokens'][symbol]
+            continue
+        position['quantity_held'] = position['quantity_bought'] - position['quantity_sold']
+        position['average_cost'] = (position['total_invested'] / position['quantity_priced']
+                                    if position['quantity_priced'] else None)
+        position['realized_pnl'] = position['total_received'] - position['cost_of_sold']
+        position['roi_percent'] = (position['realized_pnl'] / position['cost_of_sold'] * 100
+                                   if position['cost_of_sold'] else None)
+        if position['quantity_held'] > 1e-9:
+            totals['tokens_held'] += 1
+        for key in ('total_invested', 'total_received', 'cost_of_sold'):
+            totals[key] += position[key]
+    totals['realized_pnl'] = totals['total_received'] - totals['cost_of_sold']
+    totals['roi_percent'] = (totals['realized_pnl'] / totals['cost_of_sold'] * 100
+                             if totals['cost_of_sold'] else None)
+    portfolio['totals'] = totals
+    return portfolio
+
+def _portfolio_generations():
+    # Listes plutôt que tuples pour être comparables au contenu du JSON
+    generations = {}
+    for name in ('purchases', 'sales'):
+        generation = get_store_generation(name)
+        generations[name] = list(generation) if generation else None
+    return generations
+
+def rebuild_portfolio():
+    """Recalcule les agrégats du portefeuille à partir des achats et des ventes"""
+    portfolio = {'tokens': {}, 'generations': _portfolio_generations()}
+    for purchase in read_snapshot('purchases'):
+        _apply_purchase(portfolio, purchase, 1)
+    for sale in read_snapshot('sales'):
+        _apply_sale(portfolio, sale, 1)
+    return _finalize_portfolio(portfolio)
+
+# Dernier portefeuille lu (génération du fichier portfolio.json) et dernier recalcul
+_portfolio = {'generation': None, 'data': None, 'rebuilt': None}
+_portfolio_lock = threading.Lock()
+
+def read_portfolio():
+    """
+    Lecture seule des agrégats du portefeuille (ne pas les modifier).
+    Le fichier n'est relu que s'il a changé. S'il manque ou ne correspond plus aux
+    fichiers des achats et des ventes, les agrégats sont recalculés (une fois par
+    version de ces fichiers).
+    """
+    path = get_portfolio_path()
+    try:
+        st = os.stat(path)
+        generation = (st.st_ino, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        generation = None
+    current = _portfolio_generations()
+
+    with _portfolio_lock:
+        if _portfolio['generation'] != generation:
+            try:
+                data = _read_json(path)
+            except (OSError, ValueError):
+                data = None
+            _portfolio.update(generation=generation, data=data)
+        portfolio = _portfolio['data']
+        if portfolio is not None and portfolio.get('generations') == current:
+            return portfolio
+        rebuilt = _portfolio['rebuilt']
+        if rebuilt is None or rebuilt['generations'] != current:
+            rebuilt = _portfolio['rebuilt'] = rebuild_portfolio()
+        return rebuilt
+
+def load_portfolio():
+    """Copie modifiable des agrégats du portefeuille (voir read_portfolio)"""
+    return json.loads(json.dumps(read_portfolio()))
+
+def save_portfolio(portfolio):
+    """Enregistre les agrégats, avec les générations actuelles des achats et des ventes"""
+    portfolio['generations'] = _portfolio_generations()
+    _finalize_portfolio(portfolio)
+    path = get_portfolio_path()
+    atomic_write_json(path, portfolio, indent=2)
+    # Le prochain read_portfolio de ce processus n'a pas à relire le fichier
+    st = os.stat(path)
+    with _portfolio_lock:
+        _portfolio.update(generation=(st.st_ino, st.st_mtime_ns, st.st_size), data=portfolio)
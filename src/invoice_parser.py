@@ -1,84 +1,253 @@
 #!/usr/bin/env python3
+import logging
 import os
-from utils import parse_invoice_pdf, store_invoice_data
-import json
-from tinydb import TinyDB, Query
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from utils import (parse_invoice_pdf, load_config, get_config_option,
+                   lookup_invoice_manifest, record_invoice_manifest)
+from db import insert_invoices, load_invoice_manifest, save_invoice_manifest, read_snapshot, get_invoice_dir
+from progress import ProgressReporter
+from shared_cache import load_shared_invoices, publish_shared_invoices
 
-def process_invoices(invoice_dir):
+logger = logging.getLogger(__name__)
+
+def get_parser_workers(config=None):
     """
-    Traite tous les fichiers PDF dans le dossier des factures et stocke les données dans TinyDB.
-    Retourne un résumé des opérations effectuées.
+    Nombre de processus pour l'analyse des PDF (clé `parser_workers` de la config).
+    Par défaut, un processus par cœur.
     """
-    stats = {
+    default = os.cpu_count() or 1
+    if config is None:
+        return default
+    return max(1, get_config_option(config, 'parser_workers', default, int))
+
+def print_invoice_summary(invoice_data, filename):
+    """Affiche un résumé des données extraites d'une facture (niveau DEBUG)"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    order_info = invoice_data['order_info']
+    products = ''.join(f"\n    - {product['address']}: {product['quantity']} x ${product['token_price']}"
+                       for product in invoice_data['products'])
+    logger.debug("✓ Facture %s (%s):\n  Date: %s\n  Commande: %s\n  Produits:%s",
+                 order_info['invoice_number'], filename, order_info['invoice_date'],
+                 order_info['order_number'], products)
+
+def new_stats():
+    """Statistiques vides d'un traitement de factures"""
+    return {
         'total': 0,
         'success': 0,
+        'cached': 0,
         'errors': 0,
         'processed_files': [],
         'error_files': []
     }
 
-    # S'assurer que le dossier existe
-    if not os.path.exists(invoice_dir):
-        print(f"Erreur: Le dossier {invoice_dir} n'existe pas")
-        return stats
+class InvoiceIngestor:
+    """
+    Pipeline d'analyse des factures en flux :
+    - les chemins de PDF arrivent par `submit` dans une file bornée (qui bloque le producteur
+      quand l'analyse prend du retard) ;
+    - un thread répartiteur écarte les PDF déjà connus du manifeste et envoie les autres
+      à un pool de `workers` processus ;
+    - un unique thread écrivain enregistre les factures par lots de `batch_size`,
+      puis le manifeste.
+    Les erreurs d'analyse sont collectées par fichier dans `stats`.
+    """
+
+    def __init__(self, workers=None, queue_size=32, batch_size=50):
+        self.workers = workers or get_parser_workers()
+        self.batch_size = batch_size
+        self.stats = new_stats()
+        self.progress = ProgressReporter('invoices', 'factures analysées')
+        self._paths = queue.Queue(maxsize=queue_size)
+        self._results = queue.Queue()
+        # Nombre maximal d'analyses soumises au pool et pas encore écrites
+        self._max_pending = self.workers * 2
+        self._pending = threading.Semaphore(self._max_pending)
+        self._manifest = load_invoice_manifest()
+        # Factures déjà extraites par d'autres portefeuilles (mode --batch), lues au premier hash inconnu
+        self._shared = None
+        self._manifest_lock = threading.Lock()
+        self._known_numbers = {doc['order_info'].get('invoice_number') for doc in read_snapshot('invoices')}
+        self._executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self._dispatcher = threading.Thread(target=self._dispatch, name='invoice-dispatcher', daemon=True)
+        self._writer = threading.Thread(target=self._write, name='invoice-writer', daemon=True)
 
-    # Parcourir tous les fichiers PDF
-    for filename in sorted(os.listdir(invoice_dir)):
-        if not filename.endswith(".pdf"):
-            continue
+    def start(self):
+        self._dispatcher.start()
+        self._writer.start()
+        return self
 
-        stats['total'] += 1
-        filepath = os.path.join(invoice_dir, filename)
-        print(f"\nTraitement de {filename}...")
+    def submit(self, filepath):
+        """Ajoute un PDF à analyser (bloque si la file est pleine)"""
+        self._paths.put(filepath)
 
+    def close(self):
+        """Attend la fin de l'analyse et de l'écriture, et retourne les statistiques"""
+        self._paths.put(None)
+        self._dispatcher.join()
+        self._writer.join()
+        if self._executor is not None:
+            self._executor.shutdown()
+        publish_shared_invoices(self._manifest)
+        self.stats['processed_files'].sort()
+        self.stats['error_files'].sort()
+        self.progress.done()
+        return self.stats
+
+    def _dispatch(self):
         try:
-            # Extraire et stocker les données
-            invoice_data = parse_invoice_pdf(filepath)
-            store_invoice_data(invoice_data)
-            
-            # Afficher un résumé des données extraites
-            print(f"✓ Facture {invoice_data['order_info']['invoice_number']}:")
-            print(f"  Date: {invoice_data['order_info']['invoice_date']}")
-            print(f"  Commande: {invoice_data['order_info']['order_number']}")
-            print("  Produits:")
-            for product in invoice_data['products']:
-                print(f"    - {product['address']}: {product['quantity']} x ${product['token_price']}")
-            
-            stats['success'] += 1
-            stats['processed_files'].append(filename)
+            self._dispatch_paths()
+        finally:
+            # Toujours arrêter l'écrivain, même si le répartiteur s'interrompt
+            self._results.put(None)
+
+    def _dispatch_paths(self):
+        while True:
+            filepath = self._paths.get()
+            if filepath is None:
+                break
+            try:
+                with self._manifest_lock:
+                    digest, invoice_data = lookup_invoice_manifest(self._manifest, filepath)
+            except OSError as e:
+                self._results.put((filepath, None, None, e, False))
+                continue
+
+            if invoice_data is None:
+                invoice_data = self._lookup_shared(digest)
+            if invoice_data is not None:
+                self._results.put((filepath, digest, invoice_data, None, True))
+                continue
+
+            if self._executor is None:
+                # Mode séquentiel : analyse dans le thread répartiteur
+                try:
+                    self._results.put((filepath, digest, parse_invoice_pdf(filepath), None, False))
+                except Exception as e:
+                    self._results.put((filepath, digest, None, e, False))
+                continue
+
+            self._pending.acquire()
+            try:
+                future = self._executor.submit(parse_invoice_pdf, filepath)
+            except Exception as e:
+                # Pool inutilisable (BrokenProcessPool si un processus est mort) :
+                # l'erreur est comptée pour ce fichier
+                self._pending.release()
+                self._results.put((filepath, digest, None, e, False))
+                continue
+            future.add_done_callback(
+                lambda f, filepath=filepath, digest=digest: self._on_parsed(f, filepath, digest)
+            )
+
+        # Attendre que toutes les analyses en cours aient transmis leur résultat
+        for _ in range(self._max_pending):
+            self._pending.acquire()
 
+    def _lookup_shared(self, digest):
+        """Facture extraite par un autre portefeuille pour ce hash, ou None"""
+        if self._shared is None:
+            self._shared = load_shared_invoices()
+        invoice_data = self._shared.get(digest)
+        if invoice_data is not None:
+            # Ce PDF appartient au portefeuille : son hash rejoint son propre manifeste
+            with self._manifest_lock:
+                record_invoice_manifest(self._manifest, digest, invoice_data)
+        return invoice_data
+
+    def _on_parsed(self, future, filepath, digest):
+        try:
+            self._results.put((filepath, digest, future.result(), None, False))
         except Exception as e:
-            print(f"✗ Erreur lors du traitement de {filename}: {e}")
-            stats['errors'] += 1
-            stats['error_files'].append(filename)
+            self._results.put((filepath, digest, None, e, False))
+        finally:
+            self._pending.release()
+
+    def _write(self):
+        batch = []
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            filepath, digest, invoice_data, error, from_cache = item
+            filename = os.path.basename(filepath)
+            self.stats['total'] += 1
+            self.progress.update()
+
+            if error is not None:
+                logger.warning("✗ Erreur lors du traitement de %s: %s", filename, error)
+                self.stats['errors'] += 1
+                self.stats['error_files'].append(filename)
+                continue
+
+            self.stats['success'] += 1
+            self.stats['processed_files'].append(filename)
+            if from_cache:
+                self.stats['cached'] += 1
+                # Les factures inchangées ne sont réécrites que si elles manquent dans la base
+                if invoice_data['order_info'].get('invoice_number') in self._known_numbers:
+                    continue
+            else:
+                print_invoice_summary(invoice_data, filename)
+                with self._manifest_lock:
+                    record_invoice_manifest(self._manifest, digest, invoice_data)
+
+            batch.append(invoice_data)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+        self._flush(batch)
+
+    def _flush(self, batch):
+        insert_invoices(batch)
+        with self._manifest_lock:
+            save_invoice_manifest(self._manifest)
+
+def process_invoices(invoice_dir, workers=None):
+    """
+    Traite tous les fichiers PDF dans le dossier des factures et stocke les données dans TinyDB.
+    Les PDF dont le contenu est déjà connu du manifeste (même hash, même version du parser)
+    ne sont pas ré-analysés. L'analyse des autres est répartie sur `workers` processus,
+    puis les factures sont écrites par lots (voir InvoiceIngestor).
+    Retourne un résumé des opérations effectuées.
+    """
+    # S'assurer que le dossier existe
+    if not os.path.exists(invoice_dir):
+        logger.error("Erreur: Le dossier %s n'existe pas", invoice_dir)
+        return new_stats()
 
-    return stats
+    ingestor = InvoiceIngestor(workers).start()
+    logger.info("Analyse des factures avec %d processus...", ingestor.workers)
+    filenames = [filename for filename in sorted(os.listdir(invoice_dir)) if filename.endswith(".pdf")]
+    ingestor.progress.set_total(len(filenames))
+    for filename in filenames:
+        ingestor.submit(os.path.join(invoice_dir, filename))
+    return ingestor.close()
 
 def display_summary(stats):
     """Affiche un résumé des opérations effectuées."""
-    print("\n" + "="*50)
-    print("RÉSUMÉ DU TRAITEMENT")
-    print("="*50)
-    print(f"Total des fichiers traités: {stats['total']}")
-    print(f"Succès: {stats['success']}")
-    print(f"Erreurs: {stats['errors']}")
+    logger.info("\n%s\nRÉSUMÉ DU TRAITEMENT\n%s", "="*50, "="*50)
+    logger.info("Total des fichiers traités: %d", stats['total'])
+    logger.info("Succès: %d (dont %d inchangées)", stats['success'], stats.get('cached', 0))
+    logger.info("Erreurs: %d", stats['errors'])
     
-    if stats['processed_files']:
-        print("\nFichiers traités avec succès:")
-        for f in stats['processed_files']:
-            print(f"  ✓ {f}")
+    # Liste des fichiers traités : détail par élément (mode -v)
+    if stats['processed_files'] and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("\nFichiers traités avec succès:\n%s", '\n'.join(f"  ✓ {f}" for f in stats['processed_files']))
     
     if stats['error_files']:
-        print("\nFichiers en erreur:")
-        for f in stats['error_files']:
-            print(f"  ✗ {f}")
+        logger.info("\nFichiers en erreur:\n%s", '\n'.join(f"  ✗ {f}" for f in stats['error_files']))
 
 def main():
     # Chemin vers le dossier des factures
-    invoice_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'invoices')
+    invoice_dir = get_invoice_dir()
     
-    print(f"Début du traitement des factures dans {invoice_dir}")
-    stats = process_invoices(invoice_dir)
+    logger.info("Début du traitement des factures dans %s", invoice_dir)
+    stats = process_invoices(invoice_dir, workers=get_parser_workers(load_config()))
     display_summary(stats)
 
     # Afficher le contenu de la base
@@ -88,9 +257,11 @@ def main():
     #afficher le nombre de factures et le nombre de tokens (produits*qty) dans la base
     invoices = get_all_invoices()
     total_tokens = sum(len(invoice['products']) for invoice in invoices)
-    print(f"\nNombre total de factures: {len(invoices)}")
+    logger.info("\nNombre total de factures: %d", len(invoices))
     #afficher le nombre de tokens (produits) dans les factures * quantité
     total_tokens = sum(product['quantity'] for invoice in invoices for product in invoice['products'])  
-    print(f"Nombre total de produits (tokens) dans les factures: {total_tokens}")
+    logger.info("Nombre total de produits (tokens) dans les factures: %s", total_tokens)
 if __name__ == "__main__":
+    from logs import setup_logging
+    setup_logging()
     main()
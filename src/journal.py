@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import time
+from db import get_data_dir, atomic_write_json
+
+# Journal de l'exécution en cours du pipeline : étapes terminées et points de reprise
+# des étapes en cours. Il n'est tenu que pendant une exécution de main.py (start_run) ;
+# hors pipeline, save_checkpoint est sans effet.
+_lock = threading.Lock()
+_journal = None
+_resume = False
+
+def get_journal_path():
+    """Journal de la dernière exécution du pipeline (effacé quand elle se termine sans erreur)"""
+    return os.path.join(get_data_dir(), 'journal.json')
+
+def _load():
+    try:
+        with open(get_journal_path(), 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+    except (FileNotFoundError, ValueError):
+        journal = {}
+    journal.setdefault('steps', {})
+    return journal
+
+def _save():
+    atomic_write_json(get_journal_path(), _journal, indent=2)
+
+def start_run(steps, resume=False):
+    """
+    Début d'une exécution du pipeline.
+    Sans reprise, le journal précédent est effacé ; avec reprise, les points de reprise
+    des étapes interrompues sont rendus par get_checkpoint.
+
+    Returns:
+        set: Étapes parmi `steps` terminées lors de l'exécution reprise
+    """
+    global _journal, _resume
+    with _lock:
+        _journal = _load() if resume else {'steps': {}}
+        _resume = resume
+        _journal['started_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        _journal['run_steps'] = list(steps)
+        _save()
+        return {step for step in steps if _journal['steps'].get(step, {}).get('status') == 'done'}
+
+def finish_run(success):
+    """Fin d'une exécution : le journal n'est conservé qu'en cas d'échec, pour --resume"""
+    global _journal, _resume
+    with _lock:
+        if _journal is None:
+            return
+        if success:
+            try:
+                os.remove(get_journal_path())
+            except FileNotFoundError:
+                pass
+        _journal = None
+        _resume = False
+
+def get_checkpoint(step):
+    """
+    Point de reprise d'une étape interrompue lors de l'exécution reprise.
+
+    Returns:
+        dict: Le dernier point de reprise enregistré (vide sans --resume)
+    """
+    with _lock:
+        if _journal is None or not _resume:
+            return {}
+        entry = _journal['steps'].get(step, {})
+        if entry.get('status') != 'running':
+            return {}
+        return dict(entry.get('checkpoint', {}))
+
+def save_checkpoint(step, **checkpoint):
+    """Enregistre (écriture atomique) l'avancement d'une étape du pipeline en cours"""
+    with _lock:
+        if _journal is None:
+            return
+        _journal['steps'][step] = {
+            'status': 'running',
+            'checkpoint': checkpoint,
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        _save()
+
+def complete_step(step):
+    """Marque une étape comme terminée : une reprise ne la réexécutera pas"""
+    with _lock:
+        if _journal is None:
+            return
+        _journal['steps'][step] = {'status': 'done', 'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        _save()
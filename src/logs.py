@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import sys
+import time
+
+# Attributs standard d'un LogRecord : les autres (passés via `extra`) sont des champs structurés
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """Un événement JSON par ligne : horodatage, niveau, module, message et champs `extra`"""
+
+    def format(self, record):
+        event = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                event[key] = value
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+def get_log_level(verbosity=0):
+    """
+    Niveau des messages affichés selon -v/-q :
+    0 = INFO (compteurs et résumés), 1 ou plus = DEBUG (détail par élément), -1 ou moins = WARNING
+    """
+    if verbosity > 0:
+        return logging.DEBUG
+    if verbosity < 0:
+        return logging.WARNING
+    return logging.INFO
+
+def setup_logging(verbosity=0, json_path=None):
+    """
+    Configure les messages du processus : texte brut sur la sortie standard et,
+    si `json_path` est fourni, une copie au format JSON (une ligne par message).
+    Les messages sous le niveau choisi ne sont pas formatés (arguments passés en %).
+    """
+    level = get_log_level(verbosity)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+
+    # Même flux que les print du pipeline, pour garder l'ordre des lignes
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    root.addHandler(console)
+
+    if json_path:
+        directory = os.path.dirname(os.path.abspath(json_path))
+        os.makedirs(directory, exist_ok=True)
+        file_handler = logging.FileHandler(json_path, encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        root.addHandler(file_handler)
+
+    # Bibliothèques tierces : seulement leurs avertissements
+    for name in ('urllib3', 'pdfminer', 'selenium'):
+        logging.getLogger(name).setLevel(max(level, logging.WARNING))
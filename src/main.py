@@ -1,57 +1,223 @@
 #!/usr/bin/env python3
 import argparse
+import logging
+import subprocess
 import sys
 import os
-from blockchain_parser import update_transactions
-from match_purchases import match_purchases
-from match_sales import main as match_sales
-from utils import load_config  # Import centralisé de la configuration
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from utils import load_config, get_config_option  # Import centralisé de la configuration
+from progress import publish, reset_progress
+from db import get_data_dir
+from step_cache import load_step_cache, compute_fingerprint, is_up_to_date, record_step
+from journal import start_run, finish_run, complete_step
+from logs import setup_logging
 
-# Import conditionnel pour éviter de charger Selenium si pas nécessaire
-def get_scrape_invoices():
+logger = logging.getLogger(__name__)
+
+# Les modules des étapes ne sont importés qu'à leur exécution : une étape courte
+# ne charge ni requests, ni pdfplumber, ni Selenium
+def scrape_invoices():
     from realt_scraper import scrape_invoices
-    return scrape_invoices
+    scrape_invoices()
+
+def update_transactions():
+    from blockchain_parser import update_transactions
+    update_transactions()
+
+def match_purchases():
+    from match_purchases import match_purchases
+    match_purchases()
+
+def match_sales():
+    from match_sales import main
+    main()
 
 def print_step(step_name):
     """Affiche une étape de manière visible"""
-    print("\n" + "="*50)
-    print(f" {step_name}")
-    print("="*50 + "\n")
+    logger.info("\n%s\n %s\n%s\n", "="*50, step_name, "="*50)
 
-def run_pipeline(start_step=None, only_step=None, skip_invoices=False):
+def get_steps():
     """
-    Exécute le pipeline complet de traitement des données RealT
-    
-    Args:
-        start_step: À partir de quelle étape commencer (None = début)
-        only_step: Exécuter uniquement cette étape (None = toutes les étapes)
-        skip_invoices: Ignorer l'étape de téléchargement des factures
+    Étapes du pipeline, dans l'ordre d'exécution historique, avec leurs dépendances :
+    une étape ne démarre qu'une fois terminées celles dont elle dépend.
+
+    Pour le cache des étapes (voir step_cache) : stores lus (`inputs`) et écrits (`outputs`),
+    options de config et fichiers sources utilisés. Les étapes qui lisent une source externe
+    ont une durée de validité configurable (`ttl_option`, `ttl_default` secondes par défaut,
+    0 = toujours exécuter : le cache de ces étapes est donc à activer explicitement).
     """
-    steps = {
+    return {
         'invoices': {
             'name': 'Téléchargement et analyse des factures',
-            'func': lambda: get_scrape_invoices()()
+            'func': scrape_invoices,
+            'deps': [],
+            'outputs': ['invoices'],
+            'config': ['username', 'realt_base_url', 'scraper_backend', 'incremental_scraping'],
+            'code': ['realt_scraper.py', 'realt_selenium.py', 'invoice_parser.py', 'shared_cache.py', 'utils.py', 'db.py'],
+            'ttl_option': 'invoices_cache_ttl',
+            'ttl_default': 0
         },
         'blockchain': {
             'name': 'Récupération des transactions blockchain',
-            'func': update_transactions
+            'func': update_transactions,
+            'deps': [],
+            'outputs': ['transactions'],
+            'config': ['gnosis_address', 'contract_address'],
+            'code': ['blockchain_parser.py', 'api_client.py', 'shared_cache.py', 'utils.py', 'db.py'],
+            'ttl_option': 'blockchain_cache_ttl',
+            'ttl_default': 0
         },
         'purchases': {
             'name': 'Association des achats',
-            'func': match_purchases
+            'func': match_purchases,
+            'deps': ['invoices', 'blockchain'],
+            'inputs': ['invoices', 'transactions'],
+            'outputs': ['purchases'],
+            'config': ['gnosis_address', 'old_gnosis_address'],
+            'code': ['match_purchases.py', 'utils.py', 'db.py']
         },
         'sales': {
             'name': 'Détection et analyse des ventes',
-            'func': match_sales
+            'func': match_sales,
+            'deps': ['blockchain', 'purchases'],
+            'inputs': ['transactions', 'purchases'],
+            'outputs': ['sales'],
+            'config': ['gnosis_address'],
+            'code': ['match_sales.py', 'utils.py', 'db.py']
         }
     }
 
+def get_profile_dir():
+    """Dossier des rapports de profilage (--profile)"""
+    return os.path.join(get_data_dir(), 'profiles')
+
+def run_step(steps, step, profiling=None, caching=None, fingerprint=None):
+    """
+    Exécute une étape et retourne son statut ('ok' ou 'error').
+
+    Args:
+        profiling: Si fourni, dict {'records': [...], 'cprofile_prefix': chemin ou None} :
+                   les mesures de l'étape sont ajoutées à `records` (voir metrics.StepProfile)
+        caching: Si fourni, dict {'cache', 'config', 'force'} : l'exécution réussie est
+                 enregistrée avec `fingerprint` (empreinte des entrées avant l'exécution)
+    """
+    print_step(steps[step]['name'])
+    publish('step_start', step=step, name=steps[step]['name'])
+    start = time.monotonic()
+    try:
+        if profiling is None:
+            steps[step]['func']()
+        else:
+            from metrics import StepProfile
+            prefix = profiling['cprofile_prefix']
+            profile = StepProfile(step, f"{prefix}-{step}.prof" if prefix else None)
+            try:
+                with profile:
+                    steps[step]['func']()
+            finally:
+                profiling['records'].append(profile.record)
+        if caching is not None:
+            record_step(caching['cache'], step, steps[step], caching['config'], fingerprint)
+        complete_step(step)
+    except Exception as e:
+        logger.error("\nErreur lors de l'étape '%s': %s", step, e, extra={'step': step, 'error': str(e)})
+        # Trace complète en mode -v (et dans le fichier --log-json)
+        logger.debug("Trace de l'erreur de l'étape '%s'", step, exc_info=True)
+        publish('step_end', step=step, status='error', duration=time.monotonic() - start, error=str(e))
+        return 'error'
+    publish('step_end', step=step, status='ok', duration=time.monotonic() - start)
+    return 'ok'
+
+def run_steps(steps, steps_to_run, skip_invoices=False, jobs=None, profiling=None, caching=None, completed=None):
+    """
+    Exécute les étapes sélectionnées en respectant leurs dépendances : une étape démarre
+    dès que ses dépendances (parmi les étapes sélectionnées) sont terminées, et les étapes
+    indépendantes s'exécutent en parallèle sur `jobs` threads.
+    Les étapes qui dépendent d'une étape en erreur sont annulées.
+    Avec `caching`, une étape dont les entrées n'ont pas changé depuis sa dernière exécution
+    réussie est sautée (comme avec make), sauf si `caching['force']`.
+    Les étapes de `completed` (terminées lors d'une exécution reprise avec --resume)
+    ne sont pas réexécutées.
+
+    Returns:
+        dict: Statut de chaque étape ('ok', 'cached', 'resumed', 'error', 'skipped' ou 'cancelled')
+    """
+    status = {}
+    pending = list(steps_to_run)
+    for step in steps_to_run:
+        if completed and step in completed:
+            logger.info("\nÉtape '%s' déjà terminée lors de l'exécution reprise, ignorée", step)
+            publish('step_end', step=step, status='resumed')
+            status[step] = 'resumed'
+            pending.remove(step)
+    if skip_invoices and 'invoices' in pending:
+        logger.info("\nÉtape 'invoices' ignorée (--skip-invoices)")
+        publish('step_end', step='invoices', status='skipped')
+        status['invoices'] = 'skipped'
+        pending.remove('invoices')
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or len(steps_to_run) or 1) as executor:
+        while pending or running:
+            # Les étapes sont déclarées dans un ordre compatible avec leurs dépendances :
+            # une annulation se propage donc en un seul passage
+            for step in list(pending):
+                deps = [dep for dep in steps[step]['deps'] if dep in steps_to_run]
+                if any(status.get(dep) in ('error', 'cancelled') for dep in deps):
+                    logger.warning("\nÉtape '%s' annulée : une étape dont elle dépend a échoué", step)
+                    publish('step_end', step=step, status='cancelled')
+                    status[step] = 'cancelled'
+                    pending.remove(step)
+                elif all(status.get(dep) in ('ok', 'cached', 'resumed', 'skipped') for dep in deps):
+                    pending.remove(step)
+                    fingerprint = None
+                    if caching is not None:
+                        spec, config = steps[step], caching['config']
+                        ttl = get_config_option(config, spec['ttl_option'], spec['ttl_default'], float) if 'ttl_option' in spec else None
+                        if not caching['force'] and is_up_to_date(caching['cache'], step, spec, config, ttl):
+                            logger.info("\nÉtape '%s' à jour, ignorée (--force pour l'exécuter)", step)
+                            publish('step_end', step=step, status='cached')
+                            status[step] = 'cached'
+                            continue
+                        fingerprint = compute_fingerprint(caching['cache'], spec, config)
+                    running[executor.submit(run_step, steps, step, profiling, caching, fingerprint)] = step
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                status[running.pop(future)] = future.result()
+    return status
+
+def run_pipeline(start_step=None, only_step=None, skip_invoices=False, jobs=None, profile=False, cprofile=False,
+                 force=False, resume=False, strict=False):
+    """
+    Exécute le pipeline complet de traitement des données RealT
+    
+    Args:
+        start_step: À partir de quelle étape commencer (None = début)
+        only_step: Exécuter uniquement cette étape (None = toutes les étapes)
+        skip_invoices: Ignorer l'étape de téléchargement des factures
+        jobs: Nombre maximal d'étapes exécutées en parallèle (None = pas de limite)
+        profile: Mesurer chaque étape et écrire un rapport JSON dans data/profiles
+        cprofile: Avec `profile`, écrire aussi un profil cProfile par étape
+        force: Exécuter les étapes même si leurs entrées n'ont pas changé
+        resume: Reprendre l'exécution précédente interrompue : les étapes terminées sont
+                sautées et les autres repartent de leur dernier point de reprise (data/journal.json)
+        strict: Échouer si une étape échoue, même avec `only_step` (processus du mode --batch)
+
+    Returns:
+        bool: False si le pipeline a échoué
+    """
+    steps = get_steps()
+
     # Déterminer les étapes à exécuter
     steps_to_run = []
     if only_step:
         if only_step not in steps:
-            print(f"Erreur: Étape '{only_step}' inconnue")
-            return
+            logger.error("Erreur: Étape '%s' inconnue", only_step)
+            return True
         steps_to_run = [only_step]
     else:
         found_start = False
@@ -61,22 +227,167 @@ def run_pipeline(start_step=None, only_step=None, skip_invoices=False):
                 steps_to_run.append(step)
         
         if start_step and not found_start:
-            print(f"Erreur: Étape de départ '{start_step}' inconnue")
-            return
+            logger.error("Erreur: Étape de départ '%s' inconnue", start_step)
+            return True
+
+    # Événements de progression, suivis en direct par le viewer (/progress)
+    reset_progress()
+    publish('pipeline_start', steps=steps_to_run)
+
+    profiling = None
+    if profile:
+        # Les mesures sont globales au processus : les étapes s'exécutent l'une après l'autre
+        if jobs != 1:
+            logger.info("Profilage : les étapes sont exécutées séquentiellement (--jobs 1)")
+        jobs = 1
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        report_path = os.path.join(get_profile_dir(), f'profile-{stamp}.json')
+        profiling = {
+            'records': [],
+            'cprofile_prefix': os.path.join(get_profile_dir(), stamp) if cprofile else None
+        }
+
+    # Cache des étapes : empreintes de la dernière exécution réussie de chaque étape
+    # Une étape demandée explicitement (--only-step) est toujours exécutée
+    caching = {'cache': load_step_cache(), 'config': load_config(), 'force': force or bool(only_step)}
+
+    # Journal de l'exécution : points de reprise des étapes, conservés en cas d'échec
+    completed = start_run(steps_to_run, resume)
 
     # Exécuter les étapes sélectionnées
-    for step in steps_to_run:
-        if skip_invoices and step == 'invoices':
-            print(f"\nÉtape '{step}' ignorée (--skip-invoices)")
-            continue
-            
-        print_step(steps[step]['name'])
+    try:
+        status = run_steps(steps, steps_to_run, skip_invoices, jobs, profiling, caching, completed)
+    except BaseException:
+        # Interruption (Ctrl+C...) : le journal est conservé pour --resume
+        finish_run(success=False)
+        raise
+    failed = any(s in ('error', 'cancelled') for s in status.values())
+    finish_run(success=not failed)
+    if failed:
+        logger.warning("\nLes étapes terminées et les points de reprise sont conservés : relancez avec --resume")
+
+    if profiling is not None:
+        from metrics import write_report, print_report
+        write_report(profiling['records'], report_path)
+        print_report(profiling['records'])
+        logger.info("\nRapport de profilage : %s", report_path)
+    publish('pipeline_end', status='error' if failed else 'ok')
+    # Si on exécute plusieurs étapes (ou en mode strict), une erreur fait échouer le pipeline
+    return not (failed and (strict or not only_step))
+
+def get_batch_dir():
+    """Dossier par défaut du mode --batch : un sous-dossier par portefeuille et les caches partagés"""
+    return os.path.join(get_data_dir(), 'batch')
+
+def run_batch(config_paths, batch_dir=None, workers=None, pipeline_args=()):
+    """
+    Exécute le pipeline pour plusieurs portefeuilles, un fichier de configuration chacun.
+    Chaque portefeuille est traité par un processus main.py distinct, avec ses propres
+    dossiers <batch_dir>/<nom>/data et <batch_dir>/<nom>/invoices ; sa sortie est écrite
+    dans <batch_dir>/<nom>/run.log. Les caches en lecture seule sont partagés dans
+    <batch_dir>/shared : réponses de l'explorateur pour les blocs définitifs et factures
+    déjà extraites (voir shared_cache).
+
+    Args:
+        workers: Nombre de portefeuilles traités en parallèle (None = un par cœur)
+        pipeline_args: Options de main.py transmises à chaque processus
+
+    Returns:
+        bool: True si le pipeline a réussi pour tous les portefeuilles
+    """
+    from db import DATA_DIR_ENV
+    from utils import CONFIG_ENV
+    from shared_cache import SHARED_CACHE_ENV
+
+    batch_dir = os.path.abspath(batch_dir or get_batch_dir())
+    names = [os.path.basename(path).split('.')[0] for path in config_paths]
+    if len(set(names)) != len(names):
+        logger.error("Erreur: deux fichiers de configuration donnent le même nom de portefeuille")
+        return False
+    shared_dir = os.path.join(batch_dir, 'shared')
+
+    def run_portfolio(config_path, name):
+        portfolio_dir = os.path.join(batch_dir, name)
+        data_dir = os.path.join(portfolio_dir, 'data')
+        os.makedirs(data_dir, exist_ok=True)
+        env = {
+            **os.environ,
+            CONFIG_ENV: os.path.abspath(config_path),
+            DATA_DIR_ENV: data_dir,
+            SHARED_CACHE_ENV: shared_dir,
+        }
+        log_path = os.path.join(portfolio_dir, 'run.log')
+        start = time.monotonic()
+        with open(log_path, 'w', encoding='utf-8') as log:
+            # --strict : l'échec d'une étape donne un code de sortie non nul, même avec --only-step
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), *pipeline_args, '--strict'],
+                                    env=env, stdout=log, stderr=subprocess.STDOUT)
+        return result.returncode, time.monotonic() - start, log_path
+
+    workers = workers or min(len(config_paths), os.cpu_count() or 1)
+    logger.info("\nTraitement de %d portefeuilles (%d en parallèle) dans %s", len(config_paths), workers, batch_dir)
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_portfolio, path, name): name for path, name in zip(config_paths, names)}
+        for future in as_completed(futures):
+            name = futures[future]
+            returncode, duration, log_path = future.result()
+            if returncode != 0:
+                failed.append(name)
+            # Tableau récapitulatif des portefeuilles, affiché même avec -q
+            print(f"  {name:<20} {'ok' if returncode == 0 else 'erreur':<7} {duration:>7.1f}s  {log_path}")
+
+    if failed:
+        logger.error("\nÉchec pour %d portefeuille(s) : %s", len(failed), ', '.join(sorted(failed)))
+    return not failed
+
+def watch(interval):
+    """
+    Mode surveillance : interroge la blockchain toutes les `interval` secondes et, quand
+    un nouveau bloc est apparu, récupère les seuls nouveaux transferts et les rapproche
+    des factures (achats) puis des achats (ventes).
+    Les données restent en mémoire entre deux cycles (transferts connus, snapshots et
+    index de la base) : un cycle sans nouvelle transaction ne coûte qu'un appel d'API.
+    """
+    from blockchain_parser import TransactionSync
+    from match_purchases import reconcile_new_transactions
+    from match_sales import reconcile_new_sales
+
+    config = load_config()
+    sync = TransactionSync(config=config)
+    last_tip = None
+    logger.info("\nSurveillance de %s toutes les %gs (Ctrl+C pour arrêter)", sync.address, interval)
+    while True:
         try:
-            steps[step]['func']()
+            tip = sync.api_client.get_latest_block()
+            if tip != last_tip:
+                new_transactions = sync.sync()
+                if new_transactions:
+                    logger.info("\n%s - bloc %s : %d nouvelle(s) transaction(s)",
+                                time.strftime('%H:%M:%S'), tip, len(new_transactions))
+                    purchases = reconcile_new_transactions(new_transactions, config)
+                    sales = reconcile_new_sales(new_transactions, config['DEFAULT']['gnosis_address'])
+                    logger.info("%d achat(s) et %d vente(s) ajouté(s)", len(purchases), len(sales),
+                                extra={'block': tip, 'purchases': len(purchases), 'sales': len(sales)})
+                    publish('watch', block=tip, transactions=len(new_transactions),
+                            purchases=len(purchases), sales=len(sales))
+                last_tip = tip
         except Exception as e:
-            print(f"\nErreur lors de l'étape '{step}': {str(e)}")
-            if not only_step:  # Si on exécute plusieurs étapes, on arrête en cas d'erreur
-                sys.exit(1)
+            # Erreur passagère (API, réseau) : nouvel essai au cycle suivant
+            logger.error("\nErreur lors de la surveillance : %s", e)
+        time.sleep(interval)
+
+def get_pipeline_args(args):
+    """Options de la ligne de commande à transmettre au pipeline de chaque portefeuille (--batch)"""
+    pipeline_args = []
+    for option in ('start_step', 'only_step', 'jobs'):
+        if getattr(args, option) is not None:
+            pipeline_args += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    for flag in ('skip_invoices', 'force', 'resume', 'profile', 'cprofile'):
+        if getattr(args, flag):
+            pipeline_args.append(f"--{flag.replace('_', '-')}")
+    pipeline_args += ['-v'] * args.verbose + ['-q'] * args.quiet
+    return pipeline_args
 
 def main():
     parser = argparse.ArgumentParser(
@@ -88,12 +399,19 @@ Exemples d'utilisation:
   %(prog)s --skip-invoices            # Exécute le pipeline en sautant l'étape des factures
   %(prog)s --start-step blockchain    # Commence à partir de l'étape blockchain
   %(prog)s --only-step purchases      # Exécute uniquement l'étape de matching des achats
+  %(prog)s --watch --interval 60      # Exécute le pipeline puis suit les nouvelles transactions
+  %(prog)s --resume                   # Reprend une exécution interrompue là où elle s'est arrêtée
+  %(prog)s -v --log-json run.jsonl    # Détail par élément, avec une copie JSON des messages
+  %(prog)s --batch alice.ini bob.ini  # Un pipeline par portefeuille, avec des caches partagés
 
 Ordre d'exécution des étapes:
   1. invoices   : Téléchargement et analyse des factures RealT
   2. blockchain : Récupération des transactions depuis la blockchain
   3. purchases  : Association des factures avec les transactions
   4. sales      : Détection et analyse des ventes
+
+invoices et blockchain sont indépendantes et s'exécutent en parallèle ;
+purchases attend les deux, sales attend blockchain et purchases.
 """)
     
     group = parser.add_mutually_exclusive_group()
@@ -104,20 +422,69 @@ Ordre d'exécution des étapes:
     
     parser.add_argument('--skip-invoices', action='store_true',
                       help='Ignorer l\'étape de téléchargement des factures')
+    parser.add_argument('--profile', action='store_true',
+                      help='Mesurer chaque étape (durée, CPU, mémoire, appels, E/S) et écrire un rapport JSON')
+    parser.add_argument('--cprofile', action='store_true',
+                      help='Avec --profile, écrire aussi un profil cProfile (.prof) par étape')
+    parser.add_argument('--force', action='store_true',
+                      help='Exécuter les étapes même si leurs entrées n\'ont pas changé depuis la dernière exécution')
+    parser.add_argument('--jobs', type=int, default=None,
+                      help='Nombre maximal d\'étapes exécutées en parallèle (1 = séquentiel)')
+    parser.add_argument('--resume', action='store_true',
+                      help='Reprendre l\'exécution précédente interrompue à partir de ses points de reprise')
+    parser.add_argument('--strict', action='store_true',
+                      help='Code de sortie non nul si une étape échoue, même avec --only-step (utilisé par --batch)')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                      help='Afficher le détail de chaque transaction, facture ou vente (niveau DEBUG)')
+    parser.add_argument('-q', '--quiet', action='count', default=0,
+                      help='N\'afficher que les avertissements et les erreurs des étapes')
+    parser.add_argument('--log-json', metavar='FICHIER',
+                      help='Écrire aussi les messages dans FICHIER, au format JSON (une ligne par message)')
+    parser.add_argument('--batch', nargs='+', metavar='CONFIG',
+                      help='Exécuter le pipeline pour chaque fichier de configuration (un portefeuille chacun)')
+    parser.add_argument('--batch-dir', metavar='DOSSIER',
+                      help='Avec --batch, dossier des données des portefeuilles et des caches partagés (défaut : data/batch)')
+    parser.add_argument('--batch-jobs', type=int, default=None,
+                      help='Avec --batch, nombre de portefeuilles traités en parallèle (défaut : un par cœur)')
+    parser.add_argument('--watch', action='store_true',
+                      help='Après le pipeline, surveiller la blockchain et rapprocher les nouvelles transactions')
+    parser.add_argument('--interval', type=float, default=60,
+                      help='Avec --watch, intervalle en secondes entre deux vérifications (défaut : 60)')
     
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs doit être supérieur ou égal à 1')
+    if args.interval <= 0:
+        parser.error('--interval doit être strictement positif')
+    if args.batch_jobs is not None and args.batch_jobs < 1:
+        parser.error('--batch-jobs doit être supérieur ou égal à 1')
+    if args.batch and args.watch:
+        parser.error('--watch ne peut pas être utilisé avec --batch')
+    setup_logging(args.verbose - args.quiet, args.log_json)
     
     try:
         if args.skip_invoices and args.start_step == 'invoices':
-            print("Attention: --skip-invoices est ignoré car --start-step=invoices est spécifié")
+            logger.warning("Attention: --skip-invoices est ignoré car --start-step=invoices est spécifié")
             args.skip_invoices = False
             
-        run_pipeline(start_step=args.start_step, only_step=args.only_step, skip_invoices=args.skip_invoices)
+        if args.batch:
+            if not run_batch(args.batch, args.batch_dir, args.batch_jobs, get_pipeline_args(args)):
+                sys.exit(1)
+            return
+
+        success = run_pipeline(start_step=args.start_step, only_step=args.only_step,
+                               skip_invoices=args.skip_invoices, jobs=args.jobs,
+                               profile=args.profile or args.cprofile, cprofile=args.cprofile, force=args.force,
+                               resume=args.resume, strict=args.strict)
+        if not success:
+            sys.exit(1)
+        if args.watch:
+            watch(args.interval)
     except KeyboardInterrupt:
-        print("\nInterruption par l'utilisateur")
+        logger.warning("\nInterruption par l'utilisateur")
         sys.exit(1)
     except Exception as e:
-        print(f"\nErreur inattendue: {str(e)}")
+        logger.exception("\nErreur inattendue: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,11 +1,19 @@
 #!/usr/bin/env python3
+import logging
 from datetime import datetime, timedelta
-from db import get_all_invoices, get_all_transactions, insert_purchase
+from db import get_all_invoices, get_all_transactions, insert_purchase, insert_purchases, get_invoices_between, read_snapshot
+from progress import ProgressReporter
+from journal import get_checkpoint, save_checkpoint
 import configparser
 import os
 from decimal import Decimal
 from utils import get_token_decimals, format_token_value, load_config
 
+logger = logging.getLogger(__name__)
+
+# Nombre de factures rapprochées entre deux points de reprise (achats écrits en un lot)
+CHECKPOINT_INVOICES = 25
+
 def parse_date(date_str):
     """Convertit une chaîne de date au format DD/MM/YYYY HH:MM:SS en objet datetime"""
     return datetime.strptime(date_str, '%d/%m/%Y %H:%M:%S')
@@ -31,7 +39,7 @@ def find_matching_transaction(product, invoice_date, transactions, wallet_addres
     try:
         invoice_datetime = datetime.strptime(invoice_date, '%B %d, %Y')
     except ValueError as e:
-        print(f"Erreur lors du parsing de la date de facture {invoice_date}: {e}")
+        logger.warning("Erreur lors du parsing de la date de facture %s: %s", invoice_date, e)
         return None
 
     # Fenêtre de recherche : de la date de facture à 120h après
@@ -128,6 +136,34 @@ def find_matching_transaction(product, invoice_date, transactions, wallet_addres
     
     return None
 
+def build_invoice_purchase(invoice_number, invoice_date, product, tx):
+    """Achat avec facture : un produit de la facture et la transaction associée"""
+    purchase_data = {
+        'invoice_number': invoice_number,
+        'invoice_date': invoice_date,
+        'product_address': product['address'],
+        'token_price_usd': float(product['token_price']),
+        'quantity': float(tx.get('total_quantity', tx['formatted_value'])),  # Utiliser la quantité totale si disponible
+        'transaction_hash': tx['hash'],
+        'token_symbol': tx['tokenSymbol'],
+        'token_name': tx['tokenName'],
+        'blockchain_date': tx['date'],
+        'source': 'invoice',
+        'matched_at': datetime.now().isoformat()
+    }
+    
+    # Stocker les sous-transactions si présentes
+    if 'sub_transactions' in tx:
+        purchase_data['sub_transactions'] = [
+            {
+                'hash': sub_tx['hash'],
+                'quantity': float(sub_tx['formatted_value']),
+                'date': sub_tx['date']
+            }
+            for sub_tx in tx['sub_transactions']
+        ]
+    return purchase_data
+
 def find_p2p_purchases(transactions, wallet_address, matched_tx_hashes):
     """
     Trouve les achats P2P dans les transactions:
@@ -142,8 +178,6 @@ def find_p2p_purchases(transactions, wallet_address, matched_tx_hashes):
     Returns:
         Liste des achats P2P trouvés
     """
-    print("\nRecherche des achats P2P...")
-    
     # Normaliser l'adresse du portefeuille
     wallet_address = wallet_address.lower()
     
@@ -208,35 +242,28 @@ def find_p2p_purchases(transactions, wallet_address, matched_tx_hashes):
                     }
                     p2p_purchases.append(purchase)
                     
-                    print(f"\nTrouvé achat P2P: {realt_tx['tokenSymbol']}")
-                    print(f"Montant payé: {payment_amount} {payment_tx['tokenSymbol']}")
-                    print(f"Tokens reçus: {realt_amount}")
-                    print(f"Prix par token: ${payment_amount / realt_amount:.2f}")
-                    print(f"Date: {realt_tx['date']}")
+                    logger.debug("Achat P2P trouvé: %s, %s tokens reçus pour %s %s ($%.2f/token) le %s",
+                                 realt_tx['tokenSymbol'], realt_amount, payment_amount, payment_tx['tokenSymbol'],
+                                 payment_amount / realt_amount, realt_tx['date'])
             except (ValueError, ZeroDivisionError) as e:
-                print(f"\nAttention: Erreur lors du traitement des montants dans la transaction {hash_id}: {str(e)}")
+                logger.warning("Erreur lors du traitement des montants dans la transaction %s: %s", hash_id, e)
     
+    logger.info("Achats P2P trouvés : %d", len(p2p_purchases), extra={'p2p_purchases': len(p2p_purchases)})
     return p2p_purchases
 
-def find_transfer_invoice(tx, invoices, matched_transactions):
+def find_transfer_invoice(tx, matched_transactions):
     """
     Recherche une facture correspondant à un transfert
     
     Args:
         tx: La transaction de transfert
-        invoices: Liste des factures
         matched_transactions: Liste des transactions déjà associées à des factures
     """
     transfer_date = parse_date(tx['date'])
     quantity = float(tx['formatted_value'])
     
-    for invoice in invoices:
-        invoice_date = datetime.strptime(invoice['order_info']['invoice_date'], '%B %d, %Y')
-        
-        # La facture doit être antérieure au transfert
-        if invoice_date >= transfer_date:
-            continue
-            
+    # La facture doit être antérieure au transfert (requête sur l'index des dates)
+    for invoice in get_invoices_between(end=transfer_date):
         for product in invoice['products']:
             # Vérifier la quantité
             if abs(float(product['quantity']) - quantity) >= 0.0001:
@@ -265,14 +292,12 @@ def find_transfers(transactions, wallet_address, old_wallet_address):
         wallet_address: L'adresse du portefeuille actuel
         old_wallet_address: L'ancienne adresse du portefeuille
     """
-    print("\nRecherche des transferts de tokens...")
-    
     # Normaliser les adresses
     wallet_address = wallet_address.lower()
     old_wallet_address = old_wallet_address.lower()
     
     # Obtenir les factures et les transactions déjà matchées
-    invoices = get_all_invoices()
+    invoices = read_snapshot('invoices')
     matched_transactions = set()
     for invoice in invoices:
         for tx in invoice.get('transactions', []):
@@ -290,7 +315,7 @@ def find_transfers(transactions, wallet_address, old_wallet_address):
             tx.get('tokenSymbol', '').startswith('REALTOKEN-')):
             
             # Rechercher une facture correspondante
-            product, invoice = find_transfer_invoice(tx, invoices, matched_transactions)
+            product, invoice = find_transfer_invoice(tx, matched_transactions)
             
             transfer = {
                 'token_symbol': tx['tokenSymbol'],
@@ -306,13 +331,11 @@ def find_transfers(transactions, wallet_address, old_wallet_address):
             }
             transfers.append(transfer)
             
-            price_info = f" (prix facture: ${product['token_price']:.2f})" if product else " (facture non trouvée)"
-            print(f"\nTransfert trouvé: {tx['tokenSymbol']}")
-            print(f"Quantité: {tx['formatted_value']} tokens{price_info}")
-            print(f"Date transfert: {tx['date']}")
-            if invoice:
-                print(f"Date facture: {invoice['order_info']['invoice_date']}")
+            logger.debug("Transfert trouvé: %s, %s tokens le %s, facture: %s",
+                         tx['tokenSymbol'], tx['formatted_value'], tx['date'],
+                         invoice['order_info']['invoice_date'] if invoice else 'non trouvée')
     
+    logger.info("Transferts trouvés : %d", len(transfers), extra={'transfers': len(transfers)})
     return transfers
 
 def find_p2p_transactions(transactions, wallet_address):
@@ -430,19 +453,41 @@ def match_purchases():
             if transfer.get('invoice_number'):
                 transfer_invoice_numbers.add(transfer['invoice_number'])
     
-    print("\nTraitement des factures...")
+    # Reprise (--resume) : les factures déjà traitées lors de l'exécution interrompue
+    # ont leurs achats en base, seules leurs transactions sont à exclure des achats P2P
+    done_invoices = set(get_checkpoint('purchases').get('invoices', []))
+    if done_invoices:
+        logger.info("Reprise : %d factures déjà traitées", len(done_invoices))
+        matched_tx_hashes.update(p['transaction_hash'] for p in read_snapshot('purchases')
+                                 if p.get('source') == 'invoice' and p.get('invoice_number') in done_invoices)
+
+    logger.info("Traitement de %d factures...", len(invoices))
+    progress = ProgressReporter('purchases', 'factures rapprochées', total=len(invoices))
+    # Achats des factures traitées depuis le dernier point de reprise
+    pending_purchases = []
+    processed_invoices = 0
+
+    def save_pending():
+        # Les achats sont enregistrés avant le point de reprise qui marque leurs factures
+        insert_purchases(pending_purchases)
+        save_checkpoint('purchases', invoices=list(done_invoices))
+        pending_purchases.clear()
+
     # Traiter les factures
     for invoice in invoices:
+        progress.update()
         # Vérifier que nous avons toutes les informations nécessaires
         if not all(k in invoice['order_info'] for k in ['invoice_number', 'invoice_date']):
-            print(f"Facture invalide, informations manquantes: {invoice['order_info']}")
+            logger.warning("Facture invalide, informations manquantes: %s", invoice['order_info'])
             unmatched_count += 1
             continue
             
         invoice_number = invoice['order_info']['invoice_number']
         invoice_date = invoice['order_info']['invoice_date']
+        if invoice_number in done_invoices:
+            continue
         
-        print(f"\nTraitement de la facture {invoice_number} du {invoice_date}")
+        logger.debug("Traitement de la facture %s du %s", invoice_number, invoice_date)
         
         # Traiter chaque produit de la facture
         for product in invoice.get('products', []):
@@ -453,70 +498,103 @@ def match_purchases():
                 matched_tx_hashes.add(tx['hash'])
                 
                 # Créer l'entrée dans la base de données des achats
-                purchase_data = {
-                    'invoice_number': invoice_number,
-                    'invoice_date': invoice_date,
-                    'product_address': product['address'],
-                    'token_price_usd': float(product['token_price']),
-                    'quantity': float(tx.get('total_quantity', tx['formatted_value'])),  # Utiliser la quantité totale si disponible
-                    'transaction_hash': tx['hash'],
-                    'token_symbol': tx['tokenSymbol'],
-                    'token_name': tx['tokenName'],
-                    'blockchain_date': tx['date'],
-                    'source': 'invoice',
-                    'matched_at': datetime.now().isoformat()
-                }
-                
-                # Stocker les sous-transactions si présentes
-                if 'sub_transactions' in tx:
-                    purchase_data['sub_transactions'] = [
-                        {
-                            'hash': sub_tx['hash'],
-                            'quantity': float(sub_tx['formatted_value']),
-                            'date': sub_tx['date']
-                        }
-                        for sub_tx in tx['sub_transactions']
-                    ]
-                
-                insert_purchase(purchase_data)
+                purchase_data = build_invoice_purchase(invoice_number, invoice_date, product, tx)
+                pending_purchases.append(purchase_data)
                 matched_count += 1
-                print(f"✓ Purchase enregistré: {purchase_data['quantity']} tokens pour {purchase_data['token_price_usd']}$")
+                logger.debug("✓ Purchase enregistré: %s tokens pour %s$",
+                             purchase_data['quantity'], purchase_data['token_price_usd'])
             else:
                 unmatched_count += 1
-                print(f"\n✗ Facture sans correspondance :")
-                print(f"  Numéro de facture : {invoice_number}")
-                print(f"  Date de facture : {invoice_date}")
-                print(f"  Adresse : {product['address']}")
-                print(f"  Quantité : {product['quantity']} tokens")
-                print(f"  Prix : ${product['token_price']}")
-    
+                logger.debug("✗ Facture sans correspondance : facture %s du %s, %s, %s tokens à $%s",
+                             invoice_number, invoice_date, product['address'], product['quantity'],
+                             product['token_price'])
+        
+        # Point de reprise toutes les CHECKPOINT_INVOICES factures
+        done_invoices.add(invoice_number)
+        processed_invoices += 1
+        if processed_invoices % CHECKPOINT_INVOICES == 0:
+            save_pending()
+    
+    if processed_invoices % CHECKPOINT_INVOICES:
+        save_pending()
+    progress.done()
+
     # Identifier les transactions P2P
-    print("\nRecherche des achats P2P...")
     p2p_purchases = find_p2p_purchases(transactions, wallet_address, matched_tx_hashes)
     
-    # Enregistrer les transactions P2P dans la base de données
-    for p2p in p2p_purchases:
-        insert_purchase(p2p)
-    
-    # Enregistrer les transferts dans la base de données
-    for transfer in transfers:
-        insert_purchase(transfer)
+    # Enregistrer les transactions P2P et les transferts dans la base de données (un seul lot)
+    insert_purchases(p2p_purchases + transfers)
     
     # Statistiques finales
     p2p_count = len(p2p_purchases)
     transfer_count = len(transfers)
     transfer_with_invoice = sum(1 for t in transfers if t.get('invoice_number'))
     
-    print(f"\nRésultat de la correspondance :")
-    print(f"  Achats avec facture trouvés : {matched_count}")
-    print(f"  Achats P2P trouvés : {p2p_count}")
-    print(f"  Transferts trouvés : {transfer_count}")
-    print(f"    dont {transfer_with_invoice} avec facture")
-    print(f"  Factures sans correspondance : {unmatched_count}")
+    logger.info("\nRésultat de la correspondance :\n"
+                "  Achats avec facture trouvés : %d\n"
+                "  Achats P2P trouvés : %d\n"
+                "  Transferts trouvés : %d\n"
+                "    dont %d avec facture\n"
+                "  Factures sans correspondance : %d",
+                matched_count, p2p_count, transfer_count, transfer_with_invoice, unmatched_count,
+                extra={'matched': matched_count, 'p2p': p2p_count, 'transfers': transfer_count,
+                       'unmatched': unmatched_count})
+
+def reconcile_new_transactions(new_transactions, config=None):
+    """
+    Rapprochement incrémental (mode --watch) : seules les transactions nouvellement
+    récupérées sont associées aux factures, aux achats P2P et aux transferts.
+    Les produits de facture déjà associés à un achat sont ignorés, et seules les factures
+    dont la fenêtre de recherche (120h après la facture) couvre une nouvelle transaction
+    sont examinées.
+
+    Returns:
+        list: Les achats enregistrés
+    """
+    if not new_transactions:
+        return []
+    config = config or load_config()
+    wallet_address = config['DEFAULT']['gnosis_address']
+    old_wallet_address = config['DEFAULT'].get('old_gnosis_address')
+
+    purchases = read_snapshot('purchases')
+    matched_tx_hashes = {p['transaction_hash'] for p in purchases if p.get('transaction_hash')}
+    matched_products = {(p.get('invoice_number'), p.get('product_address'))
+                        for p in purchases if p.get('source') == 'invoice'}
+    new_purchases = []
+
+    dates = [parse_date(tx['date']) for tx in new_transactions if tx.get('date')]
+    if dates:
+        start = (min(dates) - timedelta(hours=120)).replace(hour=0, minute=0, second=0)
+        for invoice in get_invoices_between(start, max(dates) + timedelta(days=1)):
+            order_info = invoice.get('order_info', {})
+            if not all(k in order_info for k in ['invoice_number', 'invoice_date']):
+                continue
+            invoice_number = order_info['invoice_number']
+            for product in invoice.get('products', []):
+                if (invoice_number, product['address']) in matched_products:
+                    continue
+                tx = find_matching_transaction(product, order_info['invoice_date'], new_transactions, wallet_address)
+                if tx and tx['hash'] not in matched_tx_hashes:
+                    purchase_data = build_invoice_purchase(invoice_number, order_info['invoice_date'], product, tx)
+                    matched_tx_hashes.add(tx['hash'])
+                    matched_products.add((invoice_number, product['address']))
+                    new_purchases.append(purchase_data)
+                    logger.debug("✓ Purchase enregistré: facture %s, %s tokens pour %s$",
+                                 invoice_number, purchase_data['quantity'], purchase_data['token_price_usd'])
+
+    new_purchases.extend(find_p2p_purchases(new_transactions, wallet_address, matched_tx_hashes))
+    if old_wallet_address:
+        # Transferts déjà enregistrés (même bloc vu deux fois) : ignorés
+        transfers = [tx for tx in new_transactions if tx['hash'] not in matched_tx_hashes]
+        new_purchases.extend(find_transfers(transfers, wallet_address, old_wallet_address))
+
+    insert_purchases(new_purchases)
+    return new_purchases
 
 def main():
     """Trouve et enregistre tous les achats de tokens RealT"""
-    print("\nDébut du matching des achats...")
+    logger.info("\nDébut du matching des achats...")
     
     # Charger les données
     invoices = get_all_invoices()
@@ -528,8 +606,8 @@ def main():
     config.read(config_path)
     wallet_address = config['DEFAULT']['gnosis_address']
     
-    print(f"\nTraitement de {len(invoices)} factures...")
-    print(f"Nombre total de transactions: {len(transactions)}")
+    logger.info("\nTraitement de %d factures...", len(invoices))
+    logger.info("Nombre total de transactions: %d", len(transactions))
     
     # Set pour suivre les transactions déjà matchées
     matched_tx_hashes = set()
@@ -540,7 +618,7 @@ def main():
         if not order_info:
             continue
         
-        print(f"\nTraitement de la facture {order_info.get('invoice_number', 'N/A')}")
+        logger.debug("Traitement de la facture %s", order_info.get('invoice_number', 'N/A'))
         invoice_date = order_info.get('invoice_date')
         
         # Parcourir chaque produit de la facture
@@ -565,7 +643,7 @@ def main():
                 
                 # Insérer l'achat
                 insert_purchase(purchase)
-                print(f"✓ Achat enregistré: {product['quantity']} {tx['tokenSymbol']} à ${product['token_price']}/token")
+                logger.debug("✓ Achat enregistré: %s %s à $%s/token", product['quantity'], tx['tokenSymbol'], product['token_price'])
                 
                 # Marquer toutes les transactions associées comme matchées
                 if 'transactions' in tx:
@@ -574,7 +652,7 @@ def main():
                 else:
                     matched_tx_hashes.add(tx['hash'])
             else:
-                print(f"✗ Pas de transaction trouvée pour l'achat de {product['quantity']} tokens à {product['address']}")
+                logger.debug("✗ Pas de transaction trouvée pour l'achat de %s tokens à %s", product['quantity'], product['address'])
     
     # Chercher les achats P2P
     p2p_purchases = find_p2p_purchases(transactions, wallet_address, matched_tx_hashes)
@@ -582,10 +660,13 @@ def main():
     # Insérer les achats P2P
     for purchase in p2p_purchases:
         insert_purchase(purchase)
-        print(f"✓ Achat P2P enregistré: {purchase['quantity']} {purchase['token_symbol']} à ${purchase['token_price_usd']}/token")
+        logger.debug("✓ Achat P2P enregistré: %s %s à $%s/token",
+                     purchase['quantity'], purchase['token_symbol'], purchase['token_price_usd'])
         
     # Afficher le récapitulatif
     print_summary(invoices, matched_tx_hashes, p2p_purchases)
 
 if __name__ == "__main__":
+    from logs import setup_logging
+    setup_logging()
     main()
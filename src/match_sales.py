@@ -1,10 +1,9 @@
 import json
 import os
-import configparser
-from datetime import datetime
-import os
-import json
-import configparser
+import logging
+from progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
 
 def get_project_root():
     """Retourne le chemin absolu vers la racine du projet"""
@@ -23,7 +22,7 @@ def load_json_file(relative_path):
     Charge un fichier JSON en utilisant un chemin relatif à la racine du projet
     
     Args:
-        relative_path: Chemin relatif depuis la racine du projet (ex: 'data/purchases.json')
+        relative_path: Chemin relatif depuis la racine du projet (ex: 'data/purchases.json'), ou absolu
     """
     filepath = os.path.join(get_project_root(), relative_path)
     with open(filepath, 'r') as f:
@@ -32,25 +31,13 @@ def load_json_file(relative_path):
             return data.get('_default', {})
         return data
 
-def save_json_file(relative_path, data):
-    """
-    Sauvegarde des données dans un fichier JSON en utilisant un chemin relatif à la racine du projet
-    
-    Args:
-        relative_path: Chemin relatif depuis la racine du projet (ex: 'data/sales.json')
-    """
-    filepath = os.path.join(get_project_root(), relative_path)
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=4)
-
 def find_sale_pairs(transactions, user_address):
     """
     Trouve les paires de transactions qui constituent une vente:
     - Une transaction sortante de token RealT
     - Une transaction entrante de USDC/WXDAI avec le même hash (même transaction de swap)
     """
-    print("\nDebug: Looking for sales...")
-    print(f"Debug: User address: {user_address}")
+    logger.debug("Looking for sales, user address: %s", user_address)
     
     # Organiser les transactions par hash
     tx_by_hash = {}
@@ -70,26 +57,20 @@ def find_sale_pairs(transactions, user_address):
         tx['to'] = tx['to'].lower()
         
         # Compter les transactions intéressantes
-        if tx['from'].lower() == user_address.lower() and tx['tokenSymbol'].startswith('REALTOKEN-'):
+        if tx['from'] == user_address and tx['tokenSymbol'].startswith('REALTOKEN-'):
             realt_out_count += 1
-            #print(f"\nDebug: Found RealToken outgoing tx:")
-            #print(f"Hash: {tx['hash']}")
-            #print(f"Token: {tx['tokenSymbol']}")
-            #print(f"Amount: {tx.get('formatted_value', 'N/A')}")
             
-        if tx['to'].lower() == user_address.lower() and tx['tokenSymbol'] in ['USDC', 'WXDAI']:
+        if tx['to'] == user_address and tx['tokenSymbol'] in ['USDC', 'WXDAI']:
             usdc_in_count += 1
-            #print(f"\nDebug: Found USDC/WXDAI incoming tx:")
-            #print(f"Hash: {tx['hash']}")
-            #print(f"Amount: {tx.get('formatted_value', 'N/A')} {tx['tokenSymbol']}")
 
         hash_id = tx['hash']
         if hash_id not in tx_by_hash:
             tx_by_hash[hash_id] = []
         tx_by_hash[hash_id].append(tx)
     
-    print(f"\nDebug: Found {realt_out_count} RealToken outgoing transactions")
-    print(f"Debug: Found {usdc_in_count} USDC/WXDAI incoming transactions")
+    logger.info("Found %d RealToken outgoing transactions, %d USDC/WXDAI incoming transactions",
+                realt_out_count, usdc_in_count,
+                extra={'realt_out': realt_out_count, 'payment_in': usdc_in_count})
     
     # Trouver les paires qui constituent des ventes
     sale_pairs = {}
@@ -103,12 +84,12 @@ def find_sale_pairs(transactions, user_address):
         # Chercher la paire RealToken sortant + USDC/WXDAI entrant
         for tx in txs:
             # Transaction sortante de RealToken
-            if (tx['from'].lower() == user_address.lower() and 
+            if (tx['from'] == user_address and 
                 tx['tokenSymbol'].startswith('REALTOKEN-')):
                 realt_tx = tx
                 
             # Transaction entrante de USDC/WXDAI
-            elif (tx['to'].lower() == user_address.lower() and 
+            elif (tx['to'] == user_address and 
                   tx['tokenSymbol'] in ['USDC', 'WXDAI']):
                 payment_tx = tx
         
@@ -125,17 +106,14 @@ def find_sale_pairs(transactions, user_address):
                         'payment': payment_tx,
                         'price_per_token': payment_amount / realt_amount
                     }
-                    print(f"\nFound sale: {realt_tx['tokenSymbol']}")
-                    print(f"Amount received: {payment_amount} {payment_tx['tokenSymbol']}")
-                    print(f"Amount sold: {realt_amount} tokens")
-                    print(f"Price per token: ${payment_amount / realt_amount:.2f}")
-                    print(f"Date: {realt_tx['date']}")
+                    logger.debug("Found sale: %s, %s tokens sold for %s %s ($%.2f per token) on %s",
+                                 realt_tx['tokenSymbol'], realt_amount, payment_amount, payment_tx['tokenSymbol'],
+                                 payment_amount / realt_amount, realt_tx['date'])
                 else:
-                    print(f"\nWarning: Invalid amounts in transaction {hash_id}")
-                    print(f"RealToken amount: {realt_amount}")
-                    print(f"Payment amount: {payment_amount}")
+                    logger.warning("Invalid amounts in transaction %s (RealToken amount: %s, payment amount: %s)",
+                                   hash_id, realt_amount, payment_amount)
             except (ValueError, ZeroDivisionError) as e:
-                print(f"\nWarning: Error processing amounts in transaction {hash_id}: {str(e)}")
+                logger.warning("Error processing amounts in transaction %s: %s", hash_id, e)
     
     return sale_pairs
 
@@ -143,15 +121,19 @@ def calculate_roi(buy_price, sell_price):
     """Calcule le ROI en pourcentage"""
     return ((sell_price - buy_price) / buy_price) * 100
 
-def match_sales_with_purchases(purchases, sale_pairs):
+def match_sales_with_purchases(purchases, sale_pairs, sold_quantities=None):
     """
     Associe les ventes avec les achats correspondants et calcule le ROI.
     Gère les ventes partielles en gardant une trace des quantités restantes.
+
+    Args:
+        purchases: {id de l'achat: achat}
+        sale_pairs: Paires de vente (voir find_sale_pairs)
+        sold_quantities: {id de l'achat: quantité déjà vendue} par des ventes enregistrées
     """
-    print("\nDebug: Matching sales with purchases...")
     sales = []
-    total_invested = 0
-    total_received = 0
+    unmatched_count = 0
+    skipped_count = 0
     
     # Copier les achats pour garder une trace des quantités restantes
     remaining_purchases = {}
@@ -159,18 +141,18 @@ def match_sales_with_purchases(purchases, sale_pairs):
         if purchase.get('quantity') is not None:
             remaining_purchases[pid] = {
                 **purchase,
-                'remaining_quantity': float(purchase['quantity'])
+                'remaining_quantity': float(purchase['quantity']) - (sold_quantities or {}).get(pid, 0)
             }
     
+    progress = ProgressReporter('sales', 'ventes analysées', total=len(sale_pairs))
     for hash_id, pair in sale_pairs.items():
+        progress.update()
         realt_tx = pair['realt']
         payment_tx = pair['payment']
         token_symbol = realt_tx['tokenSymbol']
         sale_quantity = float(realt_tx['formatted_value'])
         
-        print(f"\nProcessing sale transaction: {hash_id}")
-        print(f"Token: {token_symbol}")
-        print(f"Sale quantity: {sale_quantity}")
+        logger.debug("Processing sale transaction %s: %s %s", hash_id, sale_quantity, token_symbol)
         
         # Chercher l'achat correspondant avec une quantité suffisante
         matching_purchase = None
@@ -185,12 +167,13 @@ def match_sales_with_purchases(purchases, sale_pairs):
                 break
         
         if matching_purchase:
-            print(f"Found matching purchase from {matching_purchase.get('blockchain_date', 'unknown date')}")
-            print(f"Remaining quantity before sale: {matching_purchase['remaining_quantity']}")
+            logger.debug("  matching purchase from %s, remaining quantity before sale: %s",
+                         matching_purchase.get('blockchain_date', 'unknown date'), matching_purchase['remaining_quantity'])
             
             # Vérifier que toutes les valeurs nécessaires sont présentes
             if not all(key in matching_purchase for key in ['token_price_usd', 'product_address']):
-                print(f"Warning: Purchase is missing required data: {matching_purchase}")
+                logger.warning("Purchase is missing required data for sale %s: %s", hash_id, matching_purchase)
+                skipped_count += 1
                 continue
                 
             try:
@@ -200,20 +183,21 @@ def match_sales_with_purchases(purchases, sale_pairs):
                 
                 # Pour les achats P2P, on n'a pas le prix d'achat
                 if matching_purchase['source'] == 'p2p' and matching_purchase.get('token_price_usd') is None:
-                    print(f"P2P purchase without price information - skipping ROI calculation")
+                    logger.debug("  P2P purchase without price information - skipping ROI calculation")
+                    skipped_count += 1
                     continue
                     
                 buy_price = float(matching_purchase['token_price_usd'])
                 
                 # Mettre à jour la quantité restante
                 remaining_purchases[purchase_id_matched]['remaining_quantity'] -= sale_quantity
-                print(f"Updated remaining quantity: {remaining_purchases[purchase_id_matched]['remaining_quantity']}")
                 
                 sale = {
                     'token_symbol': token_symbol,
                     'token_name': realt_tx['tokenName'],
                     'product_address': matching_purchase['product_address'],
                     'sale_hash': hash_id,
+                    'purchase_id': purchase_id_matched,
                     'purchase_date': matching_purchase['blockchain_date'],
                     'sale_date': realt_tx['date'],
                     'buy_price': buy_price,
@@ -226,37 +210,100 @@ def match_sales_with_purchases(purchases, sale_pairs):
                 }
                 sales.append(sale)
                 
-                print(f"Successfully processed sale:")
-                print(f"Buy price: ${buy_price:.2f}")
-                print(f"Sell price: ${sell_price:.2f}")
-                print(f"ROI: {sale['roi_percent']:.2f}%")
+                logger.debug("  buy price $%.2f, sell price $%.2f, ROI %.2f%%, remaining quantity %s",
+                             buy_price, sell_price, sale['roi_percent'],
+                             remaining_purchases[purchase_id_matched]['remaining_quantity'])
             except (TypeError, ValueError) as e:
-                print(f"Error processing sale {hash_id}: {str(e)}")
-                print(f"RealT tx: {realt_tx}")
-                print(f"Payment tx: {payment_tx}")
-                print(f"Matching purchase: {matching_purchase}")
+                logger.warning("Error processing sale %s: %s (RealT tx: %s, payment tx: %s, purchase: %s)",
+                               hash_id, e, realt_tx, payment_tx, matching_purchase)
+                skipped_count += 1
         else:
-            print(f"No matching purchase found for {token_symbol} (quantity: {sale_quantity})")
+            unmatched_count += 1
+            logger.debug("  no matching purchase found for %s (quantity: %s)", token_symbol, sale_quantity)
             # Liste les achats disponibles pour ce token pour debug
-            available_purchases = [p for p in remaining_purchases.values() 
-                                if p.get('token_symbol') == token_symbol and p.get('remaining_quantity', 0) > 0]
-            if available_purchases:
-                print("Available purchases for this token:")
-                for p in available_purchases:
-                    print(f"- Quantity: {p.get('remaining_quantity')} from {p.get('blockchain_date', 'unknown')}")
+            if logger.isEnabledFor(logging.DEBUG):
+                for p in remaining_purchases.values():
+                    if p.get('token_symbol') == token_symbol and p.get('remaining_quantity', 0) > 0:
+                        logger.debug("  - available purchase: %s from %s",
+                                     p.get('remaining_quantity'), p.get('blockchain_date', 'unknown'))
     
+    progress.done()
+    logger.info("%d sales matched with a purchase, %d without matching purchase, %d skipped",
+                len(sales), unmatched_count, skipped_count,
+                extra={'matched': len(sales), 'unmatched': unmatched_count, 'skipped': skipped_count})
     return sales
 
+def summarize_roi(sales):
+    """
+    Résumé du ROI des ventes : totaux globaux et par token.
+
+    Returns:
+        dict: {'sales_count', 'total_invested', 'total_received', 'roi_percent', 'by_token'}
+    """
+    def new_summary():
+        return {'sales_count': 0, 'quantity': 0.0, 'total_invested': 0.0, 'total_received': 0.0}
+
+    summary = new_summary()
+    by_token = {}
+    for sale in sales:
+        invested = sale['buy_price'] * sale['quantity']
+        for entry in (summary, by_token.setdefault(sale['token_symbol'], new_summary())):
+            entry['sales_count'] += 1
+            entry['quantity'] += sale['quantity']
+            entry['total_invested'] += invested
+            entry['total_received'] += sale['total_received']
+
+    for entry in [summary, *by_token.values()]:
+        invested = entry['total_invested']
+        entry['roi_percent'] = ((entry['total_received'] - invested) / invested) * 100 if invested else None
+    summary['by_token'] = by_token
+    return summary
+
+def reconcile_new_sales(new_transactions, user_address=None):
+    """
+    Analyse incrémentale des ventes (mode --watch) : seules les paires de vente des
+    transactions nouvellement récupérées sont associées aux achats, en tenant compte
+    des quantités déjà vendues par les ventes enregistrées.
+    Si des ventes enregistrées n'indiquent pas leur achat (ancien format), toutes les
+    ventes sont recalculées.
+
+    Returns:
+        list: Les ventes ajoutées
+    """
+    from db import save_sales, read_snapshot, read_snapshot_by_id
+
+    sales = read_snapshot('sales')
+    known = {sale['sale_hash'] for sale in sales}
+    if any('purchase_id' not in sale for sale in sales):
+        logger.info("Sales recorded without a purchase id: full recompute of the sales")
+        main()
+        return [sale for sale in read_snapshot('sales') if sale['sale_hash'] not in known]
+
+    sale_pairs = {hash_id: pair for hash_id, pair in find_sale_pairs(new_transactions, user_address or load_config()).items()
+                  if hash_id not in known}
+    if not sale_pairs:
+        return []
+
+    sold_quantities = {}
+    for sale in sales:
+        sold_quantities[sale['purchase_id']] = sold_quantities.get(sale['purchase_id'], 0) + sale['quantity']
+    new_sales = match_sales_with_purchases(read_snapshot_by_id('purchases'), sale_pairs, sold_quantities)
+    if new_sales:
+        save_sales(sales + new_sales)
+    return new_sales
+
 def main():
+    from db import save_sales, get_store_path
+
     # Charger l'adresse de l'utilisateur
     user_address = load_config()
-    print(f"Using wallet address: {user_address}")
+    logger.info("Using wallet address: %s", user_address)
     
     # Charger les données
-    purchases = load_json_file('data/purchases.json')
-    print(f"\nLoaded {len(purchases)} purchases")
+    purchases = load_json_file(get_store_path('purchases'))
+    logger.info("Loaded %d purchases", len(purchases))
     
-    transactions_data = load_json_file('data/transactions.json')['_default']
+    transactions_data = load_json_file(get_store_path('transactions'))['_default']
     transactions = []
     for tx_id, tx in transactions_data.items():
         if not isinstance(tx, dict):
@@ -265,30 +312,30 @@ def main():
             continue
         transactions.append(tx)
     
-    print(f"\nProcessing {len(transactions)} transactions")
+    logger.info("Processing %d transactions", len(transactions))
     
     # Trouver les paires de transactions de vente
     sale_pairs = find_sale_pairs(transactions, user_address)
-    print(f"\nFound {len(sale_pairs)} sale pairs")
+    logger.info("Found %d sale pairs", len(sale_pairs))
     
     # Faire correspondre les ventes avec les achats et calculer le ROI
     sales = match_sales_with_purchases(purchases, sale_pairs)
     
     # Sauvegarder les résultats
-    save_json_file('data/sales.json', sales)
+    # (et mettre à jour les agrégats du portefeuille)
+    save_sales(sales)
     
     # Afficher un résumé global
     if sales:
-        total_invested = sum(sale['buy_price'] * sale['quantity'] for sale in sales)
-        total_received = sum(sale['total_received'] for sale in sales)
-        total_roi = ((total_received - total_invested) / total_invested) * 100
+        summary = summarize_roi(sales)
         
-        print(f"\nSummary of {len(sales)} sales:")
-        print(f"Total invested: ${total_invested:.2f}")
-        print(f"Total received: ${total_received:.2f}")
-        print(f"Overall ROI: {total_roi:.2f}%")
+        logger.info("\nSummary of %d sales:\nTotal invested: $%.2f\nTotal received: $%.2f\nOverall ROI: %.2f%%",
+                    len(sales), summary['total_invested'], summary['total_received'], summary['roi_percent'],
+                    extra={'sales': len(sales), 'roi_percent': summary['roi_percent']})
     else:
-        print("\nNo sales found")
+        logger.info("\nNo sales found")
 
 if __name__ == "__main__":
+    from logs import setup_logging
+    setup_logging()
     main()
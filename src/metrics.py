@@ -0,0 +1,103 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Compteurs du processus : appels d'API, octets lus/écrits dans les stores, éléments traités...
+_counters = Counter()
+_lock = threading.Lock()
+
+def incr(name, value=1):
+    """Incrémente un compteur (coût négligeable, toujours actif)"""
+    with _lock:
+        _counters[name] += value
+
+def get_counters():
+    """Copie des compteurs courants"""
+    with _lock:
+        return dict(_counters)
+
+class StepProfile:
+    """
+    Mesure d'une étape du pipeline, utilisée comme context manager :
+    durée, temps CPU (processus et processus enfants), pic mémoire Python (tracemalloc)
+    et évolution des compteurs pendant l'étape. Si `cprofile_path` est fourni, l'étape
+    est aussi profilée avec cProfile (thread courant uniquement) et le profil y est écrit.
+
+    Les compteurs et le temps CPU sont ceux du processus entier : les étapes mesurées
+    doivent donc s'exécuter l'une après l'autre.
+    """
+
+    def __init__(self, step, cprofile_path=None):
+        self.step = step
+        self.cprofile_path = cprofile_path
+        self.record = None
+        self._profiler = None
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._counters = get_counters()
+        self._times = os.times()
+        self._start = time.monotonic()
+        if self.cprofile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(os.path.dirname(self.cprofile_path), exist_ok=True)
+            self._profiler.dump_stats(self.cprofile_path)
+        wall = time.monotonic() - self._start
+        times = os.times()
+        _, peak = tracemalloc.get_traced_memory()
+        before = self._counters
+        counters = {name: value - before.get(name, 0) for name, value in get_counters().items()
+                    if value != before.get(name, 0)}
+
+        self.record = {
+            'step': self.step,
+            'status': 'error' if exc_type else 'ok',
+            'wall_time': wall,
+            'cpu_time': (times.user - self._times.user) + (times.system - self._times.system),
+            'children_cpu_time': ((times.children_user - self._times.children_user) +
+                                  (times.children_system - self._times.children_system)),
+            'peak_memory': peak,
+            'api_calls': counters.pop('api_calls', 0),
+            'http_requests': counters.pop('http_requests', 0),
+            'db_read_bytes': counters.pop('db_read_bytes', 0),
+            'db_write_bytes': counters.pop('db_write_bytes', 0),
+            # Éléments traités, par libellé des ProgressReporter de l'étape
+            'items': {name[len('items:'):]: value for name, value in counters.items() if name.startswith('items:')},
+            'counters': {name: value for name, value in counters.items() if not name.startswith('items:')},
+        }
+        if self.cprofile_path:
+            self.record['cprofile'] = self.cprofile_path
+        return False
+
+def write_report(records, path):
+    """Écrit le rapport JSON d'une exécution profilée"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    report = {'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'steps': records}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+def print_report(records):
+    """Affiche un résumé des mesures de chaque étape"""
+    print("\n" + "="*50)
+    print("PROFIL DES ÉTAPES")
+    print("="*50)
+    print(f"{'Étape':<12} {'Durée':>8} {'CPU':>8} {'CPU enf.':>9} {'Mémoire':>10} {'API':>5} {'HTTP':>5} "
+          f"{'Lu (Ko)':>9} {'Écrit (Ko)':>11}")
+    for r in records:
+        print(f"{r['step']:<12} {r['wall_time']:>7.2f}s {r['cpu_time']:>7.2f}s {r['children_cpu_time']:>8.2f}s "
+              f"{r['peak_memory'] / 1024 / 1024:>8.1f}Mo {r['api_calls']:>5} {r['http_requests']:>5} "
+              f"{r['db_read_bytes'] / 1024:>9.0f} {r['db_write_bytes'] / 1024:>11.0f}")
+        for label, count in sorted(r['items'].items()):
+            print(f"{'':<12} {count} {label}")
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from db import get_data_dir
+from metrics import incr
+
+logger = logging.getLogger(__name__)
+
+# Intervalle minimal (secondes) entre deux événements de progression d'une même étape
+DEFAULT_INTERVAL = 1.0
+
+_lock = threading.Lock()
+
+def get_progress_path():
+    """Fichier des événements du pipeline (une ligne JSON par événement), lu par le viewer"""
+    return os.path.join(get_data_dir(), 'progress.jsonl')
+
+def reset_progress():
+    """
+    Repart d'un fichier des événements vide au début d'une exécution du pipeline.
+    Le fichier est remplacé (nouvel inode) plutôt que tronqué : un lecteur qui le suit
+    détecte ainsi la nouvelle exécution.
+    """
+    path = get_progress_path()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with _lock:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.progress.', suffix='.tmp')
+        os.close(fd)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+def publish(event_type, **fields):
+    """
+    Ajoute un événement au fichier des événements.
+    Chaque événement est écrit en une seule écriture en mode ajout : un lecteur
+    ne voit jamais une ligne mélangée avec une autre.
+    """
+    event = {'type': event_type, 'time': time.time(), **fields}
+    line = (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+    path = get_progress_path()
+    try:
+        with _lock:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+    except OSError as e:
+        # La progression n'est qu'informative : ne jamais interrompre le pipeline
+        logger.warning("Impossible de publier la progression : %s", e)
+
+class ProgressReporter:
+    """
+    Suivi de l'avancement d'une étape : compte les éléments traités et publie au plus
+    un événement `progress` toutes les `interval` secondes, avec le débit et l'ETA
+    (si le total est connu).
+    """
+
+    def __init__(self, step, label, total=None, interval=DEFAULT_INTERVAL):
+        self.step = step
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.count = 0
+        self.start = time.monotonic()
+        self._last_publish = None
+        self._lock = threading.Lock()
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+        self._publish(force=True)
+
+    def update(self, count=1):
+        """Ajoute `count` éléments traités"""
+        with self._lock:
+            self.count += count
+        incr(f'items:{self.label}', count)
+        self._publish()
+
+    def done(self):
+        """Publie l'état final (toujours, quel que soit l'intervalle)"""
+        self._publish(force=True)
+
+    def _publish(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._last_publish is not None and now - self._last_publish < self.interval:
+                return
+            self._last_publish = now
+            elapsed = now - self.start
+            rate = self.count / elapsed if elapsed > 0 else None
+            eta = None
+            if self.total is not None and rate:
+                eta = max(0.0, (self.total - self.count) / rate)
+            fields = {
+                'step': self.step,
+                'label': self.label,
+                'count': self.count,
+                'total': self.total,
+                'rate': rate,
+                'eta': eta,
+                'elapsed': elapsed,
+            }
+        publish('progress', **fields)
@@ -1,182 +1,57 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 import time
 import configparser
+import json
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
 import requests
-from webdriver_manager.chrome import ChromeDriverManager
-from utils import parse_invoice_pdf, store_invoice_data, load_config  # Ajouter ces imports
-# Importer la bibliothèque pour générer des User-Agents aléatoires
-from fake_useragent import UserAgent
-ua = UserAgent()
-
-# Load configuration
-config = load_config()
-
-# Configure Chrome options for robust headless operation
-chrome_options = Options()
-chrome_options.add_argument('--headless')
-chrome_options.add_argument('--disable-gpu')
-chrome_options.add_argument('--disable-dev-shm-usage')
-chrome_options.add_argument('--no-sandbox')
-chrome_options.add_argument('--remote-debugging-port=9222')
-
-chrome_options.add_argument(f"user-agent={ua.chrome}")
-chrome_options.add_argument("--window-size=1920,1080")
-chrome_options.add_argument("--start-maximized")
-
-#chrome_options.add_argument('--incognito')
-# chrome_options.add_argument('--disable-extensions')
-# chrome_options.add_argument('--disable-popup-blocking')
-# chrome_options.add_argument('--disable-software-rasterizer')
-# chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-# chrome_options.add_experimental_option('detach', False)
-
-try:
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=chrome_options
-    )
-except Exception as e:
-    print(f"Erreur lors du lancement de Chrome/Chromium : {e}")
-    raise
-
-try:
-    # 1. Aller sur la page de login
-    driver.get("https://realt.co/my-account/")
-    print("Page de login chargée :", driver.current_url)
-    # 2. Attendre que le formulaire de login soit présent (plus robuste)
-    try:
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "form.woocommerce-form-login"))
-        )
-        print("Formulaire de login trouvé.")
-        driver.save_screenshot("debug_login_form.png")
-        
-        # Gérer le bandeau de cookies s'il est présent
-        try:
-            cookie_accept_btn = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.ID, "CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll"))
-            )
-            print("Bandeau de cookies détecté, tentative d'acceptation...")
-            driver.save_screenshot("debug_cookie_banner.png")
-            cookie_accept_btn.click()
-            time.sleep(1)  # Attendre que le bandeau disparaisse
-            print("Bandeau de cookies accepté.")
-            driver.save_screenshot("debug_post_cookie.png")
-        except Exception as e:
-            print("Pas de bandeau de cookies ou déjà accepté:", e)
-        
-        username = driver.find_element(By.ID, "username")
-        password = driver.find_element(By.ID, "password")
-    except Exception as e:
-        print("Erreur lors de l'attente du formulaire de connexion :", e)
-        driver.save_screenshot("debug_login.png")
-        print(driver.page_source)
-        driver.quit()
-        exit(1)
-    my_user = config['DEFAULT']['username']
-    my_pwd = config['DEFAULT']['password']
-    username.send_keys(my_user)
-    password.send_keys(my_pwd)
-
-    # 3. Cliquer sur le bouton "Log in"
-    login_btn = driver.find_element(By.NAME, "login")
-    login_btn.click()
-    print("Tentative de connexion...")
-    time.sleep(2)  # Attendre que la page se charge
-    #driver.save_screenshot("debug_post_login.png")
-
-    # Vérifier si un message d'erreur de login est présent
-    error_msg = driver.find_elements(By.CSS_SELECTOR, "ul.woocommerce-error li")
-    if error_msg:  # Si un message d'erreur est trouvé
-        error_text = error_msg[0].text
-        print("Erreur de connexion détectée:", error_text)
-        driver.save_screenshot("debug_login_error.png")
-        driver.quit()
-        raise Exception("Identifiants invalides")
-    
-    print("Connexion réussie, attente de la redirection...")
-    time.sleep(5)  # Attendre que la session soit bien établie
-
-    # Fonction pour récupérer les liens des factures sur une page
-    def get_invoice_links():
-        try:
-            invoice_links = WebDriverWait(driver, 5).until(
-                lambda d: d.find_elements(By.CSS_SELECTOR, "a.woocommerce-button.button.invoice")
-            )
-            return [link.get_attribute("href") for link in invoice_links]
-        except Exception as e:
-            print(f"Erreur lors de la récupération des factures sur cette page: {e}")
-            return []
+from utils import load_config, get_config_option
+from invoice_parser import InvoiceIngestor, get_parser_workers
+from db import get_known_order_numbers, get_data_dir, get_invoice_dir, atomic_write_json
+from progress import ProgressReporter
+from metrics import incr
+from journal import get_checkpoint, save_checkpoint
 
-    # Fonction pour vérifier s'il y a une page suivante
-    def has_next_page():
-        try:
-            next_button = driver.find_element(By.CSS_SELECTOR, "a.next.page-numbers")
-            return next_button.get_attribute("href")
-        except:
-            return None
+logger = logging.getLogger(__name__)
 
-    # Liste pour stocker tous les liens de factures
-    all_invoice_links = []
-    current_page = 1
+BASE_URL = "https://realt.co"
+ORDERS_FILTER = "?order_sort_by=&order_sort_dir=&order_filter_by=status&order_filter_val=wc-completed"
 
-    while True:
-        # Aller à la page des commandes (avec le numéro de page si > 1)
-        url = "https://realt.co/my-account/orders/"
-        if current_page > 1:
-            url += str(current_page)
-        url += "?order_sort_by=&order_sort_dir=&order_filter_by=status&order_filter_val=wc-completed"
-        
-        print(f"\nNavigation vers la page {current_page}...")
-        driver.get(url)
-        time.sleep(2)  # Attendre le chargement de la page
-        #driver.save_screenshot(f"debug_orders_page_{current_page}.png")
+# Nombre de téléchargements simultanés et délai minimal entre deux requêtes (toutes confondues)
+DEFAULT_DOWNLOAD_WORKERS = 4
+DOWNLOAD_INTERVAL = 1.0
+# Bornes de l'intervalle adaptatif entre deux requêtes (secondes)
+MIN_REQUEST_INTERVAL = 0.2
+MAX_REQUEST_INTERVAL = 60.0
+# Taille des blocs écrits sur disque pendant un téléchargement
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
-        # Récupérer les liens des factures de la page courante
-        try:
-            page_links = get_invoice_links()
-            print(f"Factures trouvées sur la page {current_page}: {len(page_links)}")
-        except Exception as e:
-            print(f"Erreur lors de la récupération des factures page {current_page}:", e)
-            driver.save_screenshot(f"debug_orders_page_{current_page}_error.png")
-            page_links = []
+# Cookies de la dernière session authentifiée (fichier lisible par le seul utilisateur)
+SESSION_FILE = '.realt_session.json'
 
-        all_invoice_links.extend(page_links)
+class InvalidCredentialsError(Exception):
+    """Le site a refusé les identifiants : inutile de réessayer avec un autre backend"""
 
-        # Vérifier s'il y a une page suivante
-        next_page_url = has_next_page()
-        if not next_page_url:
-            print("Plus de pages suivantes.")
-            break
-            
-        current_page += 1
+def get_orders_url(page_number, base_url=BASE_URL):
+    """URL d'une page de la liste des commandes terminées"""
+    url = f"{base_url}/my-account/orders/"
+    if page_number > 1:
+        url += str(page_number)
+    return url + ORDERS_FILTER
 
-    print(f"\nNombre total de factures trouvées: {len(all_invoice_links)}")
-
-    # Configuration de la session requests pour le téléchargement
-    session_cookies = driver.get_cookies()
-    s = requests.Session()
-    
-    # Copier les cookies Selenium
-    for c in session_cookies:
-        s.cookies.set(c['name'], c['value'])
-    
-    # Configuration complète des headers
-    user_agent = driver.execute_script("return navigator.userAgent;")
+def build_headers(user_agent, base_url=BASE_URL):
+    """Headers d'un navigateur pour les requêtes vers le site RealT"""
     headers = {
         'User-Agent': user_agent,
         'Accept': 'application/pdf,application/x-pdf,application/octet-stream,*/*',
         'Accept-Language': 'en-US,en;q=0.9',
         'Accept-Encoding': 'gzip, deflate, br',
         'Connection': 'keep-alive',
-        'Referer': 'https://realt.co/my-account/orders/',
-        'Origin': 'https://realt.co',
+        'Referer': get_orders_url(1, base_url),
+        'Origin': base_url,
         'sec-ch-ua': '"Chromium";v="112"',
         'sec-ch-ua-mobile': '?0',
         'sec-ch-ua-platform': '"Linux"',
@@ -185,53 +60,532 @@ try:
         'Sec-Fetch-Site': 'same-origin',
         'DNT': '1'
     }
-    s.headers.update(headers)
+    return headers
 
-    # Créer un dossier pour les factures s'il n'existe pas
-    download_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'invoices')
-    os.makedirs(download_dir, exist_ok=True)
+class WooCommercePageParser(HTMLParser):
+    """
+    Extrait d'une page WooCommerce les formulaires (avec leurs champs cachés, dont le nonce),
+    les liens de factures, le lien vers la page suivante et les messages d'erreur.
+    """
+
+    def __init__(self, page_url):
+        super().__init__()
+        self.page_url = page_url
+        self.forms = []
+        self.invoice_links = []
+        self.next_page_url = None
+        self.errors = []
+        self._form = None
+        self._in_error_list = False
+        self._error_text = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get('class') or '').split())
+
+        if tag == 'form':
+            self._form = {
+                'action': urljoin(self.page_url, attrs.get('action') or self.page_url),
+                'classes': classes,
+                'fields': {}
+            }
+            self.forms.append(self._form)
+        elif tag in ('input', 'button') and self._form is not None and attrs.get('name'):
+            self._form['fields'][attrs['name']] = attrs.get('value') or ''
+        elif tag == 'a' and attrs.get('href'):
+            if {'woocommerce-button', 'button', 'invoice'} <= classes:
+                self.invoice_links.append(urljoin(self.page_url, attrs['href']))
+            elif {'next', 'page-numbers'} <= classes:
+                self.next_page_url = urljoin(self.page_url, attrs['href'])
+        elif tag == 'ul' and 'woocommerce-error' in classes:
+            self._in_error_list = True
+        elif tag == 'li' and self._in_error_list:
+            self._error_text = []
+
+    def handle_endtag(self, tag):
+        if tag == 'form':
+            self._form = None
+        elif tag == 'ul':
+            self._in_error_list = False
+        elif tag == 'li' and self._error_text is not None:
+            self.errors.append(' '.join(''.join(self._error_text).split()))
+            self._error_text = None
+
+    def handle_data(self, data):
+        if self._error_text is not None:
+            self._error_text.append(data)
+
+    def get_login_form(self):
+        """Retourne le formulaire de connexion WooCommerce, ou None"""
+        for form in self.forms:
+            if 'woocommerce-form-login' in form['classes']:
+                return form
+        return None
+
+def parse_page(html, page_url):
+    parser = WooCommercePageParser(page_url)
+    parser.feed(html)
+    parser.close()
+    return parser
+
+class HttpBackend:
+    """
+    Backend de scraping sans navigateur : connexion par le formulaire WooCommerce
+    (avec son nonce) et lecture des pages de commandes avec un parser HTML.
+    """
+    name = 'http'
+
+    def __init__(self, base_url=BASE_URL, user_agent=None, rate_controller=None):
+        self.base_url = base_url.rstrip('/')
+        self.rate_controller = rate_controller or AdaptiveRateController()
+        if user_agent is None:
+            from fake_useragent import UserAgent
+            user_agent = UserAgent().chrome
+        self.session = requests.Session()
+        self.session.headers.update(build_headers(user_agent, self.base_url))
+        # Les pages HTML sont demandées comme un navigateur, les factures comme des PDF
+        self.session.headers['Accept'] = 'text/html,application/xhtml+xml,application/pdf,*/*'
 
-    # Télécharger toutes les factures
-    for i, href in enumerate(all_invoice_links, 1):
-        print(f"\nTéléchargement de la facture {i}/{len(all_invoice_links)}")
-        print(f"URL: {href}")
-        
+    def login(self, username, password):
+        login_url = f"{self.base_url}/my-account/"
+        r = self.rate_controller.request(self.session, 'GET', login_url)
+        r.raise_for_status()
+        form = parse_page(r.text, r.url).get_login_form()
+        if form is None:
+            raise Exception("Formulaire de connexion introuvable")
+        logger.debug("Formulaire de login trouvé.")
+
+        # Les champs cachés contiennent le nonce WooCommerce et le referer attendu
+        data = dict(form['fields'])
+        data.update({'username': username, 'password': password})
+        data.setdefault('login', 'Log in')
+
+        logger.info("Tentative de connexion...")
+        r = self.rate_controller.request(self.session, 'POST', form['action'], data=data, headers={'Referer': r.url})
+        r.raise_for_status()
+        page = parse_page(r.text, r.url)
+        if page.errors:
+            logger.error("Erreur de connexion détectée: %s", page.errors[0])
+            raise InvalidCredentialsError("Identifiants invalides")
+        if page.get_login_form() is not None:
+            raise Exception("Connexion refusée : le formulaire de login est toujours affiché")
+        logger.info("Connexion réussie.")
+
+    def get_orders_page(self, page_number):
+        """
+        Charge une page de commandes.
+
+        Returns:
+            tuple: (liens des factures de la page, URL de la page suivante ou None)
+        """
+        r = self.rate_controller.request(self.session, 'GET', get_orders_url(page_number, self.base_url))
+        r.raise_for_status()
+        page = parse_page(r.text, r.url)
+        return page.invoice_links, page.next_page_url
+
+    def is_logged_in(self):
+        """Vérifie en une requête que les cookies de la session sont toujours valides"""
+        r = self.rate_controller.request(self.session, 'GET', f"{self.base_url}/my-account/")
+        if r.status_code != 200:
+            return False
+        return parse_page(r.text, r.url).get_login_form() is None
+
+    def get_session(self):
+        return self.session
+
+    def close(self):
+        pass
+
+def get_session_path():
+    return os.path.join(get_data_dir(), SESSION_FILE)
+
+def save_session(session):
+    """Enregistre les cookies et le User-Agent d'une session authentifiée (permissions 0600)"""
+    cookies = [
+        {
+            'name': cookie.name,
+            'value': cookie.value,
+            'domain': cookie.domain,
+            'path': cookie.path,
+            'expires': cookie.expires,
+            'secure': cookie.secure
+        }
+        for cookie in session.cookies
+    ]
+    atomic_write_json(get_session_path(), {
+        'user_agent': session.headers.get('User-Agent'),
+        'cookies': cookies,
+        'saved_at': time.time()
+    }, mode=0o600)
+
+def restore_session(base_url, rate_controller=None):
+    """
+    Recrée un backend HTTP à partir de la session enregistrée.
+
+    Returns:
+        HttpBackend: Le backend connecté, ou None si aucune session valide n'est disponible
+    """
+    try:
+        with open(get_session_path(), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    now = time.time()
+    backend = HttpBackend(base_url, user_agent=saved.get('user_agent'), rate_controller=rate_controller)
+    for cookie in saved.get('cookies', []):
+        if cookie.get('expires') and cookie['expires'] < now:
+            continue
+        backend.session.cookies.set(
+            cookie['name'], cookie['value'],
+            domain=cookie.get('domain') or '', path=cookie.get('path') or '/',
+            expires=cookie.get('expires'), secure=cookie.get('secure', False)
+        )
+
+    try:
+        if backend.is_logged_in():
+            return backend
+    except requests.RequestException as e:
+        logger.warning("Impossible de vérifier la session enregistrée: %s", e)
+    return None
+
+def open_backend(config, rate_controller=None):
+    """
+    Ouvre une session connectée sur le site RealT.
+    La session enregistrée lors d'un run précédent est réutilisée si elle est toujours valide.
+    Sinon, le backend HTTP est utilisé par défaut (option `scraper_backend`) ; s'il échoue
+    pour une autre raison que des identifiants invalides, Selenium prend le relais.
+    """
+    base_url = get_config_option(config, 'realt_base_url', BASE_URL)
+    backend_name = get_config_option(config, 'scraper_backend', 'http')
+    username = config['DEFAULT']['username']
+    password = config['DEFAULT']['password']
+
+    backend = restore_session(base_url, rate_controller)
+    if backend is not None:
+        logger.info("Session enregistrée toujours valide, connexion ignorée.")
+        return backend
+
+    if backend_name == 'http':
+        backend = HttpBackend(base_url, rate_controller=rate_controller)
         try:
-            r = s.get(href, allow_redirects=True)
-            print(f"Status code: {r.status_code}")
-            
-            if r.status_code == 200:
-                # Extraire l'ID de la commande de l'URL
-                order_id = href.split('order_ids=')[1].split('&')[0]
-                filename = f"invoice_{order_id}.pdf"
-                filepath = os.path.join(download_dir, filename)
-                
-                # Vérifier si le contenu est bien un PDF
-                if b'%PDF-' in r.content[:1024]:
-                    with open(filepath, "wb") as f:
-                        f.write(r.content)
-                    print(f"Facture sauvegardée: {filename}")
-                    
-                    # Analyser et stocker les données de la facture
-                    try:
-                        invoice_data = parse_invoice_pdf(filepath)
-                        store_invoice_data(invoice_data)
-                        print(f"Données de la facture {order_id} extraites et stockées avec succès")
-                    except Exception as e:
-                        print(f"Erreur lors de l'analyse de la facture {order_id}: {e}")
-                else:
-                    print(f"Le contenu téléchargé n'est pas un PDF valide")
-                    error_file = f"debug_download_error_{order_id}.html"
-                    with open(error_file, "wb") as f:
-                        f.write(r.content)
-                    print(f"Contenu de l'erreur sauvegardé dans {error_file}")
-            else:
-                print(f"Échec du téléchargement: {r.status_code}")
-                driver.save_screenshot(f"debug_download_error_{order_id}.png")
-                
+            backend.login(username, password)
+            save_session(backend.get_session())
+            return backend
+        except InvalidCredentialsError:
+            raise
         except Exception as e:
-            print(f"Erreur lors du téléchargement: {e}")
-            
-        time.sleep(1)  # Petit délai entre les téléchargements
-finally:
-    driver.quit()
+            logger.warning("Connexion HTTP impossible (%s), utilisation de Selenium", e)
+
+    # Import conditionnel pour éviter de charger Selenium si pas nécessaire
+    from realt_selenium import SeleniumBackend
+    backend = SeleniumBackend(base_url, rate_controller)
+    try:
+        backend.login(username, password)
+        save_session(backend.get_session())
+    except Exception:
+        backend.close()
+        raise
+    return backend
+
+def get_known_order_ids(download_dir):
+    """Commandes déjà connues : présentes dans la base des factures ou déjà téléchargées"""
+    known_order_ids = get_known_order_numbers()
+    for filename in os.listdir(download_dir):
+        if filename.startswith('invoice_') and filename.endswith('.pdf'):
+            known_order_ids.add(filename[len('invoice_'):-len('.pdf')])
+    return known_order_ids
+
+def collect_invoice_links(backend, known_order_ids=None):
+    """
+    Parcourt les pages de commandes et retourne les liens des factures.
+
+    Les commandes sont listées de la plus récente à la plus ancienne : si `known_order_ids`
+    est fourni, la pagination s'arrête dès qu'une page ne contient que des commandes connues.
+
+    Chaque page parcourue est enregistrée dans le journal du pipeline : avec --resume,
+    la pagination reprend après la dernière page lue.
+    """
+    checkpoint = get_checkpoint('invoices')
+    if checkpoint.get('pages_complete'):
+        logger.info("Reprise : pagination déjà terminée, %d factures trouvées", len(checkpoint['invoice_links']))
+        return checkpoint['invoice_links']
+
+    # Liste pour stocker tous les liens de factures
+    all_invoice_links = checkpoint.get('invoice_links', [])
+    current_page = checkpoint.get('orders_page', 0) + 1
+    if current_page > 1:
+        logger.info("Reprise de la pagination à la page %d", current_page)
+    progress = ProgressReporter('invoices', 'pages de commandes')
+    page_failed = False
+
+    while True:
+        logger.debug("Navigation vers la page %d...", current_page)
+
+        # Récupérer les liens des factures de la page courante
+        try:
+            page_links, next_page_url = backend.get_orders_page(current_page)
+            logger.debug("Factures trouvées sur la page %d: %d", current_page, len(page_links))
+        except Exception as e:
+            logger.warning("Erreur lors de la récupération des factures page %d: %s", current_page, e)
+            page_links, next_page_url = [], None
+            page_failed = True
+
+        all_invoice_links.extend(page_links)
+        progress.update()
+        if not page_failed:
+            save_checkpoint('invoices', orders_page=current_page, invoice_links=all_invoice_links)
+
+        # Mode incrémental : les pages suivantes ne contiennent que des commandes plus anciennes
+        if known_order_ids is not None and page_links and all(
+                get_order_id(href) in known_order_ids for href in page_links):
+            logger.info("Toutes les commandes de la page %d sont déjà connues, arrêt de la pagination.", current_page)
+            break
+
+        # Vérifier s'il y a une page suivante
+        if not next_page_url:
+            logger.debug("Plus de pages suivantes.")
+            break
+
+        current_page += 1
+
+    progress.done()
+    if not page_failed:
+        # Une reprise n'aura plus qu'à télécharger et analyser les factures
+        # (les PDF présents et le manifeste évitent de refaire le travail déjà fait)
+        save_checkpoint('invoices', pages_complete=True, invoice_links=all_invoice_links)
+    logger.info("\nNombre total de factures trouvées: %d", len(all_invoice_links))
+    return all_invoice_links
+
+class AdaptiveRateController:
+    """
+    Espace le début des requêtes vers le site, tous threads confondus, avec un intervalle
+    qui s'adapte aux réponses :
+    - réponse saine (2xx/3xx) sans dégradation de latence : l'intervalle diminue
+      jusqu'à `min_interval` ;
+    - 429 ou 5xx : l'intervalle est multiplié (jusqu'à `max_interval`) et l'en-tête
+      Retry-After est respecté.
+    Chaque requête est journalisée avec sa latence, ainsi que chaque ralentissement.
+    """
+
+    def __init__(self, initial_interval=DOWNLOAD_INTERVAL, min_interval=MIN_REQUEST_INTERVAL,
+                 max_interval=MAX_REQUEST_INTERVAL, speedup=0.8, slowdown=2.0):
+        self.interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.avg_latency = None
+        self.requests = 0
+        self.backoffs = 0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        """Attend le prochain créneau disponible"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, status_code, latency, label='', retry_after=None):
+        """
+        Ajuste l'intervalle selon le résultat d'une requête.
+
+        Returns:
+            bool: True si la requête mérite d'être réessayée (429 ou 5xx)
+        """
+        with self._lock:
+            self.requests += 1
+            throttled = status_code == 429 or status_code >= 500
+            if throttled:
+                self.backoffs += 1
+                self.interval = min(self.max_interval, max(self.interval, self.min_interval) * self.slowdown)
+                pause = max(self.interval, retry_after or 0)
+                self._next_slot = max(self._next_slot, time.monotonic() + pause)
+                logger.warning("[rate] %s %s en %.0f ms : ralentissement, intervalle %.2fs, pause %.1fs",
+                               status_code, label, latency * 1000, self.interval, pause)
+            else:
+                # Accélérer seulement si la latence ne se dégrade pas
+                if self.avg_latency is None or latency <= self.avg_latency * 2:
+                    self.interval = max(self.min_interval, self.interval * self.speedup)
+                logger.debug("[rate] %s %s en %.0f ms (intervalle %.2fs)",
+                             status_code, label, latency * 1000, self.interval)
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+            return throttled
+
+    def request(self, session, method, url, max_retries=3, **kwargs):
+        """Envoie une requête en respectant l'intervalle, avec nouvel essai sur 429/5xx"""
+        for attempt in range(max_retries + 1):
+            self.wait()
+            start = time.perf_counter()
+            r = session.request(method, url, **kwargs)
+            incr('http_requests')
+            retry_after = r.headers.get('Retry-After')
+            retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            label = f"{method} {urlsplit(url).path}"
+            if self.record(r.status_code, time.perf_counter() - start, label, retry_after) and attempt < max_retries:
+                r.close()
+                continue
+            return r
+
+def get_order_id(href):
+    """Extrait l'ID de la commande de l'URL de la facture"""
+    return href.split('order_ids=')[1].split('&')[0]
+
+def get_invoice_path(download_dir, order_id):
+    return os.path.join(download_dir, f"invoice_{order_id}.pdf")
+
+def download_invoice(session, href, download_dir, rate_controller):
+    """
+    Télécharge une facture PDF en flux : le contenu est écrit par blocs dans un fichier
+    temporaire, renommé une fois complet.
+
+    Returns:
+        str: Le chemin du PDF enregistré, ou None en cas d'échec
+    """
+    order_id = get_order_id(href)
+    with rate_controller.request(session, 'GET', href, allow_redirects=True, stream=True) as r:
+        if r.status_code != 200:
+            logger.warning("Échec du téléchargement de la facture %s: %s", order_id, r.status_code)
+            return None
+
+        chunks = r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+        first_chunk = next(chunks, b'')
+
+        # Vérifier si le contenu est bien un PDF
+        if b'%PDF-' not in first_chunk[:1024]:
+            logger.warning("Le contenu téléchargé pour la facture %s n'est pas un PDF valide", order_id)
+            error_file = f"debug_download_error_{order_id}.html"
+            with open(error_file, "wb") as f:
+                f.write(first_chunk)
+                for chunk in chunks:
+                    f.write(chunk)
+            logger.warning("Contenu de l'erreur sauvegardé dans %s", error_file)
+            return None
+
+        filepath = get_invoice_path(download_dir, order_id)
+        part_path = filepath + '.part'
+        try:
+            with open(part_path, "wb") as f:
+                f.write(first_chunk)
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(part_path, filepath)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.unlink(part_path)
+            raise
+
+    logger.debug("Facture sauvegardée: %s", os.path.basename(filepath))
+    return filepath
+
+def download_invoices(session, invoice_links, download_dir, workers=DEFAULT_DOWNLOAD_WORKERS,
+                      rate_controller=None, on_downloaded=None):
+    """
+    Télécharge en parallèle les factures qui ne sont pas encore sur disque.
+    Les requêtes partagent la session (cookies) et sont espacées par un AdaptiveRateController.
+
+    Args:
+        on_downloaded: Fonction appelée avec le chemin de chaque PDF dès qu'il est enregistré
+                       (ex: InvoiceIngestor.submit, pour analyser pendant les téléchargements)
+
+    Returns:
+        list: Les chemins des PDF téléchargés
+    """
+    to_download = [
+        href for href in invoice_links
+        if not os.path.exists(get_invoice_path(download_dir, get_order_id(href)))
+    ]
+    logger.info("\n%d factures déjà présentes, %d à télécharger (%d en parallèle)",
+                len(invoice_links) - len(to_download), len(to_download), workers)
+    if not to_download:
+        return []
+
+    def download(href):
+        filepath = download_invoice(session, href, download_dir, rate_controller)
+        if filepath and on_downloaded is not None:
+            on_downloaded(filepath)
+        return filepath
+
+    rate_controller = rate_controller or AdaptiveRateController()
+    progress = ProgressReporter('invoices', 'factures téléchargées', total=len(to_download))
+    downloaded = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(download, href): href for href in to_download}
+        for i, future in enumerate(as_completed(futures), 1):
+            try:
+                filepath = future.result()
+                if filepath:
+                    downloaded.append(filepath)
+            except Exception as e:
+                logger.warning("Erreur lors du téléchargement de %s: %s", futures[future], e)
+            logger.debug("Téléchargements terminés: %d/%d", i, len(to_download))
+            progress.update()
+
+    progress.done()
+    return downloaded
+
+def scrape_invoices(incremental=None):
+    """
+    Télécharge les nouvelles factures du compte RealT et les analyse au fil de l'eau :
+    les téléchargements alimentent un InvoiceIngestor, qui analyse et enregistre
+    les factures pendant que les suivantes sont encore en cours de téléchargement.
+
+    Args:
+        incremental: Arrêter la pagination à la première page sans nouvelle commande
+                     (None = option `incremental_scraping` de la config, activée par défaut)
+
+    Returns:
+        list: Les chemins des PDF téléchargés pendant cet appel
+    """
+    # Load configuration
+    config = load_config()
+    download_dir = get_invoice_dir()
+    os.makedirs(download_dir, exist_ok=True)
+
+    if incremental is None:
+        incremental = config['DEFAULT'].getboolean('incremental_scraping', fallback=True)
+    known_order_ids = get_known_order_ids(download_dir) if incremental else None
+
+    # Le délai configuré sert de point de départ à l'intervalle adaptatif
+    rate_controller = AdaptiveRateController(
+        initial_interval=get_config_option(config, 'scraping_delay', DOWNLOAD_INTERVAL, float)
+    )
+
+    backend = open_backend(config, rate_controller)
+    try:
+        invoice_links = collect_invoice_links(backend, known_order_ids)
+        session = backend.get_session()
+    finally:
+        backend.close()
+
+    ingestor = InvoiceIngestor(get_parser_workers(config)).start()
+    try:
+        # Les PDF déjà présents sont aussi soumis : le manifeste écarte ceux déjà analysés
+        for filename in sorted(os.listdir(download_dir)):
+            if filename.endswith(".pdf"):
+                ingestor.submit(os.path.join(download_dir, filename))
+
+        downloaded = download_invoices(
+            session, invoice_links, download_dir,
+            workers=get_config_option(config, 'download_workers', DEFAULT_DOWNLOAD_WORKERS, int),
+            rate_controller=rate_controller,
+            on_downloaded=ingestor.submit
+        )
+    finally:
+        stats = ingestor.close()
+
+    logger.info("\nFactures analysées: %d nouvelles, %d inchangées, %d en erreur",
+                stats['success'] - stats['cached'], stats['cached'], stats['errors'],
+                extra={'parsed': stats['success'] - stats['cached'], 'cached': stats['cached'], 'errors': stats['errors']})
+    logger.info("Requêtes: %d, ralentissements: %d, intervalle final: %.2fs",
+                rate_controller.requests, rate_controller.backoffs, rate_controller.interval)
+    return downloaded
+
+if __name__ == "__main__":
+    from logs import setup_logging
+    setup_logging()
+    scrape_invoices()
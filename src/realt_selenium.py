@@ -0,0 +1,193 @@
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.options import Options
+import logging
+import time
+import requests
+from webdriver_manager.chrome import ChromeDriverManager
+# Importer la bibliothèque pour générer des User-Agents aléatoires
+from fake_useragent import UserAgent
+from realt_scraper import (BASE_URL, InvalidCredentialsError, AdaptiveRateController,
+                           build_headers, get_orders_url)
+
+logger = logging.getLogger(__name__)
+
+# Délai maximal d'attente d'une page ou d'un élément (secondes)
+PAGE_TIMEOUT = 15
+
+def create_driver():
+    """Lance un Chrome headless configuré pour le scraping"""
+    ua = UserAgent()
+
+    # Configure Chrome options for robust headless operation
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--remote-debugging-port=9222')
+
+    chrome_options.add_argument(f"user-agent={ua.chrome}")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--start-maximized")
+
+    #chrome_options.add_argument('--incognito')
+    # chrome_options.add_argument('--disable-extensions')
+    # chrome_options.add_argument('--disable-popup-blocking')
+    # chrome_options.add_argument('--disable-software-rasterizer')
+    # chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
+    # chrome_options.add_experimental_option('detach', False)
+
+    try:
+        return webdriver.Chrome(
+            service=Service(ChromeDriverManager().install()),
+            options=chrome_options
+        )
+    except Exception as e:
+        logger.error("Erreur lors du lancement de Chrome/Chromium : %s", e)
+        raise
+
+def login(driver, my_user, my_pwd, base_url=BASE_URL):
+    """Se connecte au compte RealT via le formulaire WooCommerce"""
+    # 1. Aller sur la page de login
+    driver.get(f"{base_url}/my-account/")
+    logger.debug("Page de login chargée : %s", driver.current_url)
+    # 2. Attendre que le formulaire de login soit présent (plus robuste)
+    try:
+        WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "form.woocommerce-form-login"))
+        )
+        logger.debug("Formulaire de login trouvé.")
+        driver.save_screenshot("debug_login_form.png")
+
+        # Gérer le bandeau de cookies s'il est présent
+        try:
+            cookie_accept_btn = WebDriverWait(driver, 3).until(
+                EC.element_to_be_clickable((By.ID, "CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll"))
+            )
+            logger.debug("Bandeau de cookies détecté, tentative d'acceptation...")
+            driver.save_screenshot("debug_cookie_banner.png")
+            cookie_accept_btn.click()
+            # Attendre que le bandeau disparaisse
+            WebDriverWait(driver, 5).until(
+                EC.invisibility_of_element_located((By.ID, "CybotCookiebotDialog"))
+            )
+            logger.debug("Bandeau de cookies accepté.")
+            driver.save_screenshot("debug_post_cookie.png")
+        except Exception as e:
+            logger.debug("Pas de bandeau de cookies ou déjà accepté: %s", e)
+
+        username = driver.find_element(By.ID, "username")
+        password = driver.find_element(By.ID, "password")
+    except Exception as e:
+        logger.error("Erreur lors de l'attente du formulaire de connexion : %s", e)
+        driver.save_screenshot("debug_login.png")
+        logger.debug("Contenu de la page :\n%s", driver.page_source)
+        raise Exception("Formulaire de connexion introuvable")
+    username.send_keys(my_user)
+    password.send_keys(my_pwd)
+
+    # 3. Cliquer sur le bouton "Log in"
+    login_btn = driver.find_element(By.NAME, "login")
+    login_btn.click()
+    logger.info("Tentative de connexion...")
+    # Attendre que la page de login soit remplacée ou qu'un message d'erreur apparaisse
+    WebDriverWait(driver, PAGE_TIMEOUT).until(
+        lambda d: d.find_elements(By.CSS_SELECTOR, "ul.woocommerce-error li") or EC.staleness_of(login_btn)(d)
+    )
+    #driver.save_screenshot("debug_post_login.png")
+
+    # Vérifier si un message d'erreur de login est présent
+    error_msg = driver.find_elements(By.CSS_SELECTOR, "ul.woocommerce-error li")
+    if error_msg:  # Si un message d'erreur est trouvé
+        error_text = error_msg[0].text
+        logger.error("Erreur de connexion détectée: %s", error_text)
+        driver.save_screenshot("debug_login_error.png")
+        raise InvalidCredentialsError("Identifiants invalides")
+
+    logger.info("Connexion réussie, attente de la redirection...")
+    # Attendre que la session soit bien établie (menu du compte affiché)
+    try:
+        WebDriverWait(driver, PAGE_TIMEOUT).until(
+            lambda d: page_is_ready(d) and d.find_elements(By.CSS_SELECTOR, ".woocommerce-MyAccount-navigation")
+        )
+    except Exception as e:
+        logger.warning("Menu du compte non détecté après la connexion: %s", e)
+
+def page_is_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+def get_invoice_links(driver):
+    """Récupère les liens des factures sur la page courante"""
+    try:
+        invoice_links = WebDriverWait(driver, 5).until(
+            lambda d: d.find_elements(By.CSS_SELECTOR, "a.woocommerce-button.button.invoice")
+        )
+        return [link.get_attribute("href") for link in invoice_links]
+    except Exception as e:
+        logger.warning("Erreur lors de la récupération des factures sur cette page: %s", e)
+        return []
+
+def has_next_page(driver):
+    """Retourne l'URL de la page suivante, ou None"""
+    try:
+        next_button = driver.find_element(By.CSS_SELECTOR, "a.next.page-numbers")
+        return next_button.get_attribute("href")
+    except:
+        return None
+
+def create_download_session(driver, base_url=BASE_URL):
+    """Crée une session requests qui réutilise les cookies et le User-Agent du navigateur"""
+    session_cookies = driver.get_cookies()
+    s = requests.Session()
+
+    # Copier les cookies Selenium
+    for c in session_cookies:
+        s.cookies.set(c['name'], c['value'])
+
+    # Configuration complète des headers
+    user_agent = driver.execute_script("return navigator.userAgent;")
+    s.headers.update(build_headers(user_agent, base_url))
+    return s
+
+class SeleniumBackend:
+    """Backend de scraping via Chrome headless (solution de repli du backend HTTP)"""
+    name = 'selenium'
+
+    def __init__(self, base_url=BASE_URL, rate_controller=None):
+        self.base_url = base_url
+        self.rate_controller = rate_controller or AdaptiveRateController()
+        self.driver = create_driver()
+
+    def login(self, username, password):
+        login(self.driver, username, password, self.base_url)
+
+    def get_orders_page(self, page_number):
+        """
+        Charge une page de commandes.
+
+        Returns:
+            tuple: (liens des factures de la page, URL de la page suivante ou None)
+        """
+        self.rate_controller.wait()
+        start = time.perf_counter()
+        self.driver.get(get_orders_url(page_number, self.base_url))
+        # Attendre le chargement de la page
+        WebDriverWait(self.driver, PAGE_TIMEOUT).until(page_is_ready)
+        self.rate_controller.record(200, time.perf_counter() - start, f"page de commandes {page_number}")
+        #self.driver.save_screenshot(f"debug_orders_page_{page_number}.png")
+        try:
+            page_links = get_invoice_links(self.driver)
+        except Exception:
+            self.driver.save_screenshot(f"debug_orders_page_{page_number}_error.png")
+            raise
+        return page_links, has_next_page(self.driver)
+
+    def get_session(self):
+        return create_download_session(self.driver, self.base_url)
+
+    def close(self):
+        self.driver.quit()
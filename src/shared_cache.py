@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from db import atomic_write_json
+from metrics import incr
+from utils import PARSER_VERSION
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+# Dossier des caches partagés entre portefeuilles (mode --batch de main.py) ;
+# sans cette variable, aucun cache partagé n'est utilisé
+SHARED_CACHE_ENV = 'REALTROI_SHARED_CACHE'
+
+def get_shared_cache_dir():
+    """Dossier des caches partagés, ou None"""
+    directory = os.environ.get(SHARED_CACHE_ENV)
+    return os.path.abspath(directory) if directory else None
+
+@contextmanager
+def locked(path):
+    """Verrou exclusif entre processus (fcntl.flock sur `path`.lock)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class ExplorerCache:
+    """
+    Réponses de l'explorateur (tokentx) déjà reçues, une par fichier.
+    Seules des pages complètes de blocs finalisés y sont enregistrées (voir
+    blockchain_parser.TransactionSync) : leur contenu ne change plus, elles sont donc
+    réutilisables par tous les portefeuilles qui suivent la même adresse.
+    Chaque fichier est écrit de façon atomique : aucun verrou n'est nécessaire.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, request):
+        key = hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, request):
+        try:
+            with open(self._path(request), 'r', encoding='utf-8') as f:
+                response = json.load(f)
+        except (FileNotFoundError, ValueError):
+            incr('explorer_cache_misses')
+            return None
+        incr('explorer_cache_hits')
+        return response
+
+    def put(self, request, response):
+        atomic_write_json(self._path(request), response)
+
+def get_explorer_cache():
+    """Cache partagé des réponses de l'explorateur, ou None"""
+    directory = get_shared_cache_dir()
+    return ExplorerCache(os.path.join(directory, 'explorer')) if directory else None
+
+def get_shared_manifest_path(directory):
+    return os.path.join(directory, 'invoice_manifest.json')
+
+def _read_shared_hashes(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('hashes', {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def load_shared_invoices():
+    """
+    Factures déjà extraites par les autres portefeuilles (même contenu de PDF = même hash),
+    avec la version actuelle du parser. Elles ne sont consultées qu'en l'absence du hash
+    dans le manifeste du portefeuille, et jamais recopiées dans son dossier de données.
+
+    Returns:
+        dict: hash du PDF → données de la facture (vide sans cache partagé)
+    """
+    directory = get_shared_cache_dir()
+    if not directory:
+        return {}
+    return {digest: record['invoice']
+            for digest, record in _read_shared_hashes(get_shared_manifest_path(directory)).items()
+            if record.get('parser_version') == PARSER_VERSION and 'invoice' in record}
+
+def publish_shared_invoices(manifest):
+    """Ajoute au manifeste partagé les factures extraites par ce portefeuille"""
+    directory = get_shared_cache_dir()
+    if not directory:
+        return
+    path = get_shared_manifest_path(directory)
+    # Lecture, fusion et écriture sous verrou : plusieurs portefeuilles peuvent terminer en même temps
+    with locked(path):
+        hashes = _read_shared_hashes(path)
+        added = {digest: record for digest, record in manifest['hashes'].items()
+                 if record.get('parser_version') == PARSER_VERSION and hashes.get(digest) != record}
+        if added:
+            hashes.update(added)
+            atomic_write_json(path, {'hashes': hashes})
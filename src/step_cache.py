@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from db import get_data_dir, get_store_path, get_store_generation, atomic_write_json
+
+# Dossier des sources, pour l'empreinte du code d'une étape
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_lock = threading.Lock()
+
+def get_step_cache_path():
+    """Empreintes des entrées et sorties de la dernière exécution réussie de chaque étape"""
+    return os.path.join(get_data_dir(), 'step_cache.json')
+
+def load_step_cache():
+    """
+    Returns:
+        dict: {'steps': {étape: {fingerprint, outputs, completed_at}},
+               'files': {store: {generation, sha256}}}
+    """
+    try:
+        with open(get_step_cache_path(), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    cache.setdefault('steps', {})
+    cache.setdefault('files', {})
+    return cache
+
+def save_step_cache(cache):
+    with _lock:
+        atomic_write_json(get_step_cache_path(), cache, indent=2)
+
+def store_digest(cache, name):
+    """
+    Hash du contenu d'un store (None s'il n'existe pas).
+    Le hash n'est recalculé que si la génération du fichier a changé : un fichier
+    réécrit à l'identique garde donc la même empreinte.
+    """
+    generation = get_store_generation(name)
+    if generation is None:
+        return None
+    generation = list(generation)
+    with _lock:
+        known = cache['files'].get(name)
+        if known and known['generation'] == generation:
+            return known['sha256']
+    digest = hashlib.sha256()
+    with open(get_store_path(name), 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+    with _lock:
+        cache['files'][name] = {'generation': generation, 'sha256': sha256}
+    return sha256
+
+def code_digest(modules):
+    """Hash des fichiers sources d'une étape"""
+    digest = hashlib.sha256()
+    for module in sorted(modules):
+        digest.update(module.encode('utf-8'))
+        with open(os.path.join(SRC_DIR, module), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def compute_fingerprint(cache, spec, config):
+    """
+    Empreinte des entrées d'une étape : contenu des stores lus, valeurs de config
+    utilisées et code de l'étape.
+    """
+    fingerprint = {
+        'inputs': {name: store_digest(cache, name) for name in spec.get('inputs', [])},
+        'config': {key: config['DEFAULT'].get(key) for key in spec.get('config', [])},
+        'code': code_digest(spec.get('code', [])),
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()
+
+def get_outputs(cache, spec):
+    return {name: store_digest(cache, name) for name in spec.get('outputs', [])}
+
+def is_up_to_date(cache, step, spec, config, ttl=None):
+    """
+    Indique si une étape peut être sautée : même empreinte des entrées que lors de sa
+    dernière exécution réussie, et sorties inchangées depuis.
+    Pour une étape qui lit une source externe (site RealT, blockchain), `ttl` est la durée
+    (secondes) pendant laquelle son résultat reste valable ; 0 = toujours exécuter.
+    """
+    if ttl is not None and ttl <= 0:
+        return False
+    entry = cache['steps'].get(step)
+    if not entry:
+        return False
+    if ttl is not None and time.time() - entry['completed_at'] > ttl:
+        return False
+    return (entry['fingerprint'] == compute_fingerprint(cache, spec, config) and
+            entry['outputs'] == get_outputs(cache, spec))
+
+def record_step(cache, step, spec, config, fingerprint):
+    """
+    Enregistre l'exécution réussie d'une étape.
+
+    Args:
+        fingerprint: Empreinte des entrées calculée avant l'exécution de l'étape
+    """
+    entry = {
+        'fingerprint': fingerprint,
+        'outputs': get_outputs(cache, spec),
+        'completed_at': time.time(),
+    }
+    with _lock:
+        cache['steps'][step] = entry
+    save_step_cache(cache)
@@ -1,10 +1,18 @@
 from datetime import datetime
-from tinydb import Query
+import logging
 import re
-import pdfplumber
 from decimal import Decimal
 import configparser
+import hashlib
 import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Version du parser de factures : à incrémenter quand l'extraction change,
+# pour forcer la ré-analyse des PDF déjà présents dans le manifeste
+PARSER_VERSION = 2
 
 # Dictionnaire des décimales connues par symbole de token
 TOKEN_DECIMALS = {
@@ -64,84 +72,202 @@ def format_transactions(transactions):
         formatted.append(f"{idx}. Date: {tx['date']} | Token: {tx['tokenName']} ({tx['tokenSymbol']}) - Value: {tx['formatted_value']} ({tx['value']}) - From: {tx['from']} - To: {tx['to']} - Hash: {tx['hash']}")
     return "\n".join(formatted)
 
-def parse_invoice_pdf(pdf_path):
-    """Parse une facture PDF RealT et extrait les informations pertinentes."""
-    products = []
-    
+# Champs d'en-tête des factures RealT
+INVOICE_FIELD_PATTERNS = {
+    'invoice_number': re.compile(r'Invoice Number:\s*(\d+)'),
+    'invoice_date': re.compile(r'Invoice Date:\s*([^\n]+)'),
+    'order_number': re.compile(r'Order Number:\s*(\d+)'),
+    'payment_method': re.compile(r'Payment Method:\s*([^\n]+)'),
+}
+
+# Ligne produit : "adresse $prix quantité $total" (quantités décimales supportées)
+PRODUCT_ROW_PATTERN = re.compile(r'(.*?)\s+\$(\d+\.\d+)\s+(\d*\.?\d+)\s+\$')
+
+def iter_invoice_pages(pdf_path, page_timings=None):
+    """
+    Extrait le texte de chaque page d'une facture, avec une seule mise en page par page.
+
+    Args:
+        pdf_path: Chemin du PDF
+        page_timings: Liste optionnelle qui reçoit la durée d'extraction de chaque page (en secondes)
+
+    Yields:
+        str: Le texte de la page
+    """
+    # Import coûteux (pdfminer, PIL) : seulement quand une facture est analysée
+    import pdfplumber
+
     with pdfplumber.open(pdf_path) as pdf:
-        # Extraction du texte pour les informations d'en-tête
-        text = pdf.pages[0].extract_text()
-        
-        # Extraction des informations de commande
-        invoice_number = re.search(r'Invoice Number:\s*(\d+)', text)
-        invoice_date = re.search(r'Invoice Date:\s*([^\n]+)', text)
-        order_number = re.search(r'Order Number:\s*(\d+)', text)
-        payment_method = re.search(r'Payment Method:\s*([^\n]+)', text)
-        
-        # Extraction du tableau
-        table = pdf.pages[0].extract_table()
-        
-        if table:
-            # Trouver la ligne qui contient le produit (celle après PRODUCT)
-            product_found = False
-            for row in table:
-                if not row[0]:
+        for page in pdf.pages:
+            start = time.perf_counter()
+            text = page.extract_text() or ''
+            # Libérer les objets de mise en page avant de passer à la page suivante
+            page.flush_cache()
+            if page_timings is not None:
+                page_timings.append(time.perf_counter() - start)
+            yield text
+
+def parse_invoice_pages(pages):
+    """
+    Extrait les informations de commande et les produits à partir du texte des pages.
+    Les produits sont les lignes entre l'en-tête PRODUCT et la ligne SUBTOTAL,
+    y compris quand le tableau continue sur les pages suivantes.
+
+    Returns:
+        tuple: (dict des champs d'en-tête, liste des produits)
+    """
+    order_info = dict.fromkeys(INVOICE_FIELD_PATTERNS)
+    products = []
+    product_found = False
+    subtotal_found = False
+
+    for text in pages:
+        # Champs d'en-tête pas encore trouvés sur les pages précédentes
+        for field, pattern in INVOICE_FIELD_PATTERNS.items():
+            if order_info[field] is None:
+                match = pattern.search(text)
+                if match:
+                    order_info[field] = match.group(1)
+
+        if not subtotal_found:
+            for line in text.splitlines():
+                if 'SUBTOTAL' in line:
+                    if product_found:
+                        subtotal_found = True
+                        break
                     continue
-                    
-                if 'PRODUCT' in row[0]:
+
+                if 'PRODUCT' in line:
                     product_found = True
                     continue
-                
-                if product_found and 'SUBTOTAL' not in row[0]:
-                    # Le format est : "adresse $prix quantité $total"
-                    text = row[0]
-                    
-                    # Mise à jour du regex pour supporter les quantités décimales
-                    match = re.match(r'(.*?)\s+\$(\d+\.\d+)\s+(\d*\.?\d+)\s+\$', text)
-                    if match:
-                        address = match.group(1).strip()
-                        price = float(match.group(2))
-                        qty = float(match.group(3))  # Changé de int à float
-                        
-                        product = {
-                            'address': address,
-                            'token_price': price,
-                            'quantity': qty
-                        }
-                        products.append(product)
-                        print(f"\nProduit extrait: {product}")
-                
-                if 'SUBTOTAL' in row[0]:
-                    break
-    
+
+                if not product_found:
+                    continue
+
+                match = PRODUCT_ROW_PATTERN.match(line)
+                if match:
+                    products.append({
+                        'address': match.group(1).strip(),
+                        'token_price': float(match.group(2)),
+                        'quantity': float(match.group(3))
+                    })
+
+        # Inutile de mettre en page les pages restantes (conditions générales...)
+        if subtotal_found and all(value is not None for value in order_info.values()):
+            break
+
+    return order_info, products
+
+def parse_invoice_pdf(pdf_path, page_timings=None):
+    """
+    Parse une facture PDF RealT et extrait les informations pertinentes.
+    Chaque page n'est mise en page qu'une fois ; les factures sur plusieurs pages sont supportées.
+
+    Args:
+        pdf_path: Chemin du PDF
+        page_timings: Liste optionnelle qui reçoit la durée d'extraction de chaque page
+    """
+    order_info, products = parse_invoice_pages(iter_invoice_pages(pdf_path, page_timings))
+
     # Construction du document final
     invoice_data = {
-        'order_info': {
-            'invoice_number': invoice_number.group(1) if invoice_number else None,
-            'invoice_date': invoice_date.group(1) if invoice_date else None,
-            'order_number': order_number.group(1) if order_number else None,
-            'payment_method': payment_method.group(1) if payment_method else None,
-        },
+        'order_info': order_info,
         'products': products,
         'processed_at': datetime.now().isoformat()
     }
-    
+
     return invoice_data
 
+def file_sha256(path):
+    """Calcule le hash SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def lookup_invoice_manifest(manifest, pdf_path):
+    """
+    Cherche une facture déjà extraite pour ce PDF dans le manifeste.
+    Le hash n'est recalculé que si la taille ou la date de modification du fichier a changé.
+
+    Returns:
+        tuple: (hash du contenu, données de la facture ou None si à analyser)
+    """
+    key = os.path.realpath(pdf_path)
+    st = os.stat(pdf_path)
+    entry = manifest['files'].get(key)
+    if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+        digest = entry['sha256']
+    else:
+        digest = file_sha256(pdf_path)
+        manifest['files'][key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+
+    record = manifest['hashes'].get(digest)
+    if record and record.get('parser_version') == PARSER_VERSION:
+        return digest, record['invoice']
+    return digest, None
+
+def record_invoice_manifest(manifest, digest, invoice_data):
+    """Enregistre la facture extraite d'un PDF dans le manifeste"""
+    manifest['hashes'][digest] = {
+        'parser_version': PARSER_VERSION,
+        'invoice': invoice_data
+    }
+
+def parse_invoice_cached(pdf_path, manifest):
+    """
+    Analyse un PDF sauf si son contenu est déjà connu du manifeste.
+
+    Returns:
+        tuple: (données de la facture, True si elles viennent du manifeste)
+    """
+    digest, invoice_data = lookup_invoice_manifest(manifest, pdf_path)
+    if invoice_data is not None:
+        return invoice_data, True
+    invoice_data = parse_invoice_pdf(pdf_path)
+    record_invoice_manifest(manifest, digest, invoice_data)
+    return invoice_data, False
+
 def store_invoice_data(invoice_data):
     """Stocke les données de facture dans TinyDB."""
     from db import insert_invoice
     insert_invoice(invoice_data)
 
+# Fichier de configuration imposé (mode --batch de main.py)
+CONFIG_ENV = 'REALTROI_CONFIG'
+
+# Configuration chargée une seule fois par processus (voir load_config)
+_config = None
+_config_lock = threading.Lock()
+
 def load_config():
     """
     Charge la configuration depuis les fichiers config.ini
     Cherche d'abord un fichier config.ini.local, puis utilise config.ini comme fallback
+    (ou uniquement le fichier désigné par REALTROI_CONFIG, voir le mode --batch de main.py)
+    Les fichiers ne sont lus qu'au premier appel : les appels suivants retournent
+    le même objet (ne pas le modifier).
     
     Returns:
         configparser.ConfigParser: L'objet de configuration chargé
     """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = _read_config()
+        return _config
+
+def _read_config():
     config = configparser.ConfigParser()
+
+    # Configuration d'un portefeuille donnée explicitement
+    config_path = os.environ.get(CONFIG_ENV)
+    if config_path:
+        if not config.read(config_path):
+            raise FileNotFoundError(f"Fichier de configuration introuvable : {config_path}")
+        logger.info("Configuration chargée depuis %s", config_path)
+        return config
     
     # Chemin vers les fichiers de configuration
     config_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config')
@@ -152,16 +278,29 @@ def load_config():
     # Charger d'abord la configuration locale si elle existe
     if os.path.exists(local_config):
         config.read(local_config)
-        print("Configuration chargée depuis config.ini.local")
+        logger.info("Configuration chargée depuis config.ini.local")
     # Sinon charger la configuration par défaut
     elif os.path.exists(default_config):
         config.read(default_config)
-        print("Configuration chargée depuis config.ini")
+        logger.info("Configuration chargée depuis config.ini")
     # En dernier recours, utiliser l'exemple
     elif os.path.exists(example_config):
         config.read(example_config)
-        print("Configuration chargée depuis config.ini.example")
+        logger.info("Configuration chargée depuis config.ini.example")
     else:
         raise FileNotFoundError("Aucun fichier de configuration trouvé")
         
-    return config
\ No newline at end of file
+    return config
+
+def get_config_option(config, key, default=None, cast=str):
+    """
+    Lit une option de la section DEFAULT en ignorant les commentaires en fin de ligne
+    (ex: `scraping_delay = 2  # Délai en secondes`).
+
+    Returns:
+        La valeur convertie avec `cast`, ou `default` si l'option est absente ou vide
+    """
+    value = config['DEFAULT'].get(key, '').split('#')[0].strip()
+    if not value:
+        return default
+    return cast(value)
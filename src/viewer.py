@@ -1,58 +1,857 @@
-from flask import Flask, render_template_string
-from tinydb import TinyDB
+from flask import Flask, Response, abort, request, stream_with_context, url_for
+from markupsafe import Markup
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import csv
+import gzip
+import io
+import hashlib
+import json
 import os
+import threading
+import time
+from db import read_snapshot, get_store_generation, read_portfolio
+from progress import get_progress_path
+from match_sales import summarize_roi
 
 app = Flask(__name__)
 
-def get_db():
-    db_path = os.path.join(os.path.dirname(__file__), '../data/transactions.json')
-    return TinyDB(db_path)
+# Liens de navigation affichés en tête des pages
+NAV_LINKS = [('index', 'Transactions'), ('purchases', 'Achats'), ('sales', 'Ventes'), ('portfolio', 'Portefeuille'),
+             ('progress', 'Progression')]
+
+def nav():
+    return Markup(' | '.join(f'<a href="{url_for(endpoint)}">{label}</a>' for endpoint, label in NAV_LINKS))
+
+def format_number(value, digits=2):
+    """Nombre formaté pour l'affichage, '—' si inconnu"""
+    if value is None or value == '':
+        return '—'
+    try:
+        return f'{float(value):,.{digits}f}'
+    except (TypeError, ValueError):
+        return value
+
+app.jinja_env.globals['nav'] = nav
+app.jinja_env.filters['num'] = format_number
+
+# Pagination par défaut et taille de page maximale
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+# Colonnes triables : nom du paramètre -> clé de tri d'une transaction
+SORT_KEYS = {
+    'date': lambda tx: int(tx.get('timeStamp') or 0),
+    'token': lambda tx: tx.get('tokenName') or '',
+    'symbol': lambda tx: tx.get('tokenSymbol') or '',
+    'value': lambda tx: _float(tx.get('formatted_value')),
+    'block': lambda tx: int(tx.get('blockNumber') or 0),
+}
+
+class TransactionIndex:
+    """
+    Index en mémoire d'un snapshot des transactions, construit une fois par version du store :
+    - positions triées par date (globalement et par token) pour filtrer une période par bisection ;
+    - le nombre de lignes d'un filtre est donc connu sans parcourir les transactions ;
+    - les autres tris sont calculés à la demande et gardés dans un petit cache.
+    """
+
+    SORT_CACHE_SIZE = 32
+
+    def __init__(self, transactions):
+        self.rows = transactions
+        timestamps = [SORT_KEYS['date'](tx) for tx in transactions]
+        self.by_date = sorted(range(len(transactions)), key=timestamps.__getitem__)
+        self.timestamps = [timestamps[pos] for pos in self.by_date]
+
+        self.by_token = {}
+        for pos in self.by_date:
+            self.by_token.setdefault(transactions[pos].get('tokenSymbol') or '', []).append(pos)
+        self.token_timestamps = {
+            token: [timestamps[pos] for pos in positions]
+            for token, positions in self.by_token.items()
+        }
+        self.tokens = sorted(token for token in self.by_token if token)
+        self._sorted = OrderedDict()
+        self._lock = threading.Lock()
+
+    def query(self, token=None, start_ts=None, end_ts=None, sort='date', order='desc', page=1,
+              page_size=DEFAULT_PAGE_SIZE):
+        """
+        Retourne une page de transactions filtrées et triées.
+
+        Returns:
+            tuple: (transactions de la page, nombre total de transactions du filtre)
+        """
+        positions, lo, hi = self._date_range(token, start_ts, end_ts)
+        total = max(0, hi - lo)
+        offset = (page - 1) * page_size
+
+        if sort == 'date':
+            # Les positions sont déjà triées par date : on ne lit que la page demandée
+            if order == 'desc':
+                page_positions = positions[max(lo, hi - offset - page_size):max(lo, hi - offset)][::-1]
+            else:
+                page_positions = positions[lo + offset:min(hi, lo + offset + page_size)]
+        else:
+            ordering = self._get_ordering(sort, token, lo, hi, positions)
+            if order == 'desc':
+                end = len(ordering) - offset
+                page_positions = ordering[max(0, end - page_size):max(0, end)][::-1]
+            else:
+                page_positions = ordering[offset:offset + page_size]
+
+        return [self.rows[pos] for pos in page_positions], total
+
+    def iter_rows(self, token=None, start_ts=None, end_ts=None):
+        """Parcourt les transactions filtrées par ordre chronologique, sans les copier"""
+        positions, lo, hi = self._date_range(token, start_ts, end_ts)
+        for i in range(lo, hi):
+            yield self.rows[positions[i]]
+
+    def _date_range(self, token, start_ts, end_ts):
+        """Positions triées par date du filtre, et bornes [lo, hi) de la période"""
+        if token:
+            positions = self.by_token.get(token, [])
+            stamps = self.token_timestamps.get(token, [])
+        else:
+            positions, stamps = self.by_date, self.timestamps
+        lo = bisect_left(stamps, start_ts) if start_ts is not None else 0
+        hi = bisect_right(stamps, end_ts) if end_ts is not None else len(stamps)
+        return positions, lo, hi
+
+    def _get_ordering(self, sort, token, lo, hi, positions):
+        key = (sort, token, lo, hi)
+        with self._lock:
+            ordering = self._sorted.get(key)
+            if ordering is not None:
+                self._sorted.move_to_end(key)
+                return ordering
+        sort_key = SORT_KEYS[sort]
+        ordering = sorted(positions[lo:hi], key=lambda pos: sort_key(self.rows[pos]))
+        with self._lock:
+            self._sorted[key] = ordering
+            if len(self._sorted) > self.SORT_CACHE_SIZE:
+                self._sorted.popitem(last=False)
+        return ordering
+
+# Templates compilés une seule fois au chargement du module
+TRANSACTIONS_HTML = '''
+<html>
+<head>
+    <title>Transactions TinyDB</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ccc; padding: 6px; text-align: left; }
+        th { background: #eee; }
+        th a { color: inherit; }
+        form, .pagination { margin: 10px 0; }
+    </style>
+</head>
+<body>
+    {{ nav() }}
+    <h2>Transactions enregistrées ({{ total }})</h2>
+    <form method="get">
+        <input type="hidden" name="sort" value="{{ params.sort }}">
+        <input type="hidden" name="order" value="{{ params.order }}">
+        <label>Token
+            <select name="token">
+                <option value="">Tous</option>
+                {% for token in tokens %}
+                <option value="{{ token }}" {% if token == params.token %}selected{% endif %}>{{ token }}</option>
+                {% endfor %}
+            </select>
+        </label>
+        <label>Du <input type="date" name="date_from" value="{{ params.date_from or '' }}"></label>
+        <label>au <input type="date" name="date_to" value="{{ params.date_to or '' }}"></label>
+        <label>Par page <input type="number" name="page_size" min="1" max="{{ max_page_size }}" value="{{ params.page_size }}"></label>
+        <button type="submit">Filtrer</button>
+    </form>
+    <div>
+        Télécharger tout l'historique filtré :
+        <a href="{{ url_for('export_transactions', fmt='csv', **export_args) }}">CSV</a> |
+        <a href="{{ url_for('export_transactions', fmt='html', **export_args) }}">HTML</a>
+    </div>
+    <table>
+        <tr>
+            <th>#</th>
+            {% for column, label in columns %}
+            <th>
+                {% if column %}
+                <a href="{{ page_url(sort=column, order='asc' if params.sort == column and params.order == 'desc' else 'desc', page=1) }}">{{ label }}</a>
+                {% if params.sort == column %}{{ '▼' if params.order == 'desc' else '▲' }}{% endif %}
+                {% else %}{{ label }}{% endif %}
+            </th>
+            {% endfor %}
+        </tr>
+        {% for tx in transactions %}
+        <tr>
+            <td>{{ offset + loop.index }}</td>
+            <td>{{ tx.get('date', '') }}</td>
+            <td>{{ tx.get('tokenName', '') }}</td>
+            <td>{{ tx.get('tokenSymbol', '') }}</td>
+            <td>{{ tx.get('value', '') }}</td>
+            <td>{{ tx.get('from', '') }}</td>
+            <td>{{ tx.get('to', '') }}</td>
+            <td style="font-size: 0.8em; word-break: break-all;">{{ tx.get('hash', '') }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+    <div class="pagination">
+        {% if params.page > 1 %}<a href="{{ page_url(page=params.page - 1) }}">&laquo; Précédente</a>{% endif %}
+        Page {{ params.page }} / {{ page_count }}
+        {% if params.page < page_count %}<a href="{{ page_url(page=params.page + 1) }}">Suivante &raquo;</a>{% endif %}
+    </div>
+</body>
+</html>
+'''
+transactions_template = app.jinja_env.from_string(TRANSACTIONS_HTML)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_transaction_index():
+    """Index du snapshot courant, reconstruit seulement quand le snapshot change"""
+    global _index
+    # Snapshot en lecture seule, relu uniquement si le pipeline a réécrit le fichier
+    transactions = read_snapshot('transactions')
+    with _index_lock:
+        if _index is None or _index.rows is not transactions:
+            _index = TransactionIndex(transactions)
+        return _index
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def get_query_params(args):
+    """Lit et valide les paramètres de pagination, de tri et de filtre"""
+    page = max(1, args.get('page', 1, type=int) or 1)
+    page_size = min(MAX_PAGE_SIZE, max(1, args.get('page_size', DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE))
+    sort = args.get('sort', 'date')
+    if sort not in SORT_KEYS:
+        sort = 'date'
+    order = 'asc' if args.get('order') == 'asc' else 'desc'
+    date_from = _parse_day(args.get('date_from'))
+    date_to = _parse_day(args.get('date_to'))
+    return {
+        'page': page,
+        'page_size': page_size,
+        'sort': sort,
+        'order': order,
+        'token': args.get('token') or None,
+        'date_from': date_from.strftime('%Y-%m-%d') if date_from else None,
+        'date_to': date_to.strftime('%Y-%m-%d') if date_to else None,
+        # Bornes en timestamps (la date de fin est incluse jusqu'à 23:59:59)
+        'start_ts': int(date_from.timestamp()) if date_from else None,
+        'end_ts': int((date_to + timedelta(days=1)).timestamp()) - 1 if date_to else None,
+    }
+
+def query_transactions(params, transaction_index=None):
+    """Exécute une requête sur l'index des transactions"""
+    transaction_index = transaction_index or get_transaction_index()
+    return transaction_index.query(
+        token=params['token'], start_ts=params['start_ts'], end_ts=params['end_ts'],
+        sort=params['sort'], order=params['order'],
+        page=params['page'], page_size=params['page_size']
+    )
+
+# Paramètres de la page des transactions qui apparaissent dans l'URL
+PAGE_PARAMS = ('page', 'page_size', 'sort', 'order', 'token', 'date_from', 'date_to')
+# Paramètres de filtre repris par les exports
+EXPORT_PARAMS = ('token', 'date_from', 'date_to')
+# Colonnes du tableau des transactions : (paramètre de tri ou None, libellé)
+TRANSACTION_COLUMNS = [('date', 'Date'), ('token', 'Token'), ('symbol', 'Symbole'), ('value', 'Valeur'),
+                       (None, 'De'), (None, 'À'), (None, 'Hash')]
+
+# Pages HTML déjà rendues, par page et par version des données :
+# les rechargements ne refont ni requête ni rendu
+PAGE_CACHE_SIZE = 64
+_pages = {}
+_pages_lock = threading.Lock()
+
+def get_cached_page(name, version, key, render):
+    """
+    Retourne la page `name` rendue pour `key` et cette version des données
+    (snapshot ou génération de store), en la calculant avec `render()` si besoin.
+    """
+    with _pages_lock:
+        cache = _pages.get(name)
+        if cache is None or cache['version'] != version:
+            # Nouvelles données : les pages rendues pour l'ancienne version sont périmées
+            cache = _pages[name] = {'version': version, 'pages': OrderedDict()}
+        pages = cache['pages']
+        if key in pages:
+            pages.move_to_end(key)
+            return pages[key]
+    page = render()
+    with _pages_lock:
+        if _pages.get(name) is cache:
+            pages[key] = page
+            if len(pages) > PAGE_CACHE_SIZE:
+                pages.popitem(last=False)
+    return page
+
+def render_transactions_page(transaction_index, params):
+    transactions, total = query_transactions(params, transaction_index)
+    page_count = max(1, -(-total // params['page_size']))
+
+    def page_url(**changes):
+        """URL de la page courante avec certains paramètres modifiés"""
+        args = {k: params[k] for k in PAGE_PARAMS if params[k] is not None}
+        args.update(changes)
+        return url_for('index', **args)
+
+    return transactions_template.render(
+        transactions=transactions, total=total, params=params, page_count=page_count,
+        offset=(params['page'] - 1) * params['page_size'], tokens=transaction_index.tokens,
+        columns=TRANSACTION_COLUMNS, page_url=page_url, max_page_size=MAX_PAGE_SIZE,
+        export_args={k: params[k] for k in EXPORT_PARAMS if params[k] is not None}
+    )
 
 @app.route('/')
 def index():
-    db = get_db()
-    transactions = db.all()
-    html = '''
-    <html>
-    <head>
-        <title>Transactions TinyDB</title>
-        <style>
-            body { font-family: Arial, sans-serif; }
-            table { border-collapse: collapse; width: 100%; }
-            th, td { border: 1px solid #ccc; padding: 6px; text-align: left; }
-            th { background: #eee; }
-        </style>
-    </head>
-    <body>
-        <h2>Transactions enregistrées</h2>
-        <table>
+    params = get_query_params(request.args)
+    transaction_index = get_transaction_index()
+    key = tuple(params[k] for k in PAGE_PARAMS)
+    return get_cached_page('transactions', transaction_index, key,
+                           lambda: render_transactions_page(transaction_index, params))
+
+# --- Achats, ventes et portefeuille ---
+
+PURCHASES_HTML = '''
+<html>
+<head>
+    <title>Achats</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ccc; padding: 6px; text-align: left; }
+        th { background: #eee; }
+    </style>
+</head>
+<body>
+    {{ nav() }}
+    <h2>Achats ({{ purchases|length }})</h2>
+    <table>
+        <tr>
+            <th>#</th>
+            <th>Date</th>
+            <th>Token</th>
+            <th>Propriété</th>
+            <th>Quantité</th>
+            <th>Prix ($)</th>
+            <th>Source</th>
+            <th>Facture</th>
+            <th>Hash</th>
+        </tr>
+        {% for purchase in purchases %}
+        <tr>
+            <td>{{ loop.index }}</td>
+            <td>{{ purchase.get('blockchain_date', '') }}</td>
+            <td>{{ purchase.get('token_symbol', '') }}</td>
+            <td>{{ purchase.get('product_address', '') }}</td>
+            <td>{{ purchase.get('quantity')|num(4) }}</td>
+            <td>{{ purchase.get('token_price_usd')|num }}</td>
+            <td>{{ purchase.get('source', '') }}</td>
+            <td>{{ purchase.get('invoice_number') or '' }}</td>
+            <td style="font-size: 0.8em; word-break: break-all;">{{ purchase.get('transaction_hash', '') }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+</body>
+</html>
+'''
+purchases_template = app.jinja_env.from_string(PURCHASES_HTML)
+
+SALES_HTML = '''
+<html>
+<head>
+    <title>Ventes</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ccc; padding: 6px; text-align: left; }
+        th { background: #eee; }
+    </style>
+</head>
+<body>
+    {{ nav() }}
+    <h2>Ventes ({{ sales|length }})</h2>
+    <table>
+        <tr>
+            <th>#</th>
+            <th>Date de vente</th>
+            <th>Token</th>
+            <th>Propriété</th>
+            <th>Quantité</th>
+            <th>Prix d'achat ($)</th>
+            <th>Prix de vente ($)</th>
+            <th>Reçu</th>
+            <th>ROI</th>
+            <th>Date d'achat</th>
+        </tr>
+        {% for sale in sales %}
+        <tr>
+            <td>{{ loop.index }}</td>
+            <td>{{ sale.get('sale_date', '') }}</td>
+            <td>{{ sale.get('token_symbol', '') }}</td>
+            <td>{{ sale.get('product_address', '') }}</td>
+            <td>{{ sale.get('quantity')|num(4) }}</td>
+            <td>{{ sale.get('buy_price')|num }}</td>
+            <td>{{ sale.get('sell_price')|num }}</td>
+            <td>{{ sale.get('total_received')|num }} {{ sale.get('payment_currency', '') }}</td>
+            <td>{{ sale.get('roi_percent')|num }} %</td>
+            <td>{{ sale.get('purchase_date', '') }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+</body>
+</html>
+'''
+sales_template = app.jinja_env.from_string(SALES_HTML)
+
+PORTFOLIO_HTML = '''
+<html>
+<head>
+    <title>Portefeuille</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ccc; padding: 6px; text-align: left; }
+        th { background: #eee; }
+    </style>
+</head>
+<body>
+    {{ nav() }}
+    <h2>Portefeuille</h2>
+    <p>
+        Propriétés détenues : {{ totals.tokens_held }} |
+        Investi : ${{ totals.total_invested|num }} |
+        Reçu des ventes : ${{ totals.total_received|num }} |
+        Coût des tokens vendus : ${{ totals.cost_of_sold|num }} |
+        PnL réalisé : ${{ totals.realized_pnl|num }} |
+        ROI réalisé : {{ totals.roi_percent|num }} %
+    </p>
+    <table>
+        <tr>
+            <th>Token</th>
+            <th>Propriété</th>
+            <th>Achetés</th>
+            <th>Vendus</th>
+            <th>Détenus</th>
+            <th>Prix moyen ($)</th>
+            <th>Investi ($)</th>
+            <th>Reçu ($)</th>
+            <th>PnL réalisé ($)</th>
+            <th>ROI réalisé</th>
+        </tr>
+        {% for symbol, position in positions %}
+        <tr>
+            <td>{{ symbol }}</td>
+            <td>{{ position.product_address or '' }}</td>
+            <td>{{ position.quantity_bought|num(4) }}</td>
+            <td>{{ position.quantity_sold|num(4) }}</td>
+            <td>{{ position.quantity_held|num(4) }}</td>
+            <td>{{ position.average_cost|num }}</td>
+            <td>{{ position.total_invested|num }}</td>
+            <td>{{ position.total_received|num }}</td>
+            <td>{{ position.realized_pnl|num }}</td>
+            <td>{{ position.roi_percent|num }} %</td>
+        </tr>
+        {% endfor %}
+    </table>
+</body>
+</html>
+'''
+portfolio_template = app.jinja_env.from_string(PORTFOLIO_HTML)
+
+def filter_by_token(documents, token):
+    if not token:
+        return documents
+    return [doc for doc in documents if doc.get('token_symbol') == token]
+
+@app.route('/purchases')
+def purchases():
+    token = request.args.get('token') or None
+    return get_cached_page('purchases', get_store_generation('purchases'), token, lambda: purchases_template.render(
+        purchases=filter_by_token(read_snapshot('purchases'), token)
+    ))
+
+@app.route('/sales')
+def sales():
+    token = request.args.get('token') or None
+    return get_cached_page('sales', get_store_generation('sales'), token, lambda: sales_template.render(
+        sales=filter_by_token(read_snapshot('sales'), token)
+    ))
+
+@app.route('/portfolio')
+def portfolio():
+    # Agrégats maintenus par le pipeline (db.insert_purchases / db.save_sales)
+    data = read_portfolio()
+    return get_cached_page('portfolio', repr(data['generations']), None, lambda: portfolio_template.render(
+        totals=data['totals'], positions=sorted(data['tokens'].items())
+    ))
+
+# --- Exports complets en flux ---
+
+# Nombre de transactions écrites par morceau de réponse
+EXPORT_CHUNK_ROWS = 500
+# Champs exportés en CSV, dans l'ordre des colonnes
+EXPORT_FIELDS = ['date', 'timeStamp', 'blockNumber', 'tokenName', 'tokenSymbol', 'value',
+                 'formatted_value', 'from', 'to', 'hash']
+
+EXPORT_HTML = '''
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Historique des transactions</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ccc; padding: 6px; text-align: left; }
+        th { background: #eee; }
+    </style>
+</head>
+<body>
+    <h2>Historique des transactions</h2>
+    <table>
+        <tr>
+            <th>#</th>
+            {% for column, label in columns %}<th>{{ label }}</th>{% endfor %}
+        </tr>
+        {% for tx in transactions %}
+        <tr>
+            <td>{{ loop.index }}</td>
+            <td>{{ tx.get('date', '') }}</td>
+            <td>{{ tx.get('tokenName', '') }}</td>
+            <td>{{ tx.get('tokenSymbol', '') }}</td>
+            <td>{{ tx.get('value', '') }}</td>
+            <td>{{ tx.get('from', '') }}</td>
+            <td>{{ tx.get('to', '') }}</td>
+            <td style="font-size: 0.8em; word-break: break-all;">{{ tx.get('hash', '') }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+</body>
+</html>
+'''
+export_template = app.jinja_env.from_string(EXPORT_HTML)
+
+def iter_csv(rows):
+    """Génère le CSV par morceaux de EXPORT_CHUNK_ROWS lignes"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for count, tx in enumerate(rows, 1):
+        writer.writerow(tx)
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_chunks(fragments, size=64 * 1024):
+    """Regroupe les fragments du rendu Jinja en morceaux d'environ `size` caractères"""
+    parts, length = [], 0
+    for fragment in fragments:
+        parts.append(fragment)
+        length += len(fragment)
+        if length >= size:
+            yield ''.join(parts)
+            parts, length = [], 0
+    if parts:
+        yield ''.join(parts)
+
+@app.route('/export/transactions.<fmt>')
+def export_transactions(fmt):
+    """
+    Export de tout l'historique (filtres token/date optionnels), envoyé au fur et à mesure :
+    les lignes sont produites par un générateur sur le snapshot, jamais rendues d'un bloc.
+    """
+    if fmt not in ('csv', 'html'):
+        abort(404)
+    params = get_query_params(request.args)
+    rows = get_transaction_index().iter_rows(params['token'], params['start_ts'], params['end_ts'])
+
+    if fmt == 'csv':
+        body, mimetype = iter_csv(rows), 'text/csv'
+    else:
+        body = iter_chunks(export_template.generate(transactions=rows, columns=TRANSACTION_COLUMNS))
+        mimetype = 'text/html'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=transactions.{fmt}'
+    return response
+
+# --- Progression du pipeline en direct (SSE) ---
+
+# Délai entre deux lectures du fichier des événements
+EVENTS_POLL_INTERVAL = 0.5
+# Délai maximal sans message avant un commentaire de maintien de la connexion
+EVENTS_KEEPALIVE = 15
+
+def parse_event_id(value):
+    """Last-Event-ID : 'inode-position' du dernier événement reçu par le navigateur"""
+    try:
+        inode, offset = value.split('-')
+        return int(inode), int(offset)
+    except (AttributeError, ValueError):
+        return None, 0
+
+def iter_progress_events(inode=None, offset=0):
+    """
+    Suit le fichier des événements du pipeline (comme `tail -f`) et génère les messages SSE.
+    L'id de chaque message est sa position dans le fichier, pour reprendre au bon endroit
+    après une reconnexion. Un fichier remplacé (nouvelle exécution) est relu depuis le début,
+    précédé d'un événement `reset`.
+    """
+    path = get_progress_path()
+    last_sent = time.monotonic()
+    while True:
+        data = b''
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != inode or st.st_size < offset:
+                    if inode is not None:
+                        yield 'event: reset\ndata: {}\n\n'
+                    inode, offset = st.st_ino, 0
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            pass
+
+        # Seules les lignes complètes sont envoyées, une ligne partielle sera relue
+        end = data.rfind(b'\n')
+        if end >= 0:
+            for line in data[:end].split(b'\n'):
+                offset += len(line) + 1
+                if line.strip():
+                    yield f"id: {inode}-{offset}\ndata: {line.decode('utf-8')}\n\n"
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= EVENTS_KEEPALIVE:
+            yield ': ping\n\n'
+            last_sent = time.monotonic()
+        time.sleep(EVENTS_POLL_INTERVAL)
+
+@app.route('/events')
+def events():
+    inode, offset = parse_event_id(request.headers.get('Last-Event-ID'))
+    response = Response(stream_with_context(iter_progress_events(inode, offset)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un éventuel reverse proxy
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+PROGRESS_HTML = '''
+<html>
+<head>
+    <title>Progression du pipeline</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ccc; padding: 6px; text-align: left; }
+        th { background: #eee; }
+        .stalled { background: #fdd; }
+    </style>
+</head>
+<body>
+    {{ nav() }}
+    <h2>Progression du pipeline</h2>
+    <p id="pipeline">En attente d'événements...</p>
+    <table>
+        <thead>
             <tr>
-                <th>#</th>
-                <th>Date</th>
-                <th>Token</th>
-                <th>Symbole</th>
-                <th>Valeur</th>
-                <th>De</th>
-                <th>À</th>
-                <th>Hash</th>
+                <th>Étape</th>
+                <th>Statut</th>
+                <th>Durée</th>
             </tr>
-            {% for tx in transactions %}
+        </thead>
+        <tbody id="steps"></tbody>
+    </table>
+    <h3>Avancement</h3>
+    <table>
+        <thead>
             <tr>
-                <td>{{ loop.index }}</td>
-                <td>{{ tx.get('date', '') }}</td>
-                <td>{{ tx.get('tokenName', '') }}</td>
-                <td>{{ tx.get('tokenSymbol', '') }}</td>
-                <td>{{ tx.get('value', '') }}</td>
-                <td>{{ tx.get('from', '') }}</td>
-                <td>{{ tx.get('to', '') }}</td>
-                <td style="font-size: 0.8em; word-break: break-all;">{{ tx.get('hash', '') }}</td>
+                <th>Étape</th>
+                <th>Éléments</th>
+                <th>Traités</th>
+                <th>Débit (/s)</th>
+                <th>ETA</th>
+                <th>Dernière mise à jour</th>
             </tr>
-            {% endfor %}
-        </table>
-    </body>
-    </html>
-    '''
-    return render_template_string(html, transactions=transactions)
+        </thead>
+        <tbody id="progress"></tbody>
+    </table>
+    <script>
+        // Délai (secondes) sans nouvelle progression au-delà duquel une étape est signalée
+        const STALLED_AFTER = {{ stalled_after }};
+        let steps = {}, progress = {};
+
+        function duration(seconds) {
+            if (seconds === null || seconds === undefined) return '';
+            seconds = Math.round(seconds);
+            return seconds >= 60 ? Math.floor(seconds / 60) + ' min ' + (seconds % 60) + ' s' : seconds + ' s';
+        }
+
+        // Les valeurs des événements (messages d'erreur, noms...) sont insérées comme texte, jamais comme HTML
+        function row(cells, className) {
+            const tr = document.createElement('tr');
+            if (className) tr.className = className;
+            cells.forEach(value => {
+                const td = document.createElement('td');
+                td.textContent = value;
+                tr.appendChild(td);
+            });
+            return tr;
+        }
+
+        function render() {
+            const now = Date.now() / 1000;
+            document.getElementById('steps').replaceChildren(...Object.entries(steps).map(([step, s]) =>
+                row([step, s.status, duration(s.duration)])));
+            document.getElementById('progress').replaceChildren(...Object.values(progress).map(p => {
+                const age = now - p.time;
+                const running = steps[p.step] && steps[p.step].status === 'en cours';
+                const stalled = running && age > STALLED_AFTER;
+                return row([p.step, p.label,
+                            p.count + (p.total !== null ? ' / ' + p.total : ''),
+                            p.rate !== null ? p.rate.toFixed(2) : '', duration(p.eta),
+                            'il y a ' + duration(age) + (stalled ? ' (aucune progression)' : '')],
+                           stalled ? 'stalled' : '');
+            }));
+        }
+
+        const source = new EventSource('{{ url_for("events") }}');
+        source.addEventListener('reset', () => { steps = {}; progress = {}; render(); });
+        source.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            if (event.type === 'pipeline_start') {
+                steps = {}; progress = {};
+                event.steps.forEach(step => steps[step] = {status: 'à venir'});
+                document.getElementById('pipeline').textContent = 'Pipeline en cours';
+            } else if (event.type === 'step_start') {
+                steps[event.step] = {status: 'en cours'};
+            } else if (event.type === 'step_end') {
+                steps[event.step] = {status: event.status === 'error' ? 'erreur : ' + event.error : event.status,
+                                     duration: event.duration};
+            } else if (event.type === 'progress') {
+                progress[event.step + '/' + event.label] = event;
+            } else if (event.type === 'pipeline_end') {
+                document.getElementById('pipeline').textContent =
+                    event.status === 'ok' ? 'Pipeline terminé' : 'Pipeline terminé avec des erreurs';
+            }
+            render();
+        };
+        setInterval(render, 1000);
+    </script>
+</body>
+</html>
+'''
+progress_template = app.jinja_env.from_string(PROGRESS_HTML)
+
+# Délai (secondes) sans progression au-delà duquel une étape en cours est signalée
+STALLED_AFTER = 30
+
+@app.route('/progress')
+def progress():
+    return progress_template.render(stalled_after=STALLED_AFTER)
+
+# --- API JSON ---
+
+# Taille minimale (octets) d'une réponse JSON pour la compresser en gzip
+GZIP_MIN_SIZE = 1024
+# Réponses JSON déjà sérialisées (et compressées), par ETag
+API_CACHE_SIZE = 64
+_api_responses = OrderedDict()
+_api_lock = threading.Lock()
+
+def get_etag(stores, params=None):
+    """ETag d'une réponse : générations des stores lus et paramètres de la requête"""
+    key = repr(([get_store_generation(name) for name in stores], sorted((params or {}).items())))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def json_response(stores, params, build):
+    """
+    Réponse JSON conditionnelle :
+    - 304 sans recalcul si le client a déjà la version courante (If-None-Match) ;
+    - sinon le corps est construit par `build()`, sérialisé une seule fois par ETag,
+      et compressé en gzip s'il est assez gros et que le client l'accepte.
+    """
+    etag = get_etag(stores, params)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    with _api_lock:
+        cached = _api_responses.get(etag)
+        if cached is not None:
+            _api_responses.move_to_end(etag)
+    if cached is None:
+        body = json.dumps(build(), ensure_ascii=False).encode('utf-8')
+        compressed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+        cached = (body, compressed)
+        with _api_lock:
+            _api_responses[etag] = cached
+            if len(_api_responses) > API_CACHE_SIZE:
+                _api_responses.popitem(last=False)
+
+    body, compressed = cached
+    response = Response(body, mimetype='application/json')
+    if compressed is not None and 'gzip' in request.accept_encodings:
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag, weak=True)
+    return response
+
+@app.route('/api/transactions')
+def api_transactions():
+    params = get_query_params(request.args)
+
+    def build():
+        transactions, total = query_transactions(params)
+        return {
+            'total': total,
+            'page': params['page'],
+            'page_size': params['page_size'],
+            'transactions': transactions,
+        }
+
+    return json_response(['transactions'], {k: params[k] for k in PAGE_PARAMS}, build)
+
+@app.route('/api/purchases')
+def api_purchases():
+    token = request.args.get('token') or None
+    return json_response(['purchases'], {'token': token},
+                         lambda: filter_by_token(read_snapshot('purchases'), token))
+
+@app.route('/api/sales')
+def api_sales():
+    token = request.args.get('token') or None
+    return json_response(['sales'], {'token': token},
+                         lambda: filter_by_token(read_snapshot('sales'), token))
+
+@app.route('/api/roi')
+def api_roi():
+    return json_response(['sales'], None, lambda: summarize_roi(read_snapshot('sales')))
+
+@app.route('/api/portfolio')
+def api_portfolio():
+    return json_response(['purchases', 'sales'], None, read_portfolio)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Un thread par requête : le flux /events reste ouvert pendant la navigation
+    app.run(debug=True, threaded=True)
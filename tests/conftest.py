@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+# Les modules de src/ s'importent par leur nom, comme depuis src/main.py
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from db import DATA_DIR_ENV
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Dossier des données isolé (REALTROI_DATA_DIR), les factures PDF dans tmp_path/invoices"""
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    monkeypatch.setenv(DATA_DIR_ENV, str(directory))
+    return directory
+
+
+@pytest.fixture
+def woocommerce():
+    """Serveur WooCommerce local (voir fake_woocommerce), arrêté à la fin du test"""
+    from fake_woocommerce import FakeWooCommerce
+    server = FakeWooCommerce().start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """Configuration d'un portefeuille de test (REALTROI_CONFIG), relue par load_config"""
+    import utils
+    path = tmp_path / 'config.ini'
+    path.write_text('[DEFAULT]\ngnosis_address = 0x00000000000000000000000000000000000000aa\n', encoding='utf-8')
+    monkeypatch.setenv(utils.CONFIG_ENV, str(path))
+    monkeypatch.setattr(utils, '_config', None)
+    return path
@@ -0,0 +1,167 @@
+"""
+Serveur local qui imite les pages WooCommerce du site RealT utilisées par
+realt_scraper.HttpBackend : formulaire de connexion avec nonce, liste paginée
+des commandes et factures PDF envoyées par blocs (Transfer-Encoding: chunked).
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+USERNAME = 'investor@example.com'
+PASSWORD = 'correct horse'
+NONCE = 'f00dcafe42'
+SESSION_COOKIE = 'wordpress_logged_in_test'
+
+LOGIN_FORM = """
+<form class="woocommerce-form woocommerce-form-login login" method="post">
+  <input type="text" name="username" id="username" value="">
+  <input type="password" name="password" id="password">
+  <input type="hidden" id="woocommerce-login-nonce" name="woocommerce-login-nonce" value="{nonce}">
+  <input type="hidden" name="_wp_http_referer" value="/my-account/">
+  <button type="submit" class="woocommerce-button button" name="login" value="Log in">Log in</button>
+</form>
+"""
+
+LOGIN_ERROR = """
+<ul class="woocommerce-error" role="alert">
+  <li><strong>Error:</strong> The password you entered for the email address
+  <strong>{username}</strong> is incorrect.</li>
+</ul>
+"""
+
+INVOICE_LINK = ('<a href="/wp-admin/admin-ajax.php?action=generate_wpo_wcpdf&amp;document_type=invoice'
+                '&amp;order_ids={order_id}&amp;_wpnonce=abc" class="woocommerce-button button invoice">Invoice</a>')
+
+
+def make_pdf(order_id, size=200 * 1024):
+    """Contenu d'une facture : un en-tête PDF suivi de `size` octets propres à la commande"""
+    body = f'order {order_id}\n'.encode('ascii')
+    return b'%PDF-1.4\n' + (body * (size // len(body) + 1))[:size] + b'\n%%EOF\n'
+
+
+class FakeWooCommerce:
+    """
+    Site WooCommerce en mémoire.
+
+    Attributes:
+        orders: Numéros des commandes, un tableau par page (de la plus récente à la plus ancienne)
+        logins: Formulaires de connexion reçus (dict des champs)
+        requests: Chemins demandés, dans l'ordre
+    """
+
+    def __init__(self, orders=None, chunk_size=16 * 1024):
+        self.orders = orders or [['1003', '1002'], ['1001', '1000']]
+        self.chunk_size = chunk_size
+        self.logins = []
+        self.requests = []
+        self.pdfs = {order_id: make_pdf(order_id) for page in self.orders for order_id in page}
+        self._sessions = set()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _make_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def logged_in(self):
+                for part in (self.headers.get('Cookie') or '').split(';'):
+                    name, _, value = part.strip().partition('=')
+                    if name == SESSION_COOKIE and value in site._sessions:
+                        return True
+                return False
+
+            def send_html(self, html, status=200, headers=()):
+                content = f'<html><body>{html}</body></html>'.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=UTF-8')
+                self.send_header('Content-Length', str(len(content)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                site.requests.append(url.path)
+                if url.path == '/my-account/':
+                    if self.logged_in():
+                        self.send_html('<nav class="woocommerce-MyAccount-navigation"></nav>')
+                    else:
+                        self.send_html(LOGIN_FORM.format(nonce=NONCE))
+                elif url.path.startswith('/my-account/orders/'):
+                    self.send_orders(url.path[len('/my-account/orders/'):].strip('/'))
+                elif url.path == '/wp-admin/admin-ajax.php':
+                    self.send_invoice(parse_qs(url.query).get('order_ids', [''])[0])
+                else:
+                    self.send_html('Not found', status=404)
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                site.requests.append(url.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                fields = {name: values[0] for name, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+                site.logins.append(fields)
+                if fields.get('woocommerce-login-nonce') != NONCE or fields.get('_wp_http_referer') != '/my-account/':
+                    self.send_html('Nonce invalide', status=403)
+                elif fields.get('username') != USERNAME or fields.get('password') != PASSWORD:
+                    self.send_html(LOGIN_ERROR.format(username=fields.get('username')) + LOGIN_FORM.format(nonce=NONCE))
+                else:
+                    # Jeton unique, même après l'expiration des sessions (_sessions vidé)
+                    token = f'session{len(site.logins)}'
+                    site._sessions.add(token)
+                    self.send_response(302)
+                    self.send_header('Location', '/my-account/')
+                    self.send_header('Set-Cookie', f'{SESSION_COOKIE}={token}; Path=/; HttpOnly')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+
+            def send_orders(self, page):
+                if not self.logged_in():
+                    self.send_html(LOGIN_FORM.format(nonce=NONCE))
+                    return
+                number = int(page or 1)
+                if not 1 <= number <= len(site.orders):
+                    self.send_html('Not found', status=404)
+                    return
+                html = '<table>' + ''.join(INVOICE_LINK.format(order_id=order_id)
+                                           for order_id in site.orders[number - 1]) + '</table>'
+                if number < len(site.orders):
+                    html += f'<a class="next page-numbers" href="/my-account/orders/{number + 1}">Next</a>'
+                self.send_html(html)
+
+            def send_invoice(self, order_id):
+                if not self.logged_in():
+                    self.send_html('Accès refusé', status=403)
+                    return
+                content = site.pdfs.get(order_id)
+                if content is None:
+                    self.send_html('Commande inconnue', status=404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/pdf')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for start in range(0, len(content), site.chunk_size):
+                    chunk = content[start:start + site.chunk_size]
+                    self.wfile.write(f'{len(chunk):x}\r\n'.encode('ascii') + chunk + b'\r\n')
+                self.wfile.write(b'0\r\n\r\n')
+
+        return Handler
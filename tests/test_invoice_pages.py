@@ -0,0 +1,109 @@
+from utils import parse_invoice_pages
+
+HEADER = """RealT
+Invoice Number: 4521
+Invoice Date: March 3, 2024
+Order Number: 98765
+Payment Method: Credit Card
+"""
+
+TERMS = "Terms and conditions\nAll sales are final.\n"
+
+
+def test_products_table_spanning_two_pages():
+    pages = [
+        HEADER + "PRODUCT PRICE QUANTITY TOTAL\n"
+                 "9943 Marlowe St, Detroit, MI 48227 $50.59 10 $505.90\n",
+        "PRODUCT PRICE QUANTITY TOTAL\n"
+        "15095 Hartwell St, Detroit, MI 48227 $51.23 3 $153.69\n"
+        "SUBTOTAL $659.59\n",
+    ]
+
+    order_info, products = parse_invoice_pages(pages)
+
+    assert order_info['invoice_number'] == '4521'
+    assert products == [
+        {'address': '9943 Marlowe St, Detroit, MI 48227', 'token_price': 50.59, 'quantity': 10.0},
+        {'address': '15095 Hartwell St, Detroit, MI 48227', 'token_price': 51.23, 'quantity': 3.0},
+    ]
+
+
+def test_rows_after_subtotal_are_ignored():
+    pages = [
+        HEADER + "PRODUCT PRICE QUANTITY TOTAL\n"
+                 "9943 Marlowe St, Detroit, MI 48227 $50.59 10 $505.90\n"
+                 "SUBTOTAL $505.90\n"
+                 "Fees $1.00 1 $1.00\n",
+        "Refund policy $9.99 2 $19.98\n",
+    ]
+
+    _, products = parse_invoice_pages(pages)
+
+    assert [product['address'] for product in products] == ['9943 Marlowe St, Detroit, MI 48227']
+
+
+def test_decimal_quantities():
+    pages = [HEADER + "PRODUCT PRICE QUANTITY TOTAL\n"
+                      "9943 Marlowe St, Detroit, MI 48227 $50.59 2.5 $126.48\n"
+                      "15095 Hartwell St, Detroit, MI 48227 $51.23 .75 $38.42\n"
+                      "SUBTOTAL $164.90\n"]
+
+    _, products = parse_invoice_pages(pages)
+
+    assert [product['quantity'] for product in products] == [2.5, 0.75]
+
+
+def test_header_fields_found_on_second_page():
+    pages = [
+        "Invoice Number: 4521\nInvoice Date: March 3, 2024\n"
+        "PRODUCT PRICE QUANTITY TOTAL\n"
+        "9943 Marlowe St, Detroit, MI 48227 $50.59 10 $505.90\n"
+        "SUBTOTAL $505.90\n",
+        "Order Number: 98765\nPayment Method: Credit Card\n",
+    ]
+
+    order_info, products = parse_invoice_pages(pages)
+
+    assert order_info == {
+        'invoice_number': '4521',
+        'invoice_date': 'March 3, 2024',
+        'order_number': '98765',
+        'payment_method': 'Credit Card',
+    }
+    assert len(products) == 1
+
+
+def test_stops_reading_pages_once_complete():
+    pages_read = []
+
+    def pages():
+        for text in (HEADER + "PRODUCT PRICE QUANTITY TOTAL\n"
+                              "9943 Marlowe St, Detroit, MI 48227 $50.59 10 $505.90\n",
+                     "SUBTOTAL $505.90\n",
+                     TERMS,
+                     TERMS):
+            pages_read.append(text)
+            yield text
+
+    _, products = parse_invoice_pages(pages())
+
+    assert len(products) == 1
+    assert len(pages_read) == 2
+
+
+def test_keeps_reading_pages_until_header_is_complete():
+    pages_read = []
+
+    def pages():
+        for text in ("Invoice Number: 4521\nPRODUCT PRICE QUANTITY TOTAL\nSUBTOTAL $0.00\n",
+                     TERMS,
+                     "Invoice Date: March 3, 2024\nOrder Number: 98765\nPayment Method: Crypto\n",
+                     TERMS):
+            pages_read.append(text)
+            yield text
+
+    order_info, products = parse_invoice_pages(pages())
+
+    assert products == []
+    assert order_info['payment_method'] == 'Crypto'
+    assert len(pages_read) == 3
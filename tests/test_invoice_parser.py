@@ -0,0 +1,112 @@
+import os
+import threading
+
+import pytest
+
+import db
+import invoice_parser
+import shared_cache
+import utils
+from invoice_parser import InvoiceIngestor
+
+
+def make_invoice(number):
+    return {
+        'order_info': {'invoice_number': number, 'invoice_date': 'June 3, 2024', 'order_number': number},
+        'products': [{'address': '0x01', 'quantity': 1.0, 'token_price': 50.0}],
+    }
+
+
+def parse_fake_pdf(filepath):
+    """Analyse simulée : le numéro de facture est le contenu du fichier"""
+    with open(filepath, encoding='utf-8') as f:
+        content = f.read()
+    if content.startswith('broken'):
+        raise ValueError('PDF illisible')
+    return make_invoice(content)
+
+
+def kill_worker(filepath):
+    # Processus d'analyse tué (OOM...) : le pool devient inutilisable
+    os._exit(1)
+
+
+@pytest.fixture
+def invoice_dir(tmp_path):
+    directory = tmp_path / 'invoices'
+    directory.mkdir()
+    return directory
+
+
+def write_pdfs(directory, contents):
+    paths = []
+    for i, content in enumerate(contents):
+        path = directory / f'invoice_{i}.pdf'
+        path.write_text(content, encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+def ingest(paths, workers):
+    """Analyse les fichiers avec un InvoiceIngestor, en échouant au lieu de bloquer"""
+    ingestor = InvoiceIngestor(workers).start()
+    result = {}
+
+    def run():
+        for path in paths:
+            ingestor.submit(path)
+        result['stats'] = ingestor.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "InvoiceIngestor.close() bloqué"
+    return result['stats']
+
+
+def test_parse_errors_are_recorded_per_file(data_dir, invoice_dir, monkeypatch):
+    monkeypatch.setattr(invoice_parser, 'parse_invoice_pdf', parse_fake_pdf)
+    paths = write_pdfs(invoice_dir, ['A1', 'broken', 'A2'])
+
+    stats = ingest(paths, workers=1)
+
+    assert (stats['total'], stats['success'], stats['errors']) == (3, 2, 1)
+    assert stats['error_files'] == ['invoice_1.pdf']
+    assert sorted(doc['order_info']['invoice_number'] for doc in db.read_snapshot('invoices')) == ['A1', 'A2']
+
+
+def test_broken_process_pool_does_not_hang(data_dir, invoice_dir, monkeypatch):
+    monkeypatch.setattr(invoice_parser, 'parse_invoice_pdf', kill_worker)
+    paths = write_pdfs(invoice_dir, [f'K{i}' for i in range(6)])
+
+    stats = ingest(paths, workers=2)
+
+    assert (stats['total'], stats['errors']) == (6, 6)
+    assert stats['error_files'] == [os.path.basename(path) for path in paths]
+
+
+def test_unchanged_pdfs_are_not_parsed_again(data_dir, invoice_dir, monkeypatch):
+    monkeypatch.setattr(invoice_parser, 'parse_invoice_pdf', parse_fake_pdf)
+    paths = write_pdfs(invoice_dir, ['A1', 'A2'])
+    ingest(paths, workers=1)
+
+    monkeypatch.setattr(invoice_parser, 'parse_invoice_pdf', kill_worker)
+    stats = ingest(paths, workers=1)
+
+    assert (stats['success'], stats['cached']) == (2, 2)
+
+
+def test_shared_invoices_are_not_copied_to_portfolio(data_dir, invoice_dir, tmp_path, monkeypatch):
+    shared_dir = tmp_path / 'shared'
+    monkeypatch.setenv(shared_cache.SHARED_CACHE_ENV, str(shared_dir))
+    paths = write_pdfs(invoice_dir, ['S1'])
+    own = utils.file_sha256(paths[0])
+    record = lambda number: {'parser_version': utils.PARSER_VERSION, 'invoice': make_invoice(number)}
+    db.atomic_write_json(shared_cache.get_shared_manifest_path(str(shared_dir)),
+                         {'hashes': {own: record('S1'), 'other-portfolio': record('X9')}})
+    monkeypatch.setattr(invoice_parser, 'parse_invoice_pdf', kill_worker)
+
+    stats = ingest(paths, workers=1)
+
+    assert (stats['success'], stats['cached']) == (1, 1)
+    assert list(db.load_invoice_manifest()['hashes']) == [own]
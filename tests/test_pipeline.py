@@ -0,0 +1,150 @@
+import json
+
+import journal
+import main
+import utils
+
+# Les tests remplacent main.get_steps par des étapes simulées construites à partir de celles-ci
+PIPELINE_STEPS = main.get_steps
+
+
+def make_steps(calls, failing=()):
+    """Étapes du pipeline réel (mêmes dépendances) dont l'exécution est simulée"""
+    def make_func(step):
+        def func():
+            calls.append(step)
+            if step in failing:
+                raise RuntimeError(f'{step} en échec')
+        return func
+
+    steps = PIPELINE_STEPS()
+    for step, spec in steps.items():
+        spec['func'] = make_func(step)
+    return steps
+
+
+def read_events(data_dir):
+    with open(data_dir / 'progress.jsonl', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failed_step_cancels_dependents(data_dir):
+    calls = []
+    steps = make_steps(calls, failing={'blockchain'})
+
+    status = main.run_steps(steps, list(steps))
+
+    assert status == {'invoices': 'ok', 'blockchain': 'error', 'purchases': 'cancelled', 'sales': 'cancelled'}
+    assert sorted(calls) == ['blockchain', 'invoices']
+    cancelled = [event['step'] for event in read_events(data_dir)
+                 if event['type'] == 'step_end' and event['status'] == 'cancelled']
+    assert cancelled == ['purchases', 'sales']
+
+
+def test_skipped_step_does_not_cancel_dependents(data_dir):
+    calls = []
+    steps = make_steps(calls)
+
+    status = main.run_steps(steps, list(steps), skip_invoices=True, jobs=1)
+
+    assert status == {'invoices': 'skipped', 'blockchain': 'ok', 'purchases': 'ok', 'sales': 'ok'}
+    assert calls == ['blockchain', 'purchases', 'sales']
+
+
+def test_resume_skips_steps_completed_by_failed_run(data_dir, config_file, monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, 'get_steps', lambda: make_steps(calls, failing={'purchases'}))
+
+    assert not main.run_pipeline(jobs=1, force=True)
+    assert calls == ['invoices', 'blockchain', 'purchases']
+    saved = json.loads((data_dir / 'journal.json').read_text(encoding='utf-8'))
+    assert {step: entry['status'] for step, entry in saved['steps'].items()} == {
+        'invoices': 'done', 'blockchain': 'done'}
+
+    calls.clear()
+    monkeypatch.setattr(main, 'get_steps', lambda: make_steps(calls))
+    assert main.run_pipeline(jobs=1, force=True, resume=True)
+    assert calls == ['purchases', 'sales']
+    # Exécution terminée sans erreur : le journal est effacé
+    assert not (data_dir / 'journal.json').exists()
+
+
+def test_checkpoint_is_only_returned_on_resume(data_dir):
+    journal.start_run(['purchases'])
+    journal.save_checkpoint('purchases', invoices=['N1', 'N2'])
+    assert journal.get_checkpoint('purchases') == {}
+    journal.finish_run(success=False)
+
+    journal.start_run(['purchases'], resume=True)
+    assert journal.get_checkpoint('purchases') == {'invoices': ['N1', 'N2']}
+    journal.complete_step('purchases')
+    assert journal.get_checkpoint('purchases') == {}
+    journal.finish_run(success=False)
+
+    # Sans --resume, le journal précédent est oublié
+    assert journal.start_run(['purchases']) == set()
+    assert journal.get_checkpoint('purchases') == {}
+    journal.finish_run(success=True)
+    assert not (data_dir / 'journal.json').exists()
+
+
+def test_only_step_failure_fails_strict_pipeline(data_dir, config_file, monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, 'get_steps', lambda: make_steps(calls, failing={'sales'}))
+
+    assert main.run_pipeline(only_step='sales', force=True)
+    assert not main.run_pipeline(only_step='sales', force=True, strict=True)
+
+
+def test_unchanged_steps_are_skipped(data_dir, config_file, monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, 'get_steps', lambda: make_steps(calls))
+    assert main.run_pipeline(jobs=1)
+    assert calls == ['invoices', 'blockchain', 'purchases', 'sales']
+
+    calls.clear()
+    assert main.run_pipeline(jobs=1)
+    # Sources externes : toujours interrogées sans invoices_cache_ttl / blockchain_cache_ttl
+    assert calls == ['invoices', 'blockchain']
+    cached = [event['step'] for event in read_events(data_dir)
+              if event['type'] == 'step_end' and event['status'] == 'cached']
+    assert cached == ['purchases', 'sales']
+
+
+def test_changed_input_or_config_reruns_step(data_dir, config_file, monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, 'get_steps', lambda: make_steps(calls))
+    assert main.run_pipeline(jobs=1)
+
+    # Nouvelles factures : seul purchases lit ce store
+    (data_dir / 'invoices.json').write_text('{"_default": {}}', encoding='utf-8')
+    calls.clear()
+    assert main.run_pipeline(jobs=1)
+    assert calls == ['invoices', 'blockchain', 'purchases']
+
+    # Nouvelle adresse : purchases et sales utilisent gnosis_address
+    config_file.write_text('[DEFAULT]\ngnosis_address = 0x00000000000000000000000000000000000000bb\n',
+                           encoding='utf-8')
+    monkeypatch.setattr(utils, '_config', None)
+    calls.clear()
+    assert main.run_pipeline(jobs=1)
+    assert calls == ['invoices', 'blockchain', 'purchases', 'sales']
+
+
+def test_force_and_only_step_bypass_step_cache(data_dir, config_file, monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, 'get_steps', lambda: make_steps(calls))
+    config_file.write_text('[DEFAULT]\ngnosis_address = 0x00000000000000000000000000000000000000aa\n'
+                           'invoices_cache_ttl = 3600\nblockchain_cache_ttl = 3600\n', encoding='utf-8')
+    assert main.run_pipeline(jobs=1)
+
+    calls.clear()
+    assert main.run_pipeline(jobs=1)
+    assert calls == []
+
+    assert main.run_pipeline(jobs=1, force=True)
+    assert calls == ['invoices', 'blockchain', 'purchases', 'sales']
+
+    calls.clear()
+    assert main.run_pipeline(only_step='invoices')
+    assert calls == ['invoices']
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import db
+
+TOKENS = ['REALTOKEN-S-9943-MARLOWE-ST-DETROIT-MI', 'REALTOKEN-S-15095-HARTWELL-ST-DETROIT-MI',
+          'REALTOKEN-S-4680-KENTUCKY-ST-DETROIT-MI']
+
+
+def purchase(i, **fields):
+    return {'transaction_hash': f'0xa{i}', 'invoice_number': str(4500 + i), 'token_symbol': TOKENS[i % 3],
+            'token_name': TOKENS[i % 3].title(), 'product_address': TOKENS[i % 3][11:], 'quantity': 1.0 + i,
+            'token_price_usd': 50.0 + i, 'source': 'invoice', **fields}
+
+
+def p2p_purchase(i):
+    # Achat P2P sans prix connu : compté dans les quantités, pas dans l'investissement
+    return {'transaction_hash': f'0xc{i}', 'token_symbol': TOKENS[i % 3], 'quantity': 2.0,
+            'token_price_usd': None, 'source': 'p2p'}
+
+
+def sale(i, purchase_id):
+    return {'sale_hash': f'0xb{i}', 'purchase_id': purchase_id, 'token_symbol': TOKENS[i % 3],
+            'quantity': 0.5, 'buy_price': 50.0 + i, 'total_received': 27.5 + i}
+
+
+def rounded(value):
+    """Agrégats comparés à 1e-6 près (ordre des additions différent)"""
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    if isinstance(value, float):
+        return pytest.approx(value, abs=1e-6)
+    return value
+
+
+def assert_matches_rebuild(data_dir):
+    portfolio = db.read_portfolio()
+    # Agrégats mis à jour à chaque écriture, sans recalcul
+    assert portfolio == json.loads((data_dir / 'portfolio.json').read_text(encoding='utf-8'))
+    assert rounded(db.rebuild_portfolio()) == portfolio
+
+
+def test_incremental_portfolio_matches_rebuild(data_dir):
+    db.insert_purchases([purchase(i) for i in range(6)])
+    db.insert_purchases([purchase(i) for i in range(6, 10)] + [p2p_purchase(i) for i in range(3)])
+    assert_matches_rebuild(data_dir)
+
+    sales = [sale(i, str(i + 1)) for i in range(4)]
+    db.save_sales(sales)
+    db.save_sales(sales + [sale(i, str(i + 1)) for i in range(4, 7)])
+    assert_matches_rebuild(data_dir)
+
+    # Achat déjà enregistré (même hash et même facture) : mis à jour, pas ajouté
+    db.insert_purchases([purchase(2, quantity=8.0, token_price_usd=61.0), purchase(10)])
+    assert len(db.read_snapshot('purchases')) == 14
+    # Vente modifiée et vente supprimée
+    db.save_sales([{**sales[0], 'total_received': 40.0}] + sales[2:])
+    assert_matches_rebuild(data_dir)
+
+    position = db.read_portfolio()['tokens'][TOKENS[2]]
+    assert position['purchases'] == 4
+    assert position['quantity_bought'] == pytest.approx(8.0 + 6.0 + 9.0 + 2.0)
@@ -0,0 +1,184 @@
+import configparser
+import json
+import os
+import stat
+
+import pytest
+
+import fake_woocommerce
+import realt_scraper
+from realt_scraper import (AdaptiveRateController, HttpBackend, InvalidCredentialsError,
+                           collect_invoice_links, download_invoices, get_order_id, get_session_path,
+                           open_backend)
+
+
+def make_rate_controller():
+    # Pas d'attente entre les requêtes vers le serveur local
+    return AdaptiveRateController(initial_interval=0, min_interval=0)
+
+
+def make_backend(site):
+    return HttpBackend(site.base_url, user_agent='RealtROI tests', rate_controller=make_rate_controller())
+
+
+def make_config(site):
+    config = configparser.ConfigParser()
+    config['DEFAULT'] = {'username': fake_woocommerce.USERNAME, 'password': fake_woocommerce.PASSWORD,
+                         'realt_base_url': site.base_url, 'scraper_backend': 'http'}
+    return config
+
+
+def test_login_sends_nonce_and_keeps_session(woocommerce, data_dir):
+    backend = make_backend(woocommerce)
+    assert not backend.is_logged_in()
+
+    backend.login(fake_woocommerce.USERNAME, fake_woocommerce.PASSWORD)
+
+    login = woocommerce.logins[-1]
+    assert login['woocommerce-login-nonce'] == fake_woocommerce.NONCE
+    assert login['_wp_http_referer'] == '/my-account/'
+    assert login['login'] == 'Log in'
+    assert backend.is_logged_in()
+
+
+def test_login_with_bad_password(woocommerce, data_dir):
+    backend = make_backend(woocommerce)
+
+    with pytest.raises(InvalidCredentialsError):
+        backend.login(fake_woocommerce.USERNAME, 'wrong password')
+
+    assert len(woocommerce.logins) == 1
+    assert not backend.is_logged_in()
+
+
+def test_orders_pagination(woocommerce, data_dir):
+    backend = make_backend(woocommerce)
+    backend.login(fake_woocommerce.USERNAME, fake_woocommerce.PASSWORD)
+
+    links = collect_invoice_links(backend)
+
+    assert [get_order_id(href) for href in links] == ['1003', '1002', '1001', '1000']
+    assert woocommerce.requests.count('/my-account/orders/2') == 1
+
+
+def test_orders_pagination_stops_at_known_orders(woocommerce, data_dir):
+    backend = make_backend(woocommerce)
+    backend.login(fake_woocommerce.USERNAME, fake_woocommerce.PASSWORD)
+
+    links = collect_invoice_links(backend, known_order_ids={'1003', '1002'})
+
+    assert [get_order_id(href) for href in links] == ['1003', '1002']
+    assert '/my-account/orders/2' not in woocommerce.requests
+
+
+def test_download_streams_pdf(woocommerce, data_dir, tmp_path):
+    backend = make_backend(woocommerce)
+    backend.login(fake_woocommerce.USERNAME, fake_woocommerce.PASSWORD)
+    links = collect_invoice_links(backend)
+    download_dir = tmp_path / 'invoices'
+    download_dir.mkdir()
+    received = []
+
+    downloaded = download_invoices(backend.get_session(), links, str(download_dir), workers=2,
+                                   rate_controller=backend.rate_controller, on_downloaded=received.append)
+
+    assert sorted(downloaded) == sorted(received)
+    assert sorted(os.listdir(download_dir)) == [f'invoice_{order_id}.pdf' for order_id in ('1000', '1001', '1002', '1003')]
+    for order_id, content in woocommerce.pdfs.items():
+        assert (download_dir / f'invoice_{order_id}.pdf').read_bytes() == content
+
+    # Les factures présentes ne sont pas téléchargées à nouveau
+    assert download_invoices(backend.get_session(), links, str(download_dir)) == []
+
+
+def test_saved_session_skips_login(woocommerce, data_dir):
+    open_backend(make_config(woocommerce), make_rate_controller())
+    assert len(woocommerce.logins) == 1
+    assert stat.S_IMODE(os.stat(get_session_path()).st_mode) == 0o600
+
+    backend = open_backend(make_config(woocommerce), make_rate_controller())
+
+    assert len(woocommerce.logins) == 1
+    assert backend.is_logged_in()
+    assert collect_invoice_links(backend)
+
+
+def test_rejected_session_falls_back_to_login(woocommerce, data_dir):
+    open_backend(make_config(woocommerce), make_rate_controller())
+    # Session expirée côté serveur
+    woocommerce._sessions.clear()
+
+    backend = open_backend(make_config(woocommerce), make_rate_controller())
+
+    assert len(woocommerce.logins) == 2
+    assert backend.is_logged_in()
+    # La nouvelle session remplace l'ancienne
+    with open(get_session_path(), encoding='utf-8') as f:
+        cookies = {cookie['name']: cookie['value'] for cookie in json.load(f)['cookies']}
+    assert cookies[fake_woocommerce.SESSION_COOKIE] == 'session2'
+
+
+def test_expired_session_cookie_falls_back_to_login(woocommerce, data_dir):
+    open_backend(make_config(woocommerce), make_rate_controller())
+    with open(get_session_path(), encoding='utf-8') as f:
+        saved = json.load(f)
+    for cookie in saved['cookies']:
+        cookie['expires'] = 1
+    with open(get_session_path(), 'w', encoding='utf-8') as f:
+        json.dump(saved, f)
+
+    backend = open_backend(make_config(woocommerce), make_rate_controller())
+
+    assert len(woocommerce.logins) == 2
+    assert backend.is_logged_in()
+
+
+class FakeClock:
+    """Remplace le module time de realt_scraper : le temps n'avance que par sleep()"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def test_rate_controller_backoff_and_recovery(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(realt_scraper, 'time', clock)
+    controller = AdaptiveRateController(initial_interval=1.0, min_interval=0.25, max_interval=8.0)
+
+    # 429 et 5xx : l'intervalle double, jusqu'à max_interval
+    intervals = []
+    for status in (429, 503, 500, 429, 502):
+        assert controller.record(status, 0.1)
+        intervals.append(controller.interval)
+    assert intervals == [2.0, 4.0, 8.0, 8.0, 8.0]
+    assert controller.backoffs == 5
+
+    # Les requêtes suivantes attendent l'intervalle, ou le Retry-After s'il est plus long
+    controller.wait()
+    assert clock.sleeps == [8.0]
+    assert controller.record(429, 0.1, retry_after=30)
+    controller.wait()
+    assert clock.sleeps == [8.0, 30.0]
+
+    # Réponses saines : l'intervalle diminue jusqu'à min_interval
+    intervals = []
+    for _ in range(20):
+        assert not controller.record(200, 0.1)
+        intervals.append(controller.interval)
+    assert intervals == sorted(intervals, reverse=True)
+    assert intervals[0] == pytest.approx(8.0 * 0.8)
+    assert intervals[-1] == 0.25
+
+    # Latence dégradée : pas d'accélération
+    controller.record(503, 0.1)
+    assert controller.interval == 0.5
+    controller.record(200, 5.0)
+    assert controller.interval == 0.5
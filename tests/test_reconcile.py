@@ -0,0 +1,109 @@
+import configparser
+import json
+
+import pytest
+
+import db
+from match_purchases import reconcile_new_transactions
+from match_sales import reconcile_new_sales
+
+WALLET = '0x00000000000000000000000000000000000000aa'
+OLD_WALLET = '0x00000000000000000000000000000000000000cc'
+MARKET = '0x00000000000000000000000000000000000000dd'
+
+MARLOWE = ('RealToken S 9943 Marlowe St Detroit MI', 'REALTOKEN-S-9943-MARLOWE-ST-DETROIT-MI')
+HARTWELL = ('RealToken S 15095 Hartwell St Detroit MI', 'REALTOKEN-S-15095-HARTWELL-ST-DETROIT-MI')
+KENTUCKY = ('RealToken S 4680 Kentucky St Detroit MI', 'REALTOKEN-S-4680-KENTUCKY-ST-DETROIT-MI')
+
+
+def transfer(tx_hash, token, quantity, sender, recipient, date):
+    name, symbol = token
+    return {'hash': tx_hash, 'from': sender, 'to': recipient, 'tokenName': name, 'tokenSymbol': symbol,
+            'value': str(int(quantity * 10**18)), 'formatted_value': str(quantity), 'date': date}
+
+
+def payment(tx_hash, amount, sender, recipient, date):
+    return {'hash': tx_hash, 'from': sender, 'to': recipient, 'tokenName': 'USD//C on xDai', 'tokenSymbol': 'USDC',
+            'value': str(int(amount * 10**6)), 'formatted_value': str(amount), 'date': date}
+
+
+def sale(tx_hash, token, quantity, amount, date):
+    """Vente : tokens envoyés au marché et USDC reçus dans la même transaction"""
+    return [transfer(tx_hash, token, quantity, WALLET, MARKET, date),
+            payment(tx_hash, amount, MARKET, WALLET, date)]
+
+
+def make_config(old_wallet=None):
+    config = configparser.ConfigParser()
+    config['DEFAULT']['gnosis_address'] = WALLET
+    if old_wallet:
+        config['DEFAULT']['old_gnosis_address'] = old_wallet
+    return config
+
+
+@pytest.fixture
+def invoice(data_dir):
+    db.insert_invoice({
+        'order_info': {'invoice_number': '4521', 'invoice_date': 'March 3, 2024', 'order_number': '98765',
+                       'payment_method': 'Credit Card'},
+        'products': [{'address': '9943 Marlowe St, Detroit, MI 48227', 'token_price': 50.59, 'quantity': 10.0},
+                     {'address': '15095 Hartwell St, Detroit, MI 48227', 'token_price': 51.23, 'quantity': 3.0}],
+    })
+
+
+def test_new_transactions_are_matched_once(invoice):
+    # Le premier produit de la facture a été associé lors d'un cycle précédent
+    old_tx = transfer('0xa1', MARLOWE, 10.0, MARKET, WALLET, '04/03/2024 10:00:00')
+    assert len(reconcile_new_transactions([old_tx], make_config())) == 1
+
+    new_transactions = [
+        transfer('0xa2', HARTWELL, 3.0, MARKET, WALLET, '05/03/2024 09:00:00'),
+        transfer('0xa3', KENTUCKY, 2.0, MARKET, WALLET, '05/03/2024 11:00:00'),
+        payment('0xa3', 104.0, WALLET, MARKET, '05/03/2024 11:00:00'),
+        transfer('0xa4', MARLOWE, 1.0, OLD_WALLET, WALLET, '05/03/2024 12:00:00'),
+    ]
+    added = reconcile_new_transactions(new_transactions, make_config(OLD_WALLET))
+
+    assert [(p['source'], p['transaction_hash']) for p in added] == [
+        ('invoice', '0xa2'), ('p2p', '0xa3'), ('transfer', '0xa4')]
+    assert added[0]['invoice_number'] == '4521'
+    assert added[0]['token_price_usd'] == 51.23
+
+    # Même bloc vu une seconde fois : rien n'est ajouté
+    assert reconcile_new_transactions(new_transactions, make_config(OLD_WALLET)) == []
+    assert sorted(p['transaction_hash'] for p in db.get_all_purchases()) == ['0xa1', '0xa2', '0xa3', '0xa4']
+
+
+def test_new_sales_use_remaining_quantities(invoice):
+    reconcile_new_transactions([transfer('0xa1', MARLOWE, 10.0, MARKET, WALLET, '04/03/2024 10:00:00')],
+                               make_config())
+    assert len(reconcile_new_sales(sale('0xb1', MARLOWE, 4.0, 220.0, '01/06/2024 10:00:00'), WALLET)) == 1
+
+    new_transactions = (sale('0xb2', MARLOWE, 7.0, 385.0, '02/06/2024 10:00:00') +
+                        sale('0xb3', MARLOWE, 6.0, 330.0, '03/06/2024 10:00:00'))
+    added = reconcile_new_sales(new_transactions, WALLET)
+
+    # 4 tokens déjà vendus sur 10 : la vente de 7 tokens n'a pas d'achat correspondant
+    assert [s['sale_hash'] for s in added] == ['0xb3']
+    assert added[0]['sell_price'] == 55.0
+    assert added[0]['buy_price'] == 50.59
+
+    assert reconcile_new_sales(new_transactions, WALLET) == []
+    assert [s['sale_hash'] for s in db.read_snapshot('sales')] == ['0xb1', '0xb3']
+
+
+def test_legacy_sales_are_recomputed(invoice, data_dir, config_file):
+    reconcile_new_transactions([transfer('0xa1', MARLOWE, 10.0, MARKET, WALLET, '04/03/2024 10:00:00')],
+                               make_config())
+    old_sale = sale('0xb1', MARLOWE, 4.0, 220.0, '01/06/2024 10:00:00')
+    new_sale = sale('0xb3', MARLOWE, 6.0, 330.0, '03/06/2024 10:00:00')
+    db.insert_transactions(old_sale + new_sale)
+    # Ancien format : ventes sans purchase_id
+    (data_dir / 'sales.json').write_text(json.dumps([{'sale_hash': '0xb1', 'token_symbol': MARLOWE[1],
+                                                      'quantity': 4.0, 'buy_price': 50.59,
+                                                      'total_received': 220.0}]), encoding='utf-8')
+
+    added = reconcile_new_sales(new_sale, WALLET)
+
+    assert [s['sale_hash'] for s in added] == ['0xb3']
+    assert all('purchase_id' in s for s in db.read_snapshot('sales'))
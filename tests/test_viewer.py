@@ -0,0 +1,82 @@
+import gzip
+import json
+
+import pytest
+
+import db
+import progress
+import viewer
+
+
+def make_purchase(tx_hash, symbol='REALTOKEN-A'):
+    return {'transaction_hash': tx_hash, 'token_symbol': symbol, 'quantity': 2.0,
+            'token_price_usd': 50.0, 'source': 'p2p'}
+
+
+@pytest.fixture
+def client(data_dir):
+    viewer.app.config['TESTING'] = True
+    return viewer.app.test_client()
+
+
+def test_unchanged_store_answers_304(client):
+    db.insert_purchases([make_purchase('0x1')])
+
+    first = client.get('/api/purchases')
+    assert first.status_code == 200
+    assert [p['transaction_hash'] for p in first.get_json()] == ['0x1']
+    etag = first.headers['ETag']
+
+    again = client.get('/api/purchases', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+
+def test_etag_changes_with_store_and_parameters(client):
+    db.insert_purchases([make_purchase('0x1')])
+    etag = client.get('/api/purchases').headers['ETag']
+
+    # Autres paramètres : autre réponse
+    filtered = client.get('/api/purchases?token=REALTOKEN-B', headers={'If-None-Match': etag})
+    assert filtered.status_code == 200
+    assert filtered.get_json() == []
+
+    # Store modifié : la version du client n'est plus valable
+    db.insert_purchases([make_purchase('0x2')])
+    updated = client.get('/api/purchases', headers={'If-None-Match': etag})
+    assert updated.status_code == 200
+    assert updated.headers['ETag'] != etag
+    assert len(updated.get_json()) == 2
+
+
+def test_large_response_is_gzipped(client):
+    db.insert_purchases([make_purchase(f'0x{i:040x}') for i in range(50)])
+
+    response = client.get('/api/purchases', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.data))) == 50
+    assert client.get('/api/purchases').headers.get('Content-Encoding') is None
+
+
+
+def test_progress_error_is_served_as_data_and_rendered_as_text(client):
+    payload = '<img src=x onerror=alert(1)> invoice_12.pdf'
+    progress.reset_progress()
+    progress.publish('step_end', step='invoices', status='error', error=payload)
+
+    response = client.get('/events', buffered=False)
+    try:
+        message = next(iter(response.response))
+    finally:
+        response.close()
+    message = message.decode('utf-8') if isinstance(message, bytes) else message
+    data = [line[len('data: '):] for line in message.splitlines() if line.startswith('data: ')]
+    assert len(data) == 1
+    assert json.loads(data[0])['error'] == payload
+
+    # La page n'insère jamais une valeur d'événement comme HTML
+    page = client.get('/progress').get_data(as_text=True)
+    for sink in ('innerHTML', 'outerHTML', 'insertAdjacentHTML', 'document.write'):
+        assert sink not in page